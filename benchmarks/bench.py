@@ -0,0 +1,283 @@
+#!/usr/bin/env python
+"""
+Pychievements benchmark suite.
+
+Measures throughput (ops/s), latency (p50/p99) and memory for the hot paths of pychievements:
+
+* ``AchievementTracker.increment`` and ``AchievementTracker.evaluate`` on the in-memory and SQLite
+  backends
+* ``Signal.send_robust`` with 0, 10 and 100 receivers
+* registry lookups (``tracker.achievement_for_id``) with 10 to 10,000 registered achievements
+* ``cli.print_goals_for_tracked`` rendering (requires ``clint``)
+
+Everything runs offline against temporary files. Results can be saved as a JSON baseline and
+compared against later runs to catch regressions::
+
+    $ python benchmarks/bench.py --save baseline.json
+    $ python benchmarks/bench.py --compare baseline.json
+
+``--compare`` exits with a non-zero status if any benchmark is slower than the baseline by more
+than ``--threshold`` percent.
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import tracemalloc
+
+try:
+    from time import perf_counter as _clock
+except ImportError:
+    from time import time as _clock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pychievements import Achievement, icons  # noqa: E402
+from pychievements.backends import AchievementBackend, SQLiteAchievementBackend  # noqa: E402
+from pychievements.signals import Signal  # noqa: E402
+from pychievements.trackers import AchievementTracker  # noqa: E402
+
+
+def make_achievement(name, num_goals=10):
+    goals = tuple({'level': (_ + 1) * 10, 'name': 'Level %d' % _, 'icon': icons.star,
+                   'description': 'Reach level %d' % ((_ + 1) * 10)} for _ in range(num_goals))
+    return type(name, (Achievement,), {'name': name, 'category': 'bench', 'goals': goals})
+
+
+class Bench(object):
+    """
+    A single benchmark. ``setup`` returns a callable performing one operation, and optionally a
+    cleanup callable, as ``(op, cleanup)``.
+    """
+    def __init__(self, name, setup, iterations=None):
+        self.name = name
+        self.setup = setup
+        self.iterations = iterations
+
+    def run(self, iterations, warmup):
+        iterations = self.iterations or iterations
+        op, cleanup = self.setup()
+        try:
+            for _ in range(warmup):
+                op()
+            samples = []
+            for _ in range(iterations):
+                start = _clock()
+                op()
+                samples.append(_clock() - start)
+
+            tracemalloc.start()
+            base = tracemalloc.get_traced_memory()[0]
+            for _ in range(min(iterations, 1000)):
+                op()
+            peak = tracemalloc.get_traced_memory()[1] - base
+            tracemalloc.stop()
+        finally:
+            if cleanup is not None:
+                cleanup()
+        return summarize(samples, peak)
+
+
+def percentile(ordered, pct):
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+
+def summarize(samples, peak_memory):
+    ordered = sorted(samples)
+    total = sum(samples)
+    return {
+        'iterations': len(samples),
+        'ops_per_sec': len(samples) / total if total else float('inf'),
+        'p50_us': percentile(ordered, 50) * 1e6,
+        'p99_us': percentile(ordered, 99) * 1e6,
+        'max_us': ordered[-1] * 1e6,
+        'peak_memory_bytes': peak_memory,
+    }
+
+
+############################################################################################
+# Benchmarks
+
+def _memory_tracker():
+    tracker = AchievementTracker(AchievementBackend())
+    return tracker, None
+
+
+def _sqlite_tracker():
+    tmpdir = tempfile.mkdtemp(prefix='pychievements-bench-')
+    backend = SQLiteAchievementBackend(os.path.join(tmpdir, 'bench.db'))
+    tracker = AchievementTracker(backend)
+
+    def cleanup():
+        backend.close()
+        shutil.rmtree(tmpdir)
+    return tracker, cleanup
+
+
+def tracker_bench(make_tracker, method):
+    def setup():
+        tracker, cleanup = make_tracker()
+        achievement = make_achievement('BenchAchievement')
+        tracker.register(achievement)
+        state = {'n': 0}
+
+        def op():
+            state['n'] += 1
+            getattr(tracker, method)(state['n'] % 100, achievement)
+        return op, cleanup
+    return setup
+
+
+def signal_bench(num_receivers):
+    def setup():
+        signal = Signal()
+        receivers = []
+        for _ in range(num_receivers):
+            def recv(**kwargs):
+                return None
+            receivers.append(recv)
+            signal.connect(recv)
+        sender = object()
+
+        def op():
+            signal.send_robust(sender, tracked_id=1, achievement=None)
+        return op, None
+    return setup
+
+
+def registry_bench(num_achievements):
+    def setup():
+        tracker = AchievementTracker()
+        achievements = [make_achievement('Registry%d' % _, 1) for _ in range(num_achievements)]
+        tracker.register(achievements)
+        target = achievements[-1].__name__
+
+        def op():
+            tracker.achievement_for_id(1, target)
+        return op, None
+    return setup
+
+
+def cli_bench(num_achievements):
+    def setup():
+        from pychievements import cli
+        tracker = AchievementTracker()
+        tracker.register([make_achievement('Cli%d' % _) for _ in range(num_achievements)])
+        for a in tracker.achievements():
+            tracker.set_level(1, a, 45)
+        # clint binds sys.stdout.write when it is imported, so output is discarded at the file
+        # descriptor level instead of by replacing sys.stdout
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        saved = os.dup(1)
+
+        def op():
+            sys.stdout.flush()
+            os.dup2(devnull, 1)
+            try:
+                cli.print_goals_for_tracked(1, achieved=True, unachieved=True, level=True,
+                                            tracker=tracker)
+                sys.stdout.flush()
+            finally:
+                os.dup2(saved, 1)
+
+        def cleanup():
+            os.close(devnull)
+            os.close(saved)
+        return op, cleanup
+    return setup
+
+
+def have_clint():
+    try:
+        import clint  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def benchmarks():
+    r = [
+        Bench('tracker.increment[memory]', tracker_bench(_memory_tracker, 'increment')),
+        Bench('tracker.increment[sqlite]', tracker_bench(_sqlite_tracker, 'increment')),
+        Bench('tracker.evaluate[memory]', tracker_bench(_memory_tracker, 'evaluate')),
+        Bench('tracker.evaluate[sqlite]', tracker_bench(_sqlite_tracker, 'evaluate')),
+    ]
+    r += [Bench('signal.send_robust[%d]' % _, signal_bench(_)) for _ in (0, 10, 100)]
+    r += [Bench('registry.lookup[%d]' % _, registry_bench(_)) for _ in (10, 100, 1000, 10000)]
+    if have_clint():
+        r += [Bench('cli.print_goals_for_tracked[10]', cli_bench(10), iterations=50)]
+    return r
+
+
+############################################################################################
+# Reporting
+
+def print_results(results, baseline=None, stream=sys.stdout):
+    header = '{0:40} {1:>14} {2:>10} {3:>10} {4:>12}'.format('benchmark', 'ops/s', 'p50 us',
+                                                             'p99 us', 'peak mem')
+    if baseline is not None:
+        header += ' {0:>10}'.format('vs base')
+    stream.write(header + '\n' + '-' * len(header) + '\n')
+    for name, r in sorted(results.items()):
+        line = '{0:40} {1:>14,.0f} {2:>10.1f} {3:>10.1f} {4:>12,}'.format(
+            name, r['ops_per_sec'], r['p50_us'], r['p99_us'], r['peak_memory_bytes'])
+        if baseline is not None and name in baseline:
+            line += ' {0:>+9.1f}%'.format(change(baseline[name], r))
+        stream.write(line + '\n')
+
+
+def change(base, result):
+    """ Percent change in throughput from ``base`` to ``result``; negative is slower """
+    return (result['ops_per_sec'] / base['ops_per_sec'] - 1.0) * 100.0
+
+
+def regressions(baseline, results, threshold):
+    return sorted(_ for _ in results
+                  if _ in baseline and change(baseline[_], results[_]) < -threshold)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run the pychievements benchmark suite')
+    parser.add_argument('-n', '--iterations', type=int, default=2000,
+                        help='timed iterations per benchmark (default: %(default)s)')
+    parser.add_argument('--warmup', type=int, default=100,
+                        help='untimed iterations before timing (default: %(default)s)')
+    parser.add_argument('-k', '--filter', default='',
+                        help='only run benchmarks whose name contains this string')
+    parser.add_argument('--save', metavar='FILE', help='save results as a JSON baseline')
+    parser.add_argument('--compare', metavar='FILE', help='compare results to a JSON baseline')
+    parser.add_argument('--threshold', type=float, default=10.0,
+                        help='percent slowdown reported as a regression (default: %(default)s)')
+    args = parser.parse_args(argv)
+
+    results = {}
+    for bench in benchmarks():
+        if args.filter in bench.name:
+            results[bench.name] = bench.run(args.iterations, args.warmup)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+    print_results(results, baseline)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({'python': platform.python_version(), 'platform': platform.platform(),
+                       'results': results}, f, indent=2, sort_keys=True)
+
+    if baseline is not None:
+        slower = regressions(baseline, results, args.threshold)
+        if slower:
+            sys.stdout.write('\nRegressions (> %.1f%% slower): %s\n' % (args.threshold,
+                                                                      ', '.join(slower)))
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
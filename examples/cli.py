@@ -75,16 +75,30 @@ def new_goal(tracked_id, achievement, goals, **kwargs):
         print_goal(g, True)
 
 
+class Completionist(Achievement):
+    """
+    Achievements can depend on other achievements. The tracker keeps the level of Completionist
+    equal to the number of its dependencies that have had every goal achieved, so no signal
+    receiver has to check every achievement whenever one of them is completed.
+    """
+    name = 'Completionist'
+    category = 'cli'
+    keywords = ('cli', 'meta')
+    depends_on = (TheLister, TheCreator)
+    goals = (
+        {'level': 2, 'name': 'Completionist', 'icon': icons.star,
+         'description': 'Achieved the highest level of every other achievement'},
+    )
+tracker.register(Completionist)
+
+
 @receiver(highest_level_achieved)
-def check_if_all_completed(tracked_id, **kwargs):
+def check_if_all_completed(tracked_id, achievement, **kwargs):
     """
-    Another signal reciever where we will check to see if any goals are unmet after we know we've
-    achieved the highest level for a single achievement.
+    Another signal reciever, which congratulates our user once Completionist, and so every other
+    achievement, has been completed.
     """
-    unachieved = []
-    for a in tracker.achievements():
-        unachieved += tracker.unachieved(tracked_id, a)
-    if not unachieved:
+    if isinstance(achievement, Completionist):
         print('\n\nYou\'ve achieved the highest level of every achievement possible! Congrats!')
 
 
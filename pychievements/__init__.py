@@ -8,11 +8,29 @@ The Python achievements framework!!
 
 from __future__ import absolute_import
 
+import sys
+
 from .trackers import AchievementTracker
-from .achievements import Achievement
+from .achievements import Achievement, Goal, WindowedAchievement
 tracker = AchievementTracker()
 
-__all__ = ['tracker', 'Achievement']
+__all__ = ['tracker', 'Achievement', 'Goal', 'WindowedAchievement']
+
+# submodules that are only imported when first accessed, e.g. ``pychievements.icons``
+_LAZY_SUBMODULES = ('backends', 'cli', 'icons', 'redis', 'server', 'signals', 'stats',
+                    'tracing')
+
+
+def __getattr__(name):
+    if name in _LAZY_SUBMODULES:
+        import importlib
+        return importlib.import_module('.' + name, __name__)
+    raise AttributeError('module %r has no attribute %r' % (__name__, name))
+
+
+if sys.version_info < (3, 7):
+    # module __getattr__ (PEP 562) is only used by Python 3.7+, so import the submodules now
+    from . import backends, cli, icons, redis, server, signals, stats, tracing  # noqa
 
 
 __title__ = 'pychievements'
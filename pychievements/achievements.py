@@ -1,4 +1,111 @@
-class Achievement(object):
+import time
+from bisect import bisect_right
+from collections import namedtuple
+
+# lengths of time, in seconds, for the ``window`` and ``bucket`` of a WindowedAchievement
+MINUTE = 60
+HOUR = 60 * MINUTE
+DAY = 24 * HOUR
+WEEK = 7 * DAY
+
+
+class AchievementStatus(namedtuple('AchievementStatus',
+                                   ['achievement', 'level', 'goal', 'achieved', 'progress'])):
+    """
+    An immutable summary of an ``Achievement`` for a single ``tracked_id``, as returned by
+    :py:attr:`Achievement.status`.
+
+        achievement
+            The ``Achievement`` instance the status was taken from
+
+        level
+            The current level
+
+        goal
+            The goal currently being worked towards, or ``None`` if every goal has been achieved
+
+        achieved
+            The number of goals achieved. As goals are sorted, ``achievement.goals[:achieved]``
+            are the achieved goals and ``achievement.goals[achieved:]`` are the unachieved goals.
+
+        progress
+            Fraction (0.0 - 1.0) of the level required for ``goal`` that has been reached. This is
+            1.0 once every goal has been achieved.
+    """
+    __slots__ = ()
+
+
+class Goal(object):
+    """
+    A goal of an ``Achievement``. Goals are created from the dicts given in ``Achievement.goals``
+    when the achievement class is defined, and can still be used like those dicts
+    (``goal['level']``). Any keys other than ``level``, ``name``, ``icon`` and ``description`` are
+    kept in ``extra``.
+
+        index
+            Position of the goal in the achievement's goals, which are sorted by level
+
+    Goals are only equal to themselves, so comparing goals is an identity check.
+    """
+    __slots__ = ('level', 'name', 'icon', 'description', 'index', 'extra')
+
+    fields = ('level', 'name', 'icon', 'description')
+
+    def __init__(self, level, name=None, icon=None, description=None, index=0, **extra):
+        self.level = level
+        self.name = name
+        self.icon = icon
+        self.description = description
+        self.index = index
+        self.extra = extra
+
+    def __repr__(self):
+        return '<Goal {0} level:{1}>'.format(self.name, self.level)
+
+    def __getitem__(self, key):
+        if key in self.fields:
+            return getattr(self, key)
+        return self.extra[key]
+
+    def __contains__(self, key):
+        return key in self.fields or key in self.extra
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def keys(self):
+        return list(self.fields) + list(self.extra)
+
+    def items(self):
+        return [(_, self[_]) for _ in self.keys()]
+
+
+def _make_goals(goals):
+    """ Returns ``goals`` (dicts or ``Goal``) as a tuple of ``Goal`` sorted by level """
+    goals = sorted(goals, key=lambda g: g['level'])
+    return tuple(Goal(index=i, **dict((k, v) for k, v in g.items() if k != 'index'))
+                 for i, g in enumerate(goals))
+
+
+class AchievementType(type):
+    """
+    Metaclass of ``Achievement``, which converts ``goals`` to sorted ``Goal`` objects when an
+    achievement class is defined or its goals are replaced.
+    """
+    def __new__(mcs, name, bases, attrs):
+        if 'goals' in attrs:
+            attrs['goals'] = _make_goals(attrs['goals'])
+            attrs['_goal_levels'] = [_.level for _ in attrs['goals']]
+        return type.__new__(mcs, name, bases, attrs)
+
+    def __setattr__(cls, name, value):
+        if name == 'goals':
+            value = _make_goals(value)
+            type.__setattr__(cls, '_goal_levels', [_.level for _ in value])
+        type.__setattr__(cls, name, value)
+
+
+class Achievement(AchievementType('AchievementBase', (object,), {})):
     """
     Base Achievement class.
 
@@ -8,7 +115,7 @@ class Achievement(object):
     Achievements can also have a ``category`` (string) and ``keywords`` (tuple of strings) that can
     be used to filter Achievements.
 
-    Goals are defined as a tuple of tuples with the format:
+    Goals are defined as a tuple of dicts with the format:
 
     .. code-block:: python
 
@@ -37,6 +144,8 @@ class Achievement(object):
         description
             A longer description of the level.
 
+    Each goal is converted to a :py:class:`Goal` when the class is defined, and ``goals`` becomes a
+    tuple of goals sorted by level.
 
 
     Achievements can be updated in two ways: ``increment`` and ``evaluate``. Increment increments
@@ -52,15 +161,33 @@ class Achievement(object):
 
     An Achievement can be initialized with a ``current`` level, for example when restoring for a
     saved state.
+
+    Achievements can depend on other achievements by listing them (as classes or class names) in
+    ``depends_on``. Whenever every goal of a dependency is achieved, or a dependency is no longer
+    complete, the tracker calls ``dependencies_changed`` on the dependent achievement with the
+    dependencies that are complete. By default this sets the level to the number of completed
+    dependencies, so a "complete 5 other achievements" achievement only needs a goal with a level
+    of 5. Dependencies completed before the dependent was registered are counted once
+    ``AchievementTracker.evaluate_all`` is run for the dependent:
+
+    .. code-block:: python
+
+        class Completionist(Achievement):
+            name = 'Completionist'
+            category = 'meta'
+            depends_on = (TheLister, TheCreator, 'TheRemover')
+            goals = ({'level': 3, 'name': 'Completionist', 'icon': icons.star,
+                      'description': 'Completed every other achievement'},)
     """
     name = 'Achievement'
     category = 'achievements'
     keywords = tuple()
     goals = tuple()
+    depends_on = tuple()
+    has_state = False
 
     def __init__(self, current=0):
         self._current = current
-        self.goals = sorted(self.goals, key=lambda g: g['level'])  # make sure our goals are sorted
 
     def __repr__(self):
         return '<{0} category:\'{1}\' keywords:{2} {3}>'.format(self.name, self.category,
@@ -79,24 +206,47 @@ class Achievement(object):
         ::
             (current_level, None)
         """
-        g = [_ for _ in self.goals if self._current < _['level']]
-        if g:
-            return (self._current, g[0])
-        return (self._current, None)
+        level = self._current
+        i = bisect_right(self._goal_levels, level)
+        if i < len(self.goals):
+            return (level, self.goals[i])
+        return (level, None)
+
+    def goal_index(self, level=None):
+        """
+        Returns the number of goals achieved at ``level``, or at the current level if ``level`` is
+        ``None``. As goals are sorted, this is the index of the first unachieved goal. Found by
+        bisecting the goal levels, so this is O(log n) in the number of goals.
+        """
+        return bisect_right(self._goal_levels, self._current if level is None else level)
 
     @property
     def achieved(self):
         """
         Returns a list of achieved goals
         """
-        return [_ for _ in self.goals if self._current >= _['level']]
+        return list(self.goals[:self.goal_index()])
 
     @property
     def unachieved(self):
         """
         Returns a list of goals that have not been met yet
         """
-        return [_ for _ in self.goals if self._current < _['level']]
+        return list(self.goals[self.goal_index():])
+
+    @property
+    def status(self):
+        """
+        Returns an :py:class:`AchievementStatus` with the current level, the current goal, the
+        number of achieved goals and the progress towards the current goal.
+        """
+        level = self._current
+        achieved = self.goal_index(level)
+        if achieved == len(self.goals):
+            return AchievementStatus(self, level, None, achieved, 1.0)
+        goal = self.goals[achieved]
+        progress = min(max(float(level) / goal.level, 0.0), 1.0) if goal.level > 0 else 0.0
+        return AchievementStatus(self, level, goal, achieved, progress)
 
     def increment(self, amount=1, *args, **kwargs):
         """
@@ -118,3 +268,130 @@ class Achievement(object):
         Overrides the current level with the given level
         """
         self._current = level
+
+    def dependencies_changed(self, completed):
+        """
+        Called with a list of the achievements in ``depends_on`` that have had every goal achieved,
+        when a dependency is completed or is no longer complete. By default, this sets the current
+        level to the number of completed dependencies. Achievements can redefine this function to
+        update their level differently.
+        """
+        self._current = len(completed)
+
+    def get_state(self):
+        """
+        Returns state, other than the current level, that backends must store for the achievement
+        and pass to ``set_state`` when it is restored. Only called for achievements with
+        ``has_state`` set to True. The state must be JSON serializable.
+        """
+        return None
+
+    def set_state(self, state):
+        """
+        Restores state returned by ``get_state``
+        """
+
+
+class WindowedAchievement(Achievement):
+    """
+    An achievement whose level is the total amount it has been incremented by within a rolling
+    time ``window``, such as "100 logins this week":
+
+    .. code-block:: python
+
+        class RegularVisitor(WindowedAchievement):
+            name = 'Regular Visitor'
+            category = 'visits'
+            window = WEEK
+            bucket = HOUR
+            goals = (
+                {'level': 100, 'name': 'Regular', 'icon': icons.star,
+                 'description': 'Logged in 100 times in a week'},
+            )
+
+    Increments are counted in a ring buffer of ``window / bucket`` buckets, each holding the
+    total for ``bucket`` seconds, along with a running total of every bucket. Incrementing and
+    reading the level are O(1). Buckets are expired lazily, when the level is next read or
+    updated, so increments that happened more than ``window`` seconds ago (to the nearest
+    ``bucket``) no longer count towards the level. Setting a lower level removes the difference
+    from the newest buckets first, emptying each before moving to an older one, so no bucket
+    ever holds a negative count.
+
+    The buckets are stored by the backend along with the level (see ``get_state``). The level
+    stored by the backend, and used by leaderboards, is the level as of the last update.
+    """
+    window = WEEK
+    bucket = HOUR
+    has_state = True
+
+    def __init__(self, current=0):
+        self._size = max(1, -(-self.window // self.bucket))
+        self._buckets = [0] * self._size
+        self._total = 0
+        self._index = self._bucket_index()
+        Achievement.__init__(self, current)
+
+    def now(self):
+        """
+        Returns the current time in seconds since the epoch. Achievements can redefine this to
+        use another clock.
+        """
+        return time.time()
+
+    def _bucket_index(self):
+        return int(self.now() // self.bucket)
+
+    def _expire(self):
+        """ Moves to the current bucket, clearing any buckets that have left the window """
+        index = self._bucket_index()
+        if index <= self._index:
+            return
+        for i in range(self._index + 1, min(index, self._index + self._size) + 1):
+            slot = i % self._size
+            self._total -= self._buckets[slot]
+            self._buckets[slot] = 0
+        self._index = index
+
+    @property
+    def _current(self):
+        self._expire()
+        return self._total
+
+    @_current.setter
+    def _current(self, level):
+        self._expire()
+        if level >= self._total:
+            self._buckets[self._index % self._size] += level - self._total
+            self._total = level
+            return
+        remove = self._total - level
+        for i in range(self._index, self._index - self._size, -1):
+            slot = i % self._size
+            drained = min(self._buckets[slot], remove)
+            if drained > 0:
+                self._buckets[slot] -= drained
+                self._total -= drained
+                remove -= drained
+            if not remove:
+                break
+
+    def get_state(self):
+        """
+        Returns the index of the newest bucket and the counts of each bucket within the window,
+        oldest first, with empty buckets at the start of the window left out.
+        """
+        self._expire()
+        counts = [self._buckets[i % self._size]
+                  for i in range(self._index - self._size + 1, self._index + 1)]
+        while counts and not counts[0]:
+            counts.pop(0)
+        return [self._index, counts]
+
+    def set_state(self, state):
+        index, counts = state
+        self._buckets = [0] * self._size
+        self._index = index
+        for i, count in enumerate(counts, index - len(counts) + 1):
+            if i > index - self._size:
+                self._buckets[i % self._size] += count
+        self._total = sum(self._buckets)
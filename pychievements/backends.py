@@ -1,4 +1,106 @@
-import sqlite3
+import heapq
+import threading
+import time
+import zlib
+from collections import OrderedDict, deque, namedtuple
+from contextlib import contextmanager
+
+try:
+    import queue as _queue
+except ImportError:
+    import Queue as _queue
+
+_STOP = object()
+
+# most values bound to a single ``in (...)`` list, below SQLite's default limit of 999 parameters
+_MAX_IN = 512
+
+# seconds that event ids are remembered for, to ignore duplicate events
+EVENT_WINDOW = 24 * 60 * 60
+
+
+def _restore(achievement, level, state=None):
+    """ Creates an ``Achievement`` with a stored level and state """
+    a = achievement(current=level)
+    if state is not None:
+        a.set_state(state)
+    return a
+
+
+def _in_lists(values):
+    """
+    Splits ``values`` into lists of up to ``_MAX_IN`` values, yielding the placeholders for each
+    list along with its values. Lists are padded with ``None`` (which never matches) to a power of
+    two in length, so queries only vary by a few sizes and their compiled statements are reused
+    from the connection's statement cache.
+    """
+    for i in range(0, len(values), _MAX_IN):
+        chunk = values[i:i + _MAX_IN]
+        size = 1
+        while size < len(chunk):
+            size *= 2
+        yield ','.join('?' * size), chunk + [None] * (size - len(chunk))
+
+
+def _batches(iterable, size):
+    """ Yields lists of up to ``size`` items from ``iterable`` """
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class EventWindow(object):
+    """
+    Remembers keys, such as event ids, for about ``window`` seconds in bounded memory.
+
+    Keys are added to a set for the current time bucket, each bucket covering ``window / buckets``
+    seconds, and whole buckets are dropped once they leave the window. A key is remembered for
+    between ``window - window / buckets`` and ``window`` seconds. If ``max_size`` is given, the
+    oldest buckets are also dropped to keep at most ``max_size`` keys.
+    """
+    def __init__(self, window=EVENT_WINDOW, buckets=24, max_size=None):
+        self.window = window
+        self.buckets = buckets
+        self.max_size = max_size
+        self._sets = deque()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def now(self):
+        return time.time()
+
+    def _expire(self, index, size=None):
+        """ Drops buckets that have left the window, and then the oldest while over ``size`` """
+        while self._sets and (self._sets[0][0] <= index - self.buckets or
+                              (size is not None and self._size > size)):
+            self._size -= len(self._sets.popleft()[1])
+
+    def __contains__(self, key):
+        index = int(self.now() * self.buckets // self.window)
+        with self._lock:
+            self._expire(index)
+            return any(key in keys for _, keys in self._sets)
+
+    def __len__(self):
+        return self._size
+
+    def add(self, key):
+        """ Adds ``key``, returning False if it is already in the window """
+        index = int(self.now() * self.buckets // self.window)
+        with self._lock:
+            self._expire(index, None if self.max_size is None else self.max_size - 1)
+            if any(key in keys for _, keys in self._sets):
+                return False
+            if not self._sets or self._sets[-1][0] != index:
+                self._sets.append((index, set()))
+            self._sets[-1][1].add(key)
+            self._size += 1
+            return True
 
 
 class AchievementBackend(object):
@@ -16,11 +118,24 @@ class AchievementBackend(object):
     ``Achievement`` class name (``Achievement.__name__``), and the current level
     (``Achievement.current``)
 
+    Achievements with ``has_state`` set, such as :py:class:`pychievements.WindowedAchievement`,
+    also have a ``state`` (``Achievement.get_state()``) that is passed to
+    :py:func:`set_level_for_id` and must be stored with the level, and restored with
+    ``Achievement.set_state``.
+
+    Levels set for an ``event_id`` (see :py:func:`set_level_for_id`) are deduplicated, so an event
+    that is delivered more than once only updates a level once. Event ids are remembered for
+    ``event_window`` seconds, in memory by an :py:class:`EventWindow` for backends that do not
+    persist data.
+
     .. note::
         AchievementBackend is NOT thread safe
     """
+    event_window = EVENT_WINDOW
+
     def __init__(self):
         self._tracked = {}
+        self._events = EventWindow(self.event_window)
 
     def achievement_for_id(self, tracked_id, achievement):
         """ Retrieves the current ``Achievement`` for the given ``tracked_id``. If the given
@@ -36,18 +151,37 @@ class AchievementBackend(object):
     def achievements_for_id(self, tracked_id, achievements):
         """
         Returns the current achievement for each achievement in ``achievements`` for the given
-        tracked_id """
+        tracked_id, in the same order as ``achievements`` """
         r = []
         for a in achievements:
             r.append(self.achievement_for_id(tracked_id, a))
         return r
 
-    def set_level_for_id(self, tracked_id, achievement, level):
-        """ Set the ``level`` for an ``Achievement`` for the given ``tracked_id`` """
+    def has_event(self, tracked_id, achievement, event_id):
+        """
+        Returns True if a level has been set for ``event_id`` for an ``Achievement`` for the given
+        ``tracked_id`` within the last ``event_window`` seconds
+        """
+        return (tracked_id, achievement.__name__, event_id) in self._events
+
+    def set_level_for_id(self, tracked_id, achievement, level, state=None, event_id=None):
+        """
+        Set the ``level`` for an ``Achievement`` for the given ``tracked_id``. ``state`` is given
+        for achievements with ``has_state`` set, and must be stored along with the level.
+
+        If an ``event_id`` is given, it is recorded along with the level. If a level has already
+        been set for the ``event_id`` (see :py:func:`has_event`), nothing is stored and False is
+        returned.
+        """
+        if event_id is not None and not self._events.add((tracked_id, achievement.__name__,
+                                                          event_id)):
+            return False
         if tracked_id not in self._tracked:
             self._tracked[tracked_id] = {}
         if achievement.__name__ not in self._tracked[tracked_id]:
-            self._tracked[tracked_id][achievement.__name__] = achievement(current=level)
+            self._tracked[tracked_id][achievement.__name__] = _restore(achievement, level, state)
+        elif state is not None:
+            self._tracked[tracked_id][achievement.__name__].set_state(state)
         self._tracked[tracked_id][achievement.__name__].set_level(level)
 
     def get_tracked_ids(self):
@@ -58,6 +192,148 @@ class AchievementBackend(object):
         if tracked_id in self._tracked:
             del self._tracked[tracked_id]
 
+    def iter_levels(self, achievement=None, batch_size=1000):
+        """
+        Yields ``(tracked_id, achievement name, level)`` for every stored level, or only for the
+        levels of ``achievement`` if given. Backends that persist data read ``batch_size`` rows at a
+        time rather than loading everything at once.
+        """
+        name = achievement.__name__ if achievement is not None else None
+        for tracked_id, achievements in list(self._tracked.items()):
+            for a_name, a in list(achievements.items()):
+                if name is None or a_name == name:
+                    yield (tracked_id, a_name, a.current[0])
+
+    def set_levels(self, rows, batch_size=1000):
+        """
+        Sets levels from an iterable of ``(tracked_id, Achievement, level)``. Backends that persist
+        data write ``batch_size`` rows per transaction. Returns the number of rows written.
+        """
+        count = 0
+        for tracked_id, achievement, level in rows:
+            self.set_level_for_id(tracked_id, achievement, level)
+            count += 1
+        return count
+
+    def leaderboard(self, achievement, limit=10):
+        """
+        Returns up to ``limit`` ``(tracked_id, level)`` pairs with the highest levels for
+        ``achievement``, highest first.
+        """
+        return heapq.nlargest(limit, ((_[0], _[2]) for _ in self.iter_levels(achievement)),
+                              key=lambda _: _[1])
+
+    def summary(self):
+        """
+        Returns a summary of stored data as a dictionary with the number of ``tracked_ids``, the
+        number of stored ``levels`` and, for each achievement, the ``count``, ``total`` and ``max``
+        of its levels.
+        """
+        tracked_ids = set()
+        achievements = {}
+        count = 0
+        for tracked_id, name, level in self.iter_levels():
+            tracked_ids.add(tracked_id)
+            count += 1
+            a = achievements.setdefault(name, {'count': 0, 'total': 0, 'max': level})
+            a['count'] += 1
+            a['total'] += level
+            a['max'] = max(a['max'], level)
+        return {'tracked_ids': len(tracked_ids), 'levels': count, 'achievements': achievements}
+
+    def vacuum(self):
+        """ Reclaims unused storage. Does nothing for backends that do not persist data. """
+
+    def migrate(self):
+        """
+        Upgrades stored data to the latest schema. Returns a list of the migrations applied, which
+        is always empty for backends that do not persist data.
+        """
+        return []
+
+
+# an immutable record of a stored level, published by SnapshotAchievementBackend
+LevelSnapshot = namedtuple('LevelSnapshot', ['level', 'state'])
+
+
+class SnapshotAchievementBackend(AchievementBackend):
+    """
+    Stores achievement data in memory, like :py:class:`AchievementBackend`, but can be shared
+    between threads without readers taking any locks.
+
+    Levels are stored as immutable :py:class:`LevelSnapshot` records in a dictionary per
+    ``tracked_id``. Writers (which are serialized by a lock) never modify a published dictionary,
+    but copy it, update the copy and swap it in with a single assignment. Readers fetch the current
+    dictionary for a ``tracked_id`` once, so :py:func:`achievements_for_id` always sees the levels
+    of a ``tracked_id`` as of a single point in time.
+
+    Every read returns new ``Achievement`` instances, so an instance held by a caller never changes
+    because of an update made elsewhere.
+
+    .. code-block:: python
+
+        tracker.set_backend(SnapshotAchievementBackend())
+    """
+    def __init__(self):
+        self._tracked = {}
+        self._events = EventWindow(self.event_window)
+        self._write_lock = threading.Lock()
+
+    def _publish(self, tracked_id, updates):
+        """ Swaps in a copy of the records for ``tracked_id`` with ``updates`` applied """
+        records = dict(self._tracked.get(tracked_id, ()))
+        records.update(updates)
+        self._tracked[tracked_id] = records
+
+    def achievement_for_id(self, tracked_id, achievement):
+        return self.achievements_for_id(tracked_id, [achievement])[0]
+
+    def achievements_for_id(self, tracked_id, achievements):
+        records = self._tracked.get(tracked_id, {})
+        missing = [_.__name__ for _ in achievements if _.__name__ not in records]
+        if missing:
+            with self._write_lock:
+                self._publish(tracked_id, dict((_, LevelSnapshot(0, None)) for _ in missing
+                                               if _ not in self._tracked.get(tracked_id, ())))
+                records = self._tracked[tracked_id]
+        return [_restore(_, *records[_.__name__]) for _ in achievements]
+
+    def set_level_for_id(self, tracked_id, achievement, level, state=None, event_id=None):
+        name = achievement.__name__
+        with self._write_lock:
+            if event_id is not None and not self._events.add((tracked_id, name, event_id)):
+                return False
+            if state is None:
+                state = self._tracked.get(tracked_id, {}).get(name, LevelSnapshot(0, None)).state
+            self._publish(tracked_id, {name: LevelSnapshot(level, state)})
+
+    def increment_level_for_id(self, tracked_id, achievement, amount=1, event_id=None):
+        """
+        Atomically increments the level of an achievement, returning the new level, or False if
+        a level has already been set for ``event_id``
+        """
+        name = achievement.__name__
+        with self._write_lock:
+            if event_id is not None and not self._events.add((tracked_id, name, event_id)):
+                return False
+            record = self._tracked.get(tracked_id, {}).get(name, LevelSnapshot(0, None))
+            self._publish(tracked_id, {name: record._replace(level=record.level + amount)})
+        return record.level + amount
+
+    def get_tracked_ids(self):
+        return list(self._tracked)
+
+    def remove_id(self, tracked_id):
+        with self._write_lock:
+            self._tracked.pop(tracked_id, None)
+
+    def iter_levels(self, achievement=None, batch_size=1000):
+        name = achievement.__name__ if achievement is not None else None
+        for tracked_id, records in list(self._tracked.items()):
+            for a_name, record in records.items():
+                if name is None or a_name == name:
+                    yield (tracked_id, a_name, record.level)
+
 
 class SQLiteAchievementBackend(AchievementBackend):
     """
@@ -68,59 +344,985 @@ class SQLiteAchievementBackend(AchievementBackend):
         dbfile
             The full path and file name to store the SQLite database
 
+        pooled
+            If True, the backend can be shared between threads. Each read checks out a connection
+            from a pool of reader connections, while all writes are serialized through a single
+            writer connection. The database is switched to WAL mode so reads do not block on the
+            writer. Pooled mode requires a database file, ``:memory:`` databases cannot be shared
+            between connections.
+
+        max_readers
+            The most reader connections a pooled backend opens. Reads wait for a connection to be
+            returned to the pool once this many are in use.
+
     To use, create the backend and then use the :py:func:`set_backend` method of the tracker.
 
     .. code-block:: python
 
         mybackend = SQLiteAchievementBackend('/some/db.file')
         tracker.set_backend(mybackend)
+
+    The state of achievements with ``has_state`` set is stored as JSON in the
+    ``pychievements_state`` table. Event ids are stored in the ``pychievements_events`` table, in
+    the same transaction as the level they were set with. Event ids older than ``event_window``
+    seconds are deleted as new ones are added.
+
+    Queries have a fixed set of shapes, so each is compiled once per connection and then reused
+    from the connection's statement cache, which holds ``cached_statements`` statements. Each
+    thread reuses its cursors rather than creating one per call.
+
+    New databases are created with the latest schema. Databases created by older versions of
+    pychievements should be upgraded with :py:func:`migrate` (or
+    ``pychievements --db /some/db.file migrate``), which adds the indexes used by lookups,
+    :py:func:`leaderboard` and bulk operations.
     """
-    def __init__(self, dbfile):
-        self.conn = sqlite3.connect(dbfile)
-        with self.conn:
-            c = self.conn.cursor()
+    # schema migrations, applied in order by migrate(). The index of a migration + 1 is the schema
+    # version (``pragma user_version``) it upgrades the database to.
+    migrations = (
+        ('unique levels and leaderboard index', (
+            'delete from pychievements where rowid not in (select rowid from (select rowid, '
+            'max(level) from pychievements group by tracked_id, achievement))',
+            'create unique index if not exists pychievements_tracked_achievement on pychievements '
+            '(tracked_id, achievement)',
+            'create index if not exists pychievements_achievement_level on pychievements '
+            '(achievement, level)',
+        )),
+    )
+
+    # size of each connection's compiled statement cache, large enough for every query the backend
+    # makes at each ``in (...)`` list size
+    cached_statements = 256
+
+    # number of event ids stored between deletions of expired event ids
+    prune_events_every = 1000
+
+    def __init__(self, dbfile, pooled=False, max_readers=8):
+        self.dbfile = dbfile
+        self.pooled = pooled
+        self.max_readers = max_readers
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._readers_lock = threading.Lock()
+        self._readers = []
+        self._idle = _queue.Queue()
+        self.conn = self._connect(check_same_thread=not pooled)
+        with self._write_lock, self.conn:
+            c = self._cursor(self.conn)
+            if pooled:
+                c.execute('pragma journal_mode=wal')
+            c.execute("select 1 from sqlite_master where type='table' and name='pychievements'")
+            created = c.fetchone() is None
             c.execute('create table if not exists pychievements (tracked_id text, '
                       'achievement text, level integer)')
+            if created:
+                # a new database starts at the latest schema, so it never needs migrating
+                for _, statements in self.migrations:
+                    for statement in statements:
+                        c.execute(statement)
+                c.execute('pragma user_version = %d' % len(self.migrations))
+            c.execute('create table if not exists pychievements_state (tracked_id text, '
+                      'achievement text, state text, primary key (tracked_id, achievement))')
+            c.execute('create table if not exists pychievements_events (tracked_id text, '
+                      'achievement text, event_id text, created real, '
+                      'primary key (tracked_id, achievement, event_id))')
+            c.execute('create index if not exists pychievements_events_created on '
+                      'pychievements_events (created)')
+        self._events_added = 0
+
+    def _connect(self, **kwargs):
+        # sqlite3 is imported here so importing pychievements does not pay for loading it
+        import sqlite3
+        return sqlite3.connect(self.dbfile, cached_statements=self.cached_statements, **kwargs)
+
+    def _cursor(self, conn):
+        """ Returns the current thread's cursor for ``conn`` """
+        cursors = getattr(self._local, 'cursors', None)
+        if cursors is None:
+            cursors = self._local.cursors = {}
+        c = cursors.get(conn)
+        if c is None:
+            c = cursors[conn] = conn.cursor()
+        return c
+
+    @contextmanager
+    def _reader(self):
+        """
+        Checks out the connection to use for a read. Pooled backends hand out an idle reader
+        connection, open a new one while fewer than ``max_readers`` are open, or else wait for one
+        to be returned.
+        """
+        if not self.pooled:
+            yield self.conn
+            return
+        try:
+            conn = self._idle.get_nowait()
+        except _queue.Empty:
+            conn = None
+            with self._readers_lock:
+                if len(self._readers) < self.max_readers:
+                    conn = self._connect(check_same_thread=False)
+                    self._readers.append(conn)
+            if conn is None:
+                conn = self._idle.get()
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+    def close(self):
+        """ Closes all connections opened by the backend """
+        with self._write_lock, self._readers_lock:
+            for conn in self._readers:
+                conn.close()
+            self._readers = []
+            self._idle = _queue.Queue()
+            self.conn.close()
+        self._local = threading.local()
+
+    @staticmethod
+    def _states(cursor, tracked_id, achievements):
+        """ Returns the stored state of each achievement with ``has_state`` set, by name """
+        names = list(set(_.__name__ for _ in achievements if _.has_state))
+        if not names:
+            return {}
+        import json
+        states = {}
+        for placeholders, values in _in_lists(names):
+            cursor.execute('select achievement, state from pychievements_state where tracked_id=? '
+                           'and achievement in (%s)' % placeholders, [tracked_id] + values)
+            states.update((_[0], json.loads(_[1])) for _ in cursor.fetchall())
+        return states
+
+    @staticmethod
+    def _set_state(cursor, tracked_id, name, state):
+        import json
+        cursor.execute('insert or replace into pychievements_state values (?, ?, ?)',
+                       (tracked_id, name, json.dumps(state, separators=(',', ':'))))
+
+    def _add_event(self, cursor, tracked_id, name, event_id):
+        """
+        Records ``event_id`` within the current transaction, returning False if it was already
+        recorded within ``event_window`` seconds
+        """
+        now = time.time()
+        cursor.execute('delete from pychievements_events where tracked_id=? and achievement=? and '
+                       'event_id=? and created<?', (tracked_id, name, str(event_id),
+                                                    now - self.event_window))
+        cursor.execute('insert or ignore into pychievements_events values (?, ?, ?, ?)',
+                       (tracked_id, name, str(event_id), now))
+        if not cursor.rowcount:
+            return False
+        self._events_added += 1
+        if self._events_added >= self.prune_events_every:
+            self._events_added = 0
+            cursor.execute('delete from pychievements_events where created<?',
+                           (now - self.event_window,))
+        return True
+
+    def has_event(self, tracked_id, achievement, event_id):
+        with self._reader() as conn:
+            c = self._cursor(conn)
+            c.execute('select 1 from pychievements_events where tracked_id=? and achievement=? and '
+                      'event_id=? and created>=?', (str(tracked_id), achievement.__name__,
+                                                    str(event_id), time.time() - self.event_window))
+            return c.fetchone() is not None
 
     def achievement_for_id(self, tracked_id, achievement):
-        with self.conn:
-            c = self.conn.cursor()
+        with self._reader() as conn:
+            c = self._cursor(conn)
             c.execute('select level from pychievements where achievement=? and tracked_id=?',
                       (achievement.__name__, str(tracked_id)))
             rows = c.fetchall()
-            if not rows:
-                c.execute('insert into pychievements values(?, ?, ?)',
-                          (str(tracked_id), achievement.__name__, 0))
-                return achievement(current=0)
-            return achievement(current=rows[0][0])
+            if rows:
+                states = self._states(c, str(tracked_id), [achievement])
+        if rows:
+            return _restore(achievement, rows[0][0], states.get(achievement.__name__))
+        with self._write_lock, self.conn:
+            c = self._cursor(self.conn)
+            c.execute('insert into pychievements select ?, ?, ? where not exists (select 1 from '
+                      'pychievements where achievement=? and tracked_id=?)',
+                      (str(tracked_id), achievement.__name__, 0, achievement.__name__,
+                       str(tracked_id)))
+        return achievement(current=0)
 
     def achievements_for_id(self, tracked_id, achievements):
-        r = []
-        achievements = dict((_.__name__, _) for _ in achievements)
-        with self.conn:
-            c = self.conn.cursor()
-            c.execute('select achievement, level from pychievements where tracked_id=? and '
-                      'achievement in (%s)' % ','.join('?'*len(achievements.keys())),
-                      [str(tracked_id)] + list(achievements.keys()))
-            rows = c.fetchall()
-            for i, _ in enumerate(rows):
-                r.append(achievements[_[0]](current=_[1]))
-        return r
+        names = list(set(_.__name__ for _ in achievements))
+        levels = {}
+        with self._reader() as conn:
+            c = self._cursor(conn)
+            for placeholders, values in _in_lists(names):
+                c.execute('select achievement, level from pychievements where tracked_id=? and '
+                          'achievement in (%s)' % placeholders, [str(tracked_id)] + values)
+                levels.update(c.fetchall())
+            states = self._states(c, str(tracked_id), achievements)
+        return [_restore(_, levels.get(_.__name__, 0), states.get(_.__name__))
+                for _ in achievements]
 
-    def set_level_for_id(self, tracked_id, achievement, level):
-        with self.conn:
-            c = self.conn.cursor()
-            c.execute('update pychievements set level=? where achievement=? and tracked_id=?',
-                      (level, achievement.__name__, str(tracked_id)))
+    def set_level_for_id(self, tracked_id, achievement, level, state=None, event_id=None):
+        with self._write_lock, self.conn:
+            c = self._cursor(self.conn)
+            if event_id is not None and not self._add_event(c, str(tracked_id),
+                                                            achievement.__name__, event_id):
+                return False
+            self._upsert(c, str(tracked_id), achievement.__name__, level, state)
+
+    def increment_level_for_id(self, tracked_id, achievement, amount=1, event_id=None):
+        """
+        Atomically increments the level of an achievement, returning the new level. The level is
+        updated and read back within a single write transaction, so concurrent increments from
+        other threads are never lost. If an ``event_id`` is given, it is recorded in the same
+        transaction, and False is returned without incrementing if it had already been recorded.
+        """
+        name = achievement.__name__
+        with self._write_lock, self.conn:
+            c = self._cursor(self.conn)
+            if event_id is not None and not self._add_event(c, str(tracked_id), name, event_id):
+                return False
+            c.execute('update pychievements set level=level+? where achievement=? and tracked_id=?',
+                      (amount, name, str(tracked_id)))
+            if not c.rowcount:
+                c.execute('insert into pychievements values(?, ?, ?)',
+                          (str(tracked_id), name, amount))
+                return amount
+            c.execute('select level from pychievements where achievement=? and tracked_id=?',
+                      (name, str(tracked_id)))
+            return c.fetchone()[0]
 
     def get_tracked_ids(self):
-        with self.conn:
-            c = self.conn.cursor()
+        with self._reader() as conn:
+            c = self._cursor(conn)
             c.execute('select distinct tracked_id from pychievements')
             rows = c.fetchall()
             return [_[0] for _ in rows]
 
     def remove_id(self, tracked_id):
-        with self.conn:
-            c = self.conn.cursor()
+        with self._write_lock, self.conn:
+            c = self._cursor(self.conn)
             c.execute('delete from pychievements where tracked_id=?', (str(tracked_id),))
+            c.execute('delete from pychievements_state where tracked_id=?', (str(tracked_id),))
+            c.execute('delete from pychievements_events where tracked_id=?', (str(tracked_id),))
+
+    def iter_levels(self, achievement=None, batch_size=1000):
+        query = 'select rowid, tracked_id, achievement, level from pychievements where rowid > ?'
+        args = ()
+        if achievement is not None:
+            query += ' and achievement=?'
+            args = (achievement.__name__,)
+        last = 0
+        while True:
+            # page on rowid rather than holding a cursor open, so callers can write between pages
+            with self._reader() as conn:
+                c = self._cursor(conn)
+                c.execute(query + ' order by rowid limit ?', (last,) + args + (batch_size,))
+                rows = c.fetchall()
+            if not rows:
+                return
+            for _ in rows:
+                yield _[1:]
+            last = rows[-1][0]
+
+    def iter_events(self, batch_size=1000):
+        """
+        Yields ``(tracked_id, achievement name, event_id, created)`` for every event id recorded
+        within the last ``event_window`` seconds, reading ``batch_size`` rows at a time
+        """
+        since = time.time() - self.event_window
+        last = 0
+        while True:
+            with self._reader() as conn:
+                c = self._cursor(conn)
+                c.execute('select rowid, tracked_id, achievement, event_id, created from '
+                          'pychievements_events where rowid>? and created>=? order by rowid '
+                          'limit ?', (last, since, batch_size))
+                rows = c.fetchall()
+            if not rows:
+                return
+            for _ in rows:
+                yield _[1:]
+            last = rows[-1][0]
+
+    def add_events(self, rows, batch_size=1000):
+        """
+        Records each ``(tracked_id, achievement name, event_id, created)`` in ``rows``, such as
+        those yielded by :py:func:`iter_events`, in batched transactions
+        """
+        for batch in _batches(rows, batch_size):
+            with self._write_lock, self.conn:
+                self._cursor(self.conn).executemany('insert or ignore into pychievements_events '
+                                                    'values (?, ?, ?, ?)', batch)
+
+    @classmethod
+    def _upsert(cls, cursor, tracked_id, name, level, state=None):
+        cursor.execute('update pychievements set level=? where achievement=? and tracked_id=?',
+                       (level, name, tracked_id))
+        if not cursor.rowcount:
+            cursor.execute('insert into pychievements values(?, ?, ?)', (tracked_id, name, level))
+        if state is not None:
+            cls._set_state(cursor, tracked_id, name, state)
+
+    def set_levels(self, rows, batch_size=1000):
+        count = 0
+        for batch in _batches(rows, batch_size):
+            with self._write_lock, self.conn:
+                c = self._cursor(self.conn)
+                for tracked_id, achievement, level in batch:
+                    self._upsert(c, str(tracked_id), achievement.__name__, level)
+            count += len(batch)
+        return count
+
+    def leaderboard(self, achievement, limit=10):
+        with self._reader() as conn:
+            c = self._cursor(conn)
+            c.execute('select tracked_id, level from pychievements where achievement=? order by '
+                      'level desc, tracked_id limit ?', (achievement.__name__, limit))
+            return c.fetchall()
+
+    def summary(self):
+        with self._reader() as conn:
+            c = self._cursor(conn)
+            c.execute('select count(distinct tracked_id), count(*) from pychievements')
+            tracked_ids, levels = c.fetchone()
+            c.execute('select achievement, count(*), sum(level), max(level) from pychievements '
+                      'group by achievement')
+            achievements = dict((_[0], {'count': _[1], 'total': _[2], 'max': _[3]})
+                                for _ in c.fetchall())
+        return {'tracked_ids': tracked_ids, 'levels': levels, 'achievements': achievements}
+
+    def vacuum(self):
+        with self._write_lock:
+            if self.pooled:
+                self.conn.execute('pragma wal_checkpoint(truncate)')
+            self.conn.execute('vacuum')
+            self.conn.execute('pragma optimize')
+
+    def migrate(self):
+        applied = []
+        with self._write_lock:
+            version = self.conn.execute('pragma user_version').fetchone()[0]
+            for i, (name, statements) in enumerate(self.migrations[version:], version + 1):
+                with self.conn:
+                    for statement in statements:
+                        self.conn.execute(statement)
+                    self.conn.execute('pragma user_version = %d' % i)
+                applied.append(name)
+        return applied
+
+
+class QueuedSQLiteAchievementBackend(SQLiteAchievementBackend):
+    """
+    Stores achievement data in a SQLite database, funneling all writes through a single writer
+    thread.
+
+    Calls to :py:func:`set_level_for_id` do not touch the database. Instead the update is placed on
+    a queue and a ``Future`` is returned. The writer thread drains the queue every
+    ``commit_interval`` seconds and commits all pending updates (up to ``max_batch``) in a single
+    transaction, resolving each future once its update is durable. If a transaction fails, the
+    error is logged, set on the futures of its updates and raised by the next call to
+    :py:func:`flush` or :py:func:`close`, as the updates are lost. Reads made before an update has
+    been committed still see the queued level, so the backend can safely be used by a tracker
+    that increments the same ``tracked_id`` many times in a row. Event ids are committed in the
+    same transaction as their level, and queued event ids are already seen by
+    :py:func:`has_event`.
+
+    Through a tracker, ``AchievementTracker.set_level`` returns the ``Future`` of its update.
+    ``increment`` and ``evaluate`` return the achieved goals instead, and increments are queued
+    by :py:func:`increment_level_for_id`, which returns the new level. To know when those updates
+    are durable, call :py:func:`flush`, or call :py:func:`set_level_for_id` on the backend
+    directly.
+
+    The backend is always pooled (see :py:class:`SQLiteAchievementBackend`) and can be shared
+    between threads.
+
+    Arguments:
+
+        dbfile
+            The full path and file name to store the SQLite database
+
+        commit_interval
+            Seconds the writer thread waits for more updates to arrive before committing
+
+        max_batch
+            The most updates that will be committed in a single transaction
+
+        max_readers
+            The most reader connections to open, see :py:class:`SQLiteAchievementBackend`
+
+    .. code-block:: python
+
+        mybackend = QueuedSQLiteAchievementBackend('/some/db.file')
+        tracker.set_backend(mybackend)
+        ...
+        mybackend.flush()  # wait for all queued updates to be committed
+    """
+    def __init__(self, dbfile, commit_interval=0.005, max_batch=10000, max_readers=8):
+        from concurrent.futures import Future
+        SQLiteAchievementBackend.__init__(self, dbfile, pooled=True, max_readers=max_readers)
+        self._future = Future
+        self.commit_interval = commit_interval
+        self.max_batch = max_batch
+        self._queue = _queue.Queue()
+        self._pending = {}
+        self._pending_events = set()
+        self._error = None
+        self._pending_lock = threading.Lock()
+        self._writer = threading.Thread(target=self._write_loop, name='pychievements-writer')
+        self._writer.daemon = True
+        self._writer.start()
+
+    def _write_loop(self):
+        while True:
+            batch = [self._queue.get()]
+            if batch[0] is not _STOP:
+                time.sleep(self.commit_interval)
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except _queue.Empty:
+                    break
+            updates = [_ for _ in batch if _ is not _STOP]
+            self._commit(updates)
+            for _ in batch:
+                self._queue.task_done()
+            if len(updates) != len(batch):
+                return
+
+    def _commit(self, updates):
+        if not updates:
+            return
+        results = []
+        try:
+            with self._write_lock, self.conn:
+                c = self._cursor(self.conn)
+                for (tracked_id, name), (level, state), future, event_id in updates:
+                    if event_id is None or self._add_event(c, tracked_id, name, event_id):
+                        self._upsert(c, tracked_id, name, level, state)
+                        results.append(level)
+                    else:
+                        results.append(False)
+        except Exception as err:
+            import logging
+            logging.getLogger(__name__).error('Failed to commit %d queued updates', len(updates),
+                                              exc_info=True)
+            error = err
+            if self._error is None:
+                self._error = err
+        else:
+            error = None
+        with self._pending_lock:
+            for key, update, future, event_id in updates:
+                if self._pending.get(key) is update:
+                    del self._pending[key]
+                self._pending_events.discard(key + (event_id,))
+        for i, (_, _, future, _) in enumerate(updates):
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(results[i])
+
+    def _pending_update(self, tracked_id, achievement):
+        """ Returns the queued ``(level, state)`` for an achievement, or None """
+        with self._pending_lock:
+            return self._pending.get((str(tracked_id), achievement.__name__))
+
+    def has_event(self, tracked_id, achievement, event_id):
+        with self._pending_lock:
+            if (str(tracked_id), achievement.__name__, event_id) in self._pending_events:
+                return True
+        return SQLiteAchievementBackend.has_event(self, tracked_id, achievement, event_id)
+
+    def achievement_for_id(self, tracked_id, achievement):
+        update = self._pending_update(tracked_id, achievement)
+        if update is not None:
+            return _restore(achievement, *update)
+        with self._reader() as conn:
+            c = self._cursor(conn)
+            c.execute('select level from pychievements where achievement=? and tracked_id=?',
+                      (achievement.__name__, str(tracked_id)))
+            rows = c.fetchall()
+            if rows:
+                states = self._states(c, str(tracked_id), [achievement])
+        if rows:
+            return _restore(achievement, rows[0][0], states.get(achievement.__name__))
+        self.set_level_for_id(tracked_id, achievement, 0)
+        return achievement(current=0)
+
+    def achievements_for_id(self, tracked_id, achievements):
+        # queued updates are read first, as they may be committed, and no longer queued, by the
+        # time the database has been read
+        key = str(tracked_id)
+        with self._pending_lock:
+            pending = dict((_.__name__, self._pending[(key, _.__name__)]) for _ in achievements
+                           if (key, _.__name__) in self._pending)
+        r = SQLiteAchievementBackend.achievements_for_id(self, tracked_id, achievements)
+        for i, a in enumerate(r):
+            update = pending.get(a.__class__.__name__)
+            if update is not None:
+                r[i] = _restore(a.__class__, *update)
+        return r
+
+    def set_level_for_id(self, tracked_id, achievement, level, state=None, event_id=None):
+        """
+        Queues the ``level`` (and ``state``) for an ``Achievement`` for the given ``tracked_id`` to
+        be written. Returns a ``Future`` that resolves to the level once it has been committed, or
+        False if a level has already been set for ``event_id``.
+        """
+        key = (str(tracked_id), achievement.__name__)
+        update = (level, state)
+        if event_id is not None and self.has_event(tracked_id, achievement, event_id):
+            return False
+        future = self._future()
+        with self._pending_lock:
+            if event_id is not None:
+                if key + (event_id,) in self._pending_events:
+                    return False
+                self._pending_events.add(key + (event_id,))
+            self._pending[key] = update
+            self._queue.put((key, update, future, event_id))
+        return future
+
+    def increment_level_for_id(self, tracked_id, achievement, amount=1, event_id=None):
+        """
+        Atomically increments the level of an achievement and queues the new level to be written,
+        returning the new level. The current level is read from the queued updates, or from the
+        database if there are none, while holding the lock for the queued updates. If an
+        ``event_id`` is given, it is checked and queued under the same lock, and False is returned
+        without incrementing if a level has already been set for it.
+        """
+        key = (str(tracked_id), achievement.__name__)
+        future = self._future()
+        with self._pending_lock:
+            if event_id is not None:
+                if key + (event_id,) in self._pending_events or \
+                        SQLiteAchievementBackend.has_event(self, tracked_id, achievement, event_id):
+                    return False
+                self._pending_events.add(key + (event_id,))
+            update = self._pending.get(key)
+            if update is None:
+                with self._reader() as conn:
+                    c = self._cursor(conn)
+                    c.execute('select level from pychievements where achievement=? and '
+                              'tracked_id=?', (key[1], key[0]))
+                    row = c.fetchone()
+                update = (row[0] if row else 0, None)
+            update = (update[0] + amount, update[1])
+            self._pending[key] = update
+            self._queue.put((key, update, future, event_id))
+        return update[0]
+
+    def flush(self):
+        """
+        Blocks until every queued update has been committed. If a commit failed since the last
+        call to ``flush`` or ``close``, its error is raised.
+        """
+        self._queue.join()
+        self._raise_error()
+
+    def _raise_error(self):
+        error, self._error = self._error, None
+        if error is not None:
+            raise error
+
+    def get_tracked_ids(self):
+        self.flush()
+        return SQLiteAchievementBackend.get_tracked_ids(self)
+
+    def remove_id(self, tracked_id):
+        self.flush()
+        SQLiteAchievementBackend.remove_id(self, tracked_id)
+
+    def iter_levels(self, achievement=None, batch_size=1000):
+        self.flush()
+        return SQLiteAchievementBackend.iter_levels(self, achievement, batch_size)
+
+    def set_levels(self, rows, batch_size=1000):
+        self.flush()
+        return SQLiteAchievementBackend.set_levels(self, rows, batch_size)
+
+    def leaderboard(self, achievement, limit=10):
+        self.flush()
+        return SQLiteAchievementBackend.leaderboard(self, achievement, limit)
+
+    def summary(self):
+        self.flush()
+        return SQLiteAchievementBackend.summary(self)
+
+    def vacuum(self):
+        self.flush()
+        SQLiteAchievementBackend.vacuum(self)
+
+    def migrate(self):
+        self.flush()
+        return SQLiteAchievementBackend.migrate(self)
+
+    def close(self):
+        """ Commits all queued updates, stops the writer thread and closes all connections """
+        if self._writer.is_alive():
+            self._queue.put(_STOP)
+            self._writer.join()
+        SQLiteAchievementBackend.close(self)
+        self._raise_error()
+
+
+class CachedAchievementBackend(AchievementBackend):
+    """
+    Wraps another backend with a bounded LRU cache of ``Achievement`` instances for each
+    (``tracked_id``, ``Achievement``) pair.
+
+    Repeated reads of the same pair, such as calls to ``tracker.current``, ``tracker.achieved``
+    and ``tracker.unachieved`` while rendering a profile, are answered from the cache instead of
+    the wrapped backend. Every write made through this backend (:py:func:`set_level_for_id` and
+    :py:func:`remove_id`) invalidates the affected entries, so all updates must go through the
+    cache rather than directly to the wrapped backend.
+
+    Arguments:
+
+        backend
+            The ``AchievementBackend`` to cache reads from
+
+        max_size
+            The maximum number of cached entries. The least recently used entry is evicted when
+            the cache is full.
+
+        ttl
+            If given, entries older than ``ttl`` seconds are considered stale and re-read from the
+            wrapped backend.
+
+    The ``hits`` and ``misses`` attributes count cache lookups.
+
+    .. code-block:: python
+
+        mybackend = CachedAchievementBackend(SQLiteAchievementBackend('/some/db.file'))
+        tracker.set_backend(mybackend)
+    """
+    def __init__(self, backend, max_size=1024, ttl=None):
+        self.backend = backend
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._cache.pop(key, None)
+            if entry is not None and (self.ttl is None or time.time() - entry[0] < self.ttl):
+                self._cache[key] = entry
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return None
+
+    def _put(self, key, achievement):
+        with self._lock:
+            self._cache.pop(key, None)
+            self._cache[key] = (time.time(), achievement)
+            while len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+
+    def invalidate(self, tracked_id, achievement=None):
+        """
+        Drops cached entries for ``tracked_id``. If an ``achievement`` is given, only the entry for
+        that achievement is dropped.
+        """
+        with self._lock:
+            if achievement is not None:
+                self._cache.pop((tracked_id, achievement.__name__), None)
+            else:
+                for key in [_ for _ in self._cache if _[0] == tracked_id]:
+                    del self._cache[key]
+
+    def clear(self):
+        """ Drops every cached entry and resets the ``hits`` and ``misses`` counters """
+        with self._lock:
+            self._cache.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def achievement_for_id(self, tracked_id, achievement):
+        key = (tracked_id, achievement.__name__)
+        cached = self._get(key)
+        if cached is None:
+            cached = self.backend.achievement_for_id(tracked_id, achievement)
+            self._put(key, cached)
+        return cached
+
+    def achievements_for_id(self, tracked_id, achievements):
+        achievements = list(achievements)
+        r = [self._get((tracked_id, _.__name__)) for _ in achievements]
+        missing = [i for i, _ in enumerate(r) if _ is None]
+        if missing:
+            fetched = self.backend.achievements_for_id(tracked_id,
+                                                       [achievements[_] for _ in missing])
+            for i, a in zip(missing, fetched):
+                self._put((tracked_id, a.__class__.__name__), a)
+                r[i] = a
+        return r
+
+    def has_event(self, tracked_id, achievement, event_id):
+        return self.backend.has_event(tracked_id, achievement, event_id)
+
+    def set_level_for_id(self, tracked_id, achievement, level, state=None, event_id=None):
+        if event_id is not None:
+            r = self.backend.set_level_for_id(tracked_id, achievement, level, state, event_id)
+        elif state is None:
+            r = self.backend.set_level_for_id(tracked_id, achievement, level)
+        else:
+            r = self.backend.set_level_for_id(tracked_id, achievement, level, state)
+        self.invalidate(tracked_id, achievement)
+        return r
+
+    def get_tracked_ids(self):
+        return self.backend.get_tracked_ids()
+
+    def remove_id(self, tracked_id):
+        self.backend.remove_id(tracked_id)
+        self.invalidate(tracked_id)
+
+    def iter_levels(self, achievement=None, batch_size=1000):
+        return self.backend.iter_levels(achievement, batch_size)
+
+    def set_levels(self, rows, batch_size=1000):
+        try:
+            return self.backend.set_levels(rows, batch_size)
+        finally:
+            with self._lock:
+                self._cache.clear()
+
+    def leaderboard(self, achievement, limit=10):
+        return self.backend.leaderboard(achievement, limit)
+
+    def summary(self):
+        return self.backend.summary()
+
+    def vacuum(self):
+        self.backend.vacuum()
+
+    def migrate(self):
+        return self.backend.migrate()
+
+
+class ShardedAchievementBackend(AchievementBackend):
+    """
+    Partitions ``tracked_id`` across several backends, such as a number of SQLite files, so writes
+    for different ``tracked_id`` do not contend for a single database.
+
+    Each ``tracked_id`` is assigned to a shard by the CRC-32 of ``str(tracked_id)``, and all reads
+    and writes for it are routed to that shard. Operations over every ``tracked_id``
+    (:py:func:`get_tracked_ids`, :py:func:`set_levels`, :py:func:`leaderboard`,
+    :py:func:`summary`, :py:func:`vacuum` and :py:func:`migrate`) are run on every shard in
+    parallel from a pool of threads, so the shards must be usable from other threads (e.g.
+    ``SQLiteAchievementBackend`` with ``pooled=True``).
+
+    Arguments:
+
+        backends
+            The list of backends to partition ``tracked_id`` across. The order of the backends
+            determines which shard a ``tracked_id`` is assigned to, and must not change.
+
+        workers
+            Number of threads used for operations over every shard. Defaults to the number of
+            shards. If 1, shards are used one after another from the calling thread.
+
+    .. code-block:: python
+
+        mybackend = ShardedAchievementBackend.from_sqlite(['/some/db.%d' % _ for _ in range(8)])
+        tracker.set_backend(mybackend)
+
+    The number of shards can be changed with :py:func:`reshard`.
+    """
+    def __init__(self, backends, workers=None):
+        self.backends = list(backends)
+        if not self.backends:
+            raise ValueError('ShardedAchievementBackend requires at least one backend')
+        self.workers = workers
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    @classmethod
+    def from_sqlite(cls, dbfiles, workers=None, queued=False):
+        """
+        Creates a sharded backend with a pooled ``SQLiteAchievementBackend`` for each of
+        ``dbfiles``, or a ``QueuedSQLiteAchievementBackend`` if ``queued`` is True.
+        """
+        if queued:
+            backends = [QueuedSQLiteAchievementBackend(_) for _ in dbfiles]
+        else:
+            backends = [SQLiteAchievementBackend(_, pooled=True) for _ in dbfiles]
+        return cls(backends, workers)
+
+    def shard_for(self, tracked_id):
+        """ Returns the backend that stores ``tracked_id`` """
+        return self.backends[_shard_index(tracked_id, len(self.backends))]
+
+    def _map(self, func, *iterables):
+        """
+        Returns ``func(backend, *args)`` for every shard, with ``args`` taken from ``iterables``
+        like ``map``, calling it for each shard in parallel
+        """
+        if self.workers == 1 or len(self.backends) == 1:
+            return list(map(func, self.backends, *iterables))
+        with self._executor_lock:
+            if self._executor is None:
+                from concurrent.futures import ThreadPoolExecutor
+                self._executor = ThreadPoolExecutor(self.workers or len(self.backends))
+        return list(self._executor.map(func, self.backends, *iterables))
+
+    def achievement_for_id(self, tracked_id, achievement):
+        return self.shard_for(tracked_id).achievement_for_id(tracked_id, achievement)
+
+    def achievements_for_id(self, tracked_id, achievements):
+        return self.shard_for(tracked_id).achievements_for_id(tracked_id, achievements)
+
+    def has_event(self, tracked_id, achievement, event_id):
+        return self.shard_for(tracked_id).has_event(tracked_id, achievement, event_id)
+
+    def set_level_for_id(self, tracked_id, achievement, level, state=None, event_id=None):
+        shard = self.shard_for(tracked_id)
+        if event_id is not None:
+            return shard.set_level_for_id(tracked_id, achievement, level, state, event_id)
+        if state is None:
+            return shard.set_level_for_id(tracked_id, achievement, level)
+        return shard.set_level_for_id(tracked_id, achievement, level, state)
+
+    def increment_level_for_id(self, tracked_id, achievement, amount=1, event_id=None):
+        """
+        Increments the level of an achievement on its shard, returning the new level, or False if
+        a level has already been set for ``event_id``. The increment is atomic if the shard has an
+        ``increment_level_for_id`` method.
+        """
+        shard = self.shard_for(tracked_id)
+        increment = getattr(shard, 'increment_level_for_id', None)
+        if increment is not None:
+            if event_id is not None:
+                return increment(tracked_id, achievement, amount, event_id)
+            return increment(tracked_id, achievement, amount)
+        level = shard.achievement_for_id(tracked_id, achievement).current[0] + amount
+        if event_id is not None:
+            if shard.set_level_for_id(tracked_id, achievement, level, None, event_id) is False:
+                return False
+        else:
+            shard.set_level_for_id(tracked_id, achievement, level)
+        return level
+
+    def get_tracked_ids(self):
+        r = []
+        for ids in self._map(lambda _: list(_.get_tracked_ids())):
+            r += ids
+        return r
+
+    def remove_id(self, tracked_id):
+        self.shard_for(tracked_id).remove_id(tracked_id)
+
+    def iter_levels(self, achievement=None, batch_size=1000):
+        for backend in self.backends:
+            for row in backend.iter_levels(achievement, batch_size):
+                yield row
+
+    def set_levels(self, rows, batch_size=1000):
+        count = 0
+        n = len(self.backends)
+        for batch in _batches(rows, batch_size * n):
+            shards = [[] for _ in self.backends]
+            for row in batch:
+                shards[_shard_index(row[0], n)].append(row)
+            count += sum(self._map(lambda b, r: b.set_levels(r, batch_size), shards))
+        return count
+
+    def leaderboard(self, achievement, limit=10):
+        rows = []
+        for r in self._map(lambda _: _.leaderboard(achievement, limit)):
+            rows += r
+        return heapq.nlargest(limit, rows, key=lambda _: _[1])
+
+    def summary(self):
+        r = {'tracked_ids': 0, 'levels': 0, 'achievements': {}}
+        for summary in self._map(lambda _: _.summary()):
+            # every tracked_id is stored by a single shard, so counts can simply be added
+            r['tracked_ids'] += summary['tracked_ids']
+            r['levels'] += summary['levels']
+            for name, a in summary['achievements'].items():
+                total = r['achievements'].setdefault(name, {'count': 0, 'total': 0,
+                                                            'max': a['max']})
+                total['count'] += a['count']
+                total['total'] += a['total']
+                total['max'] = max(total['max'], a['max'])
+        return r
+
+    def vacuum(self):
+        self._map(lambda _: _.vacuum())
+
+    def migrate(self):
+        applied = []
+        for names in self._map(lambda _: _.migrate()):
+            applied += [_ for _ in names if _ not in applied]
+        return applied
+
+    def reshard(self, backends, achievements, batch_size=1000):
+        """
+        Copies every stored level (and state) into a new list of ``backends``, streaming
+        ``batch_size`` rows at a time from each existing shard, then switches to using them.
+        Returns the number of levels copied. The existing backends are not modified or closed.
+
+        Recorded event ids are copied too, when the existing shard has an ``iter_events`` method
+        and the new one an ``add_events`` method, as SQLite backends do. For other backends event
+        ids are not copied, so events replayed within ``event_window`` seconds of resharding are
+        counted again.
+
+        ``achievements`` are the ``Achievement`` classes stored by the backend, usually
+        ``tracker.achievements()``. Raises ValueError if a stored level is for any other
+        achievement.
+
+        Levels updated while resharding may not be copied, so updates should be paused until
+        this returns.
+        """
+        classes = dict((_.__name__, _) for _ in achievements)
+        target = ShardedAchievementBackend(backends, self.workers)
+        count = 0
+        for shard in self.backends:
+            for batch in _batches(shard.iter_levels(batch_size=batch_size), batch_size):
+                rows = []
+                for tracked_id, name, level in batch:
+                    if name not in classes:
+                        raise ValueError('Could not reshard levels of %s, it was not given in '
+                                         'achievements' % name)
+                    rows.append((tracked_id, classes[name], level))
+                target.set_levels(rows, batch_size)
+                for tracked_id, achievement, level in rows:
+                    if achievement.has_state:
+                        state = shard.achievement_for_id(tracked_id, achievement).get_state()
+                        target.set_level_for_id(tracked_id, achievement, level, state)
+                count += len(rows)
+            events = getattr(shard, 'iter_events', None)
+            if events is None:
+                continue
+            for batch in _batches(events(batch_size), batch_size):
+                shards = OrderedDict()
+                for row in batch:
+                    shards.setdefault(target.shard_for(row[0]), []).append(row)
+                for backend, rows in shards.items():
+                    if hasattr(backend, 'add_events'):
+                        backend.add_events(rows, batch_size)
+        target._close_pool()
+        self.backends = target.backends
+        # the pool is sized for the number of shards
+        self._close_pool()
+        return count
+
+    def _close_pool(self):
+        """ Stops the pool of threads, which is started again when it is next needed """
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+    def close(self):
+        """ Closes every shard that can be closed, and stops the pool of threads """
+        self._close_pool()
+        for backend in self.backends:
+            if hasattr(backend, 'close'):
+                backend.close()
+
+
+def _shard_index(tracked_id, shards):
+    return (zlib.crc32(str(tracked_id).encode('utf-8')) & 0xffffffff) % shards
@@ -1,5 +1,8 @@
+import re
+import sys
+
 from . import tracker as _defaulttracker
-from .achievements import Achievement
+from .achievements import Achievement, Goal
 from inspect import isclass as _isclass
 
 try:
@@ -8,54 +11,151 @@ except ImportError:
     from itertools import izip_longest as _zip_longest
 
 
-def print_goal(goal, achieved=False, level=None, indent=2):
+# rendered icon and description blocks, keyed on the goal, achieved state, width and indent
+_render_cache = {}
+_RENDER_CACHE_SIZE = 1024
+
+
+def _console_width():
+    from clint.textui.cols import console_width
+    return console_width({})
+
+
+def _write(lines, indent=0):
+    """ Writes ``lines`` to stdout in a single write, indented like clint's ``puts`` """
+    from clint.textui.core import INDENT_STRINGS
+    prefix = ''.join(INDENT_STRINGS) + ' ' * indent
+    sys.stdout.write(''.join(prefix + _ + '\n' for _ in lines))
+
+
+def _render_goal(goal, achieved, width, indent):
+    """
+    Returns the icon lines, icon width, icon display width and description lines for a goal,
+    rendering them only the first time a goal is displayed with the given options.
+    """
+    if isinstance(goal, Goal):
+        key = (goal, achieved, width, indent)
+    else:
+        key = (goal['level'], goal['name'], goal['description'], goal['icon'], achieved, width,
+               indent)
+    block = _render_cache.get(key)
+    if block is None:
+        from clint.textui.cols import columns
+        icon = (goal['icon'].achieved() if achieved else goal['icon'].unachieved()).split('\n')
+        maxiw = max([len(str(_)) for _ in icon])
+        maxitw = max([len(_) for _ in icon])
+        descw = width-maxiw-(indent + 4)
+        desc = '{0}\n{1}\n\n{2}'.format(goal['name'], '-'*len(goal['name']),
+                                        columns([goal['description'], descw],
+                                                width=width)).split('\n')
+        block = (tuple(icon), maxiw, maxitw, tuple(_.strip() for _ in desc))
+        if len(_render_cache) >= _RENDER_CACHE_SIZE:
+            _render_cache.clear()
+        _render_cache[key] = block
+    return block
+
+
+def print_goal(goal, achieved=False, level=None, indent=2, width=None):
     """ Print a goals description with its icon. Achieved (True/False) will choose the correct icon
     from the goal. If a level is specified, a tracker line will be added under the icon showing
     the current level out of the required level for the goal. If level is > the required level,
     achieved will be set to true.
+
+    ``width`` is the width of the console, which will be determined if it is not given.
     """
-    from clint.textui import puts
-    from clint.textui import indent as _indent
-    from clint.textui.cols import columns, console_width
     if level is not None and level >= goal['level']:
         achieved = True
-    icon = (goal['icon'].achieved() if achieved else goal['icon'].unachieved()).split('\n')
-    maxiw = max([len(str(_)) for _ in icon])
-    descw = console_width({})-maxiw-(indent + 4)
-    desc = '{0}\n{1}\n\n{2}'.format(goal['name'], '-'*len(goal['name']),
-                                    columns([goal['description'], descw])).split('\n')
+    if width is None:
+        width = _console_width()
+    icon, maxiw, maxitw, desc = _render_goal(goal, achieved, width, indent)
     if level is not None:
         if level > goal['level']:
             level = goal['level']
-        maxitw = max([len(_) for _ in icon])
-        icon.append(("%d/%d" % (level, goal['level'])).center(maxitw))
-    with _indent(indent):
-        for i, d in _zip_longest(icon, desc):
-            puts("{1:{0}}    {2}".format(maxiw, str(i) if i is not None else "",
-                                         d.strip() if d is not None else ""))
+        icon = icon + (("%d/%d" % (level, goal['level'])).center(maxitw),)
+    _write(["{1:{0}}    {2}".format(maxiw, str(i) if i is not None else "",
+                                    d if d is not None else "")
+            for i, d in _zip_longest(icon, desc)], indent)
+
+
+# fields written for each goal by the structured (json/tsv) output formats
+GOAL_FIELDS = ('achievement', 'name', 'category', 'goal', 'goal_level', 'description')
+TRACKED_GOAL_FIELDS = ('tracked_id', 'achievement', 'goal', 'goal_level', 'level', 'achieved')
+
+FORMATS = ('text', 'json', 'tsv')
+
+
+def _check_format(format):
+    if format not in FORMATS:
+        raise ValueError('Unknown output format %r, must be one of %s' % (format,
+                                                                         ', '.join(FORMATS)))
+
+
+def _tsv_value(value):
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n')
+
+
+_TSV_ESCAPES = {'\\': '\\', 't': '\t', 'n': '\n'}
 
 
-def print_goals(achievement_or_iter, indent=2):
+def _tsv_unescape(value):
+    """ Reverses ``_tsv_value`` """
+    return re.sub(r'\\(.)', lambda m: _TSV_ESCAPES.get(m.group(1), m.group(0)), value)
+
+
+def _write_records(records, fields, format, stream=None, header=True):
+    """
+    Writes each record (a tuple of values for ``fields``) to ``stream`` as it is produced, either
+    as JSON lines (``format='json'``) or as tab separated values (``format='tsv'``), optionally
+    preceded by a header line.
+    """
+    if stream is None:
+        stream = sys.stdout
+    if format == 'json':
+        import json
+        for r in records:
+            stream.write(json.dumps(dict(zip(fields, r))) + '\n')
+    else:
+        if header:
+            stream.write('\t'.join(fields) + '\n')
+        for r in records:
+            stream.write('\t'.join(_tsv_value(_) for _ in r) + '\n')
+    stream.flush()
+
+
+def _print_header(achievement, indent, width):
+    _write(["{0}".format(achievement.name), '='*(width-indent-2), ''], indent)
+
+
+def print_goals(achievement_or_iter, indent=2, format='text', stream=None):
     """
     Displays all of the available goals registered for the given achievement(s)
+
+    If ``format`` is ``'json'`` or ``'tsv'``, one JSON object or tab separated line is written per
+    goal to ``stream`` (defaults to stdout) instead, with the fields in ``GOAL_FIELDS``. Icons are
+    not rendered and clint is not required for these formats.
     """
-    from clint.textui import puts
-    from clint.textui.cols import console_width
-    from clint.textui import indent as _indent
+    _check_format(format)
     if _isclass(achievement_or_iter) and issubclass(achievement_or_iter, Achievement):
         achievement_or_iter = [achievement_or_iter]
 
+    if format != 'text':
+        _write_records(((a.__name__, a.name, a.category, g['name'], g['level'], g['description'])
+                        for a in achievement_or_iter for g in a.goals), GOAL_FIELDS, format,
+                       stream)
+        return
+
+    width = _console_width()
     for achievement in achievement_or_iter:
-        with _indent(indent):
-            puts("{0}\n{1}\n".format(achievement.name, '='*(console_width({})-indent-2)))
+        _print_header(achievement, indent, width)
         for goal in achievement.goals:
-            print_goal(goal, True, indent=indent)
-            puts("\n")
+            print_goal(goal, True, indent=indent, width=width)
+            _write(['', ''])
 
 
 def print_goals_for_tracked(tracked_id, achievement_or_iter=None, achieved=True, unachieved=False,
                             only_current=False, level=False, category=None, keywords=[],
-                            indent=2, tracker=None):
+                            indent=2, tracker=None, offset=0, limit=None, batch_size=50,
+                            format='text', stream=None, header=True):
     """
     Prints goals for a specific ``tracked_id`` from as tracked by a ``tracker``. By default, this
     will print out all achieved goals for every achievement in the ``tracker``.
@@ -63,8 +163,9 @@ def print_goals_for_tracked(tracked_id, achievement_or_iter=None, achieved=True,
     Arguments:
 
         achievment_or_iter
-            If ``None``, this will print goals for all achievements registered with the ``tracker``.
-            Otherwise an ``Achievement`` or list of achievements can be given to show goals for.
+            If ``None``, this will print goals for all achievements registered with the ``tracker``
+            that match ``category`` and ``keywords``. Otherwise an ``Achievement`` or list of
+            achievements can be given to show goals for.
 
         achieved
             If True, prints out goals that have allready been achieved.
@@ -88,28 +189,73 @@ def print_goals_for_tracked(tracked_id, achievement_or_iter=None, achieved=True,
         tracker
             The tracker to use for getting information about achievements and ``tracked_id``. If
             ``tracker`` is ``None``, this will default to using the default tracker.
+
+        offset
+            Number of achievements to skip before printing.
+
+        limit
+            If given, the maximum number of achievements to print.
+
+        batch_size
+            Number of achievements fetched from the tracker's backend at a time. Each batch is
+            printed as soon as it has been fetched.
+
+        format
+            ``'text'`` (the default) prints goals with their icons. ``'json'`` and ``'tsv'`` write
+            one JSON object or tab separated line per goal to ``stream`` instead, with the fields
+            in ``TRACKED_GOAL_FIELDS``. Icons are not rendered and clint is not required for these
+            formats.
+
+        stream
+            File-like object the ``'json'`` and ``'tsv'`` formats are written to. Defaults to
+            stdout.
+
+        header
+            If False, the ``'tsv'`` format is written without a header line, which is useful
+            when writing goals for many ``tracked_id`` to the same stream.
     """
-    from clint.textui import puts
-    from clint.textui import indent as _indent
-    from clint.textui.cols import console_width
+    _check_format(format)
     if tracker is None:
         tracker = _defaulttracker
 
-    if achievement_or_iter is None:
-        achievement_or_iter = tracker.achievements()
-    elif _isclass(achievement_or_iter) and issubclass(achievement_or_iter, Achievement):
+    if _isclass(achievement_or_iter) and issubclass(achievement_or_iter, Achievement):
         achievement_or_iter = [achievement_or_iter]
 
-    for achievement in achievement_or_iter:
-        with _indent(indent):
-            puts("{0}\n{1}\n".format(achievement.name, '='*(console_width({})-indent-2)))
-        current = tracker.current(tracked_id, achievement)
-        cl = None if not level else current[0]
+    statuses = tracker.iter_status_for_id(tracked_id, category, keywords, achievement_or_iter,
+                                          offset=offset, limit=limit, batch_size=batch_size)
+    if format != 'text':
+        _write_records(((tracked_id, s.achievement.__class__.__name__, g['name'], g['level'],
+                         s.level, s.level >= g['level'])
+                        for s in statuses
+                        for g in _selected_goals(s, achieved, unachieved, only_current)),
+                       TRACKED_GOAL_FIELDS, format, stream, header)
+        return
+
+    width = _console_width()
+    for i, status in enumerate(statuses):
+        achievement = status.achievement
+        _print_header(achievement, indent, width)
+        cl = None if not level else status.level
         if only_current:
-            print_goal(current[1], level=current[0], indent=indent)
+            if status.goal is not None:
+                print_goal(status.goal, level=status.level, indent=indent, width=width)
         else:
-            goals = tracker.achieved(tracked_id, achievement) if achieved else []
-            goals += tracker.unachieved(tracked_id, achievement) if unachieved else []
-            for goal in goals:
-                print_goal(goal, current[0] >= goal['level'], level=cl, indent=indent)
-                puts("\n")
+            for goal in _selected_goals(status, achieved, unachieved, only_current):
+                print_goal(goal, status.level >= goal['level'], level=cl, indent=indent,
+                           width=width)
+                _write(['', ''])
+        if batch_size and not (i + 1) % batch_size:
+            # show each batch before the next one is fetched
+            sys.stdout.flush()
+    sys.stdout.flush()
+
+
+def _selected_goals(status, achieved, unachieved, only_current):
+    """ Returns the goals of an ``AchievementStatus`` to display """
+    if only_current:
+        return [status.goal] if status.goal is not None else []
+    goals = status.achievement.goals
+    selected = list(goals[:status.achieved]) if achieved else []
+    if unachieved:
+        selected += goals[status.achieved:]
+    return selected
@@ -0,0 +1,211 @@
+"""
+pychievements.console implements the ``pychievements`` command, used to operate on a SQLite
+achievement store from the command line.
+
+Achievements are only known to pychievements once they have been registered with the tracker, so
+the modules that register them must be given with ``--module``::
+
+    $ pychievements --db achievements.db --module myapp.achievements stats
+    $ pychievements --db achievements.db --module myapp.achievements leaderboard TheLister -n 5
+    $ pychievements --db achievements.db export -o levels.jsonl
+    $ pychievements --db other.db --module myapp.achievements import levels.jsonl
+    $ pychievements --db achievements.db migrate
+    $ pychievements --db achievements.db vacuum
+    $ pychievements --db achievements.db --module myapp.achievements recompute TheCreator
+    $ pychievements --db achievements.db --module myapp.achievements goals userid --format json
+
+All commands stream rows from the backend and write them in batches, rather than loading
+everything into memory or updating one row at a time.
+"""
+import argparse
+import importlib
+import json
+import sys
+
+from . import tracker as _defaulttracker
+from .backends import SQLiteAchievementBackend
+from .trackers import NotRegistered
+
+LEVEL_FIELDS = ('tracked_id', 'achievement', 'level')
+
+
+def _import_provider(spec):
+    """ Imports a ``module:function`` specification """
+    module, _, func = spec.partition(':')
+    if not func:
+        raise ValueError('Expected module:function, got %r' % spec)
+    return getattr(importlib.import_module(module), func)
+
+
+def cmd_stats(args, tracker, backend):
+    """ Print the number of tracked ids and levels, and totals per achievement """
+    summary = backend.summary()
+    out = args.stdout
+    out.write('tracked ids: %d\n' % summary['tracked_ids'])
+    out.write('levels:      %d\n' % summary['levels'])
+    if summary['achievements']:
+        out.write('\n{0:30} {1:>10} {2:>12} {3:>10}\n'.format('achievement', 'count', 'total',
+                                                            'max'))
+        for name, a in sorted(summary['achievements'].items()):
+            out.write('{0:30} {1:>10} {2:>12} {3:>10}\n'.format(name, a['count'], a['total'],
+                                                              a['max']))
+
+
+def cmd_leaderboard(args, tracker, backend):
+    """ Print the tracked ids with the highest levels for an achievement """
+    achievement = tracker._registered(args.achievement)
+    for rank, (tracked_id, level) in enumerate(backend.leaderboard(achievement, args.limit), 1):
+        args.stdout.write('{0:>4}  {1:>10}  {2}\n'.format(rank, level, tracked_id))
+
+
+def cmd_export(args, tracker, backend):
+    """ Stream every stored level as JSON lines or TSV """
+    from .cli import _write_records
+    achievement = tracker._registered(args.achievement) if args.achievement else None
+    out = open(args.output, 'w') if args.output else args.stdout
+    try:
+        _write_records(backend.iter_levels(achievement, args.batch_size), LEVEL_FIELDS,
+                       args.format, out)
+    finally:
+        if args.output:
+            out.close()
+
+
+def _read_levels(lines, format):
+    if format == 'json':
+        for line in lines:
+            if line.strip():
+                r = json.loads(line)
+                yield r['tracked_id'], r['achievement'], int(r['level'])
+    else:
+        from .cli import _tsv_unescape
+        for i, line in enumerate(lines):
+            fields = line.rstrip('\n').split('\t')
+            if i == 0 and tuple(fields) == LEVEL_FIELDS:
+                continue
+            if line.strip():
+                yield _tsv_unescape(fields[0]), _tsv_unescape(fields[1]), int(fields[2])
+
+
+def cmd_import(args, tracker, backend):
+    """ Load levels written by export, in batched transactions """
+    lines = open(args.input) if args.input else args.stdin
+    try:
+        rows = ((tid, tracker._registered(name), level)
+                for tid, name, level in _read_levels(lines, args.format))
+        count = backend.set_levels(rows, args.batch_size)
+    finally:
+        if args.input:
+            lines.close()
+    args.stdout.write('imported %d levels\n' % count)
+
+
+def cmd_vacuum(args, tracker, backend):
+    """ Reclaim unused space in the database """
+    backend.vacuum()
+
+
+def cmd_migrate(args, tracker, backend):
+    """ Upgrade the database to the latest schema """
+    applied = backend.migrate()
+    for name in applied:
+        args.stdout.write('applied: %s\n' % name)
+    if not applied:
+        args.stdout.write('already up to date\n')
+
+
+def cmd_recompute(args, tracker, backend):
+    """ Re-run evaluate() for an achievement for every tracked id """
+    provider = _import_provider(args.provider) if args.provider else None
+    count = tracker.evaluate_all(args.achievement, provider, workers=args.workers,
+                                 chunk_size=args.batch_size)
+    args.stdout.write('updated %d levels\n' % count)
+
+
+def cmd_goals(args, tracker, backend):
+    """ Print the goals for a tracked id """
+    from .cli import print_goals_for_tracked
+    print_goals_for_tracked(args.tracked_id, achieved=True, unachieved=args.all,
+                            only_current=args.current, level=True, category=args.category,
+                            keywords=args.keyword, tracker=tracker, offset=args.offset,
+                            limit=args.limit, format=args.format, stream=args.stdout)
+
+
+def make_parser():
+    parser = argparse.ArgumentParser(prog='pychievements',
+                                     description='Operate on a pychievements SQLite store')
+    parser.add_argument('--db', required=True, help='SQLite database file')
+    parser.add_argument('-m', '--module', action='append', default=[],
+                        help='module that registers achievements with the tracker (repeatable)')
+    parser.add_argument('--batch-size', type=int, default=1000,
+                        help='rows read or written per batch (default: %(default)s)')
+    sub = parser.add_subparsers(dest='command', metavar='command')
+    sub.required = True
+
+    p = sub.add_parser('stats', help=cmd_stats.__doc__.strip())
+    p.set_defaults(func=cmd_stats)
+
+    p = sub.add_parser('leaderboard', help=cmd_leaderboard.__doc__.strip())
+    p.add_argument('achievement')
+    p.add_argument('-n', '--limit', type=int, default=10)
+    p.set_defaults(func=cmd_leaderboard)
+
+    p = sub.add_parser('export', help=cmd_export.__doc__.strip())
+    p.add_argument('-o', '--output', help='file to write to (default: stdout)')
+    p.add_argument('-a', '--achievement', help='only export levels of this achievement')
+    p.add_argument('--format', choices=('json', 'tsv'), default='json')
+    p.set_defaults(func=cmd_export)
+
+    p = sub.add_parser('import', help=cmd_import.__doc__.strip())
+    p.add_argument('input', nargs='?', help='file to read from (default: stdin)')
+    p.add_argument('--format', choices=('json', 'tsv'), default='json')
+    p.set_defaults(func=cmd_import)
+
+    p = sub.add_parser('vacuum', help=cmd_vacuum.__doc__.strip())
+    p.set_defaults(func=cmd_vacuum)
+
+    p = sub.add_parser('migrate', help=cmd_migrate.__doc__.strip())
+    p.set_defaults(func=cmd_migrate)
+
+    p = sub.add_parser('recompute', help=cmd_recompute.__doc__.strip())
+    p.add_argument('achievement')
+    p.add_argument('--provider', metavar='MODULE:FUNCTION',
+                   help='function called with each tracked_id, returning the arguments to pass '
+                        'to evaluate()')
+    p.add_argument('-j', '--workers', type=int,
+                   help='number of worker processes (default: number of CPUs)')
+    p.set_defaults(func=cmd_recompute)
+
+    p = sub.add_parser('goals', help=cmd_goals.__doc__.strip())
+    p.add_argument('tracked_id')
+    p.add_argument('--all', action='store_true', help='include unachieved goals')
+    p.add_argument('--current', action='store_true', help='only show current goals')
+    p.add_argument('--category')
+    p.add_argument('--keyword', action='append', default=[])
+    p.add_argument('--offset', type=int, default=0)
+    p.add_argument('--limit', type=int)
+    p.add_argument('--format', choices=('text', 'json', 'tsv'), default='text')
+    p.set_defaults(func=cmd_goals)
+    return parser
+
+
+def main(argv=None, tracker=None, stdin=None, stdout=None):
+    """ Entry point for the ``pychievements`` command """
+    args = make_parser().parse_args(argv)
+    args.stdin = stdin or sys.stdin
+    args.stdout = stdout or sys.stdout
+    if tracker is None:
+        tracker = _defaulttracker
+    for module in args.module:
+        importlib.import_module(module)
+
+    backend = SQLiteAchievementBackend(args.db)
+    tracker.set_backend(backend)
+    try:
+        args.func(args, tracker, backend)
+    except (ValueError, NotRegistered) as err:
+        sys.stderr.write('pychievements: error: %s\n' % err)
+        return 1
+    finally:
+        backend.close()
+    return 0
@@ -8,15 +8,70 @@ for CLI applications.
 * star
 
 """
+import sys
 
 
 class ColorCatcher(object):
     def __getattr__(self, name):
         return lambda s: s
-try:
-    from clint.textui import colored
-except ImportError:
-    colored = ColorCatcher()
+
+_colored = None
+
+
+def _load_colored():
+    """
+    Returns clint's ``colored`` module, or a ``ColorCatcher`` if clint is not installed. clint is
+    only imported the first time an icon needs to be colored, not when this module is imported.
+    """
+    global _colored
+    if _colored is None:
+        try:
+            from clint.textui import colored
+        except ImportError:
+            colored = ColorCatcher()
+        _colored = colored
+    return _colored
+
+
+def __getattr__(name):
+    if name == 'colored':
+        return _load_colored()
+    raise AttributeError('module %r has no attribute %r' % (__name__, name))
+
+
+if sys.version_info < (3, 7):
+    # module __getattr__ (PEP 562) is only used by Python 3.7+, so load clint now
+    colored = _load_colored()
+
+
+class DeferredColor(object):
+    """
+    Text that is colored using clint's ``colored`` (e.g. ``deferred.white(text)``) the first time
+    it is rendered, rather than when it is created.
+    """
+    __slots__ = ('color', 'text', '_rendered')
+
+    def __init__(self, color, text):
+        self.color = color
+        self.text = text
+        self._rendered = None
+
+    def render(self):
+        if self._rendered is None:
+            self._rendered = getattr(_load_colored(), self.color)(self.text)
+        return self._rendered
+
+
+class _DeferredColors(object):
+    """ Creates ``DeferredColor`` instances, e.g. ``deferred.white(text)`` """
+    def __getattr__(self, color):
+        return lambda s: DeferredColor(color, s)
+
+deferred = _DeferredColors()
+
+
+def _render(icon):
+    return icon.render() if isinstance(icon, DeferredColor) else icon
 
 
 class Icon(object):
@@ -31,6 +86,13 @@ class Icon(object):
 
         star = Icon(unachieved=' No ', achieved=' Yes ')
 
+    Colored icons can use ``deferred`` so the color is only applied (and clint only imported) when
+    the icon is first displayed:
+
+    .. code-block:: python
+
+        star = Icon(deferred.white(' No '), deferred.yellow(' Yes '))
+
     """
     def __init__(self, unachieved='', achieved=''):
         self._unachieved = unachieved
@@ -38,11 +100,11 @@ class Icon(object):
 
     def unachieved(self, tracked_id=None, achievement=None):
         """ Returns the unachieved icon """
-        return self._unachieved
+        return _render(self._unachieved)
 
     def achieved(self, tracked_id=None, achievement=None):
         """ Returns the achieved icon """
-        return self._achieved
+        return _render(self._achieved)
 
 
 ############################################################################################
@@ -52,7 +114,7 @@ unicodeCheck = Icon('\n\n    ✗  \n', '\n\n    ✓  \n')
 
 ############################################################################################
 # Some built-in ASCII Art icons
-star = Icon(colored.white("""           ..
+star = Icon(deferred.white("""           ..
           .88.
          .8  8.
  ........8    8........
@@ -63,7 +125,7 @@ star = Icon(colored.white("""           ..
     D  88.    .88  D
    D 8.          .8 8
   .D.              .D.
-"""), colored.yellow("""           ..
+"""), deferred.yellow("""           ..
           .88.
          .8888.
  ........888888........
@@ -93,7 +155,7 @@ _ROADRUNNER_STR = r"""
  ~~~"                             /
                                   '
 """
-roadrunner = Icon(colored.white(_ROADRUNNER_STR), colored.yellow(_ROADRUNNER_STR))
+roadrunner = Icon(deferred.white(_ROADRUNNER_STR), deferred.yellow(_ROADRUNNER_STR))
 
 _EAGLE_STR = r"""
             ___
@@ -119,7 +181,7 @@ _EAGLE_STR = r"""
      _/ ,\- (`'  `-',-','-,"-.
     /,-(,- \_\     (-'(,---.:.)
 """
-eagle = Icon(colored.white(_EAGLE_STR), colored.yellow(_EAGLE_STR))
+eagle = Icon(deferred.white(_EAGLE_STR), deferred.yellow(_EAGLE_STR))
 
 
 _BEE_STR = r"""
@@ -137,7 +199,7 @@ _BEE_STR = r"""
      //              'c'c       '\c7*X7~~~~
     ]/                 ~=Xm_       '~=(Gm_.
 """
-bee = Icon(colored.white(_BEE_STR), colored.yellow(_BEE_STR))
+bee = Icon(deferred.white(_BEE_STR), deferred.yellow(_BEE_STR))
 
 _EARTH_STR = r"""
                  ,,,,,,
@@ -157,9 +219,9 @@ _EARTH_STR = r"""
            -.   .         .-
              ''-.oo,oo.-''
 """
-earth = Icon(colored.white(_EARTH_STR), colored.yellow(_EARTH_STR))
+earth = Icon(deferred.white(_EARTH_STR), deferred.yellow(_EARTH_STR))
 
-book = Icon(colored.white("""
+book = Icon(deferred.white("""
         _.-"\\
     _.-"     \\
  ,-"          \\
@@ -171,7 +233,7 @@ book = Icon(colored.white("""
      \ \,-"    _.-"
       \(   _.-"
        `--"
-"""), colored.yellow("""
+"""), deferred.yellow("""
       _.--._  _.--._
 ,-=.-":;:;:;\':;:;:;"-._
 \\\:;:;:;:;:;\:;:;:;:;:;\\
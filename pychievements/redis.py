@@ -0,0 +1,355 @@
+"""
+pychievements.redis stores achievement data in Redis, or any server that speaks the Redis
+protocol (RESP), so it can be shared between hosts. It includes a minimal client,
+:py:class:`RespClient`, so the ``redis`` package is not required.
+
+.. code-block:: python
+
+    from pychievements.redis import RedisAchievementBackend
+
+    tracker.set_backend(RedisAchievementBackend(host='redis.example.com'))
+
+Data is stored in the following keys, all starting with ``prefix``:
+
+    ``<prefix>id:<tracked_id>``
+        A hash of achievement name to level for each ``tracked_id``
+
+    ``<prefix>state:<tracked_id>``
+        A hash of achievement name to JSON state, for achievements with ``has_state`` set
+
+    ``<prefix>leaderboard:<achievement name>``
+        A sorted set of ``tracked_id`` scored by level, for each achievement
+
+    ``<prefix>event:<length>:<tracked_id>:<achievement name>:<event_id>``
+        Set for each event id a level was set for, expiring after ``event_window`` seconds. The
+        ``tracked_id`` is preceded by its length, so the keys of one ``tracked_id`` can not be
+        mistaken for those of another that starts with it
+"""
+from __future__ import absolute_import
+
+import json
+import re
+import socket
+import threading
+
+from .backends import AchievementBackend, _batches, _restore
+
+
+class ResponseError(Exception):
+    """ An error reply from the server """
+    pass
+
+
+def _encode(args):
+    out = [b'*', str(len(args)).encode('ascii'), b'\r\n']
+    for arg in args:
+        if not isinstance(arg, bytes):
+            arg = str(arg).encode('utf-8')
+        out += [b'$', str(len(arg)).encode('ascii'), b'\r\n', arg, b'\r\n']
+    return b''.join(out)
+
+
+def _read_reply(f):
+    """
+    Reads a reply from the file-like object ``f``. Error replies are returned, rather than raised,
+    as ``ResponseError`` instances.
+    """
+    line = f.readline()
+    if not line.endswith(b'\r\n'):
+        raise EOFError('Connection closed')
+    kind, rest = line[:1], line[1:-2]
+    if kind == b'+':
+        return rest.decode('utf-8')
+    if kind == b'-':
+        return ResponseError(rest.decode('utf-8'))
+    if kind == b':':
+        return int(rest)
+    if kind == b'$':
+        size = int(rest)
+        if size < 0:
+            return None
+        data = f.read(size + 2)
+        if len(data) != size + 2:
+            raise EOFError('Connection closed')
+        return data[:-2].decode('utf-8')
+    if kind == b'*':
+        size = int(rest)
+        if size < 0:
+            return None
+        return [_read_reply(f) for _ in range(size)]
+    raise ResponseError('Unexpected reply %r' % line)
+
+
+class RespClient(object):
+    """
+    A minimal Redis protocol client, using a connection per thread.
+
+    Arguments:
+
+        host, port
+            Address of the server
+
+        path
+            Path of a unix socket to connect to instead of ``host`` and ``port``
+
+        db
+            Database number to ``SELECT`` after connecting
+
+        password
+            Password to ``AUTH`` with after connecting
+
+        timeout
+            Socket timeout in seconds
+    """
+    def __init__(self, host='localhost', port=6379, path=None, db=0, password=None,
+                 timeout=None):
+        self.host = host
+        self.port = port
+        self.path = path
+        self.db = db
+        self.password = password
+        self.timeout = timeout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = []
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            if self.path is not None:
+                sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                sock.settimeout(self.timeout)
+                sock.connect(self.path)
+            else:
+                sock = socket.create_connection((self.host, self.port), self.timeout)
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            conn = self._local.conn = (sock, sock.makefile('rb'))
+            with self._lock:
+                self._connections.append(conn)
+            setup = []
+            if self.password is not None:
+                setup.append(['AUTH', self.password])
+            if self.db:
+                setup.append(['SELECT', self.db])
+            if setup:
+                self.pipeline(setup)
+        return conn
+
+    def pipeline(self, commands):
+        """
+        Sends every command in ``commands`` (each a list of arguments) in a single write, then
+        reads their replies. Raises ``ResponseError`` if any command failed.
+        """
+        sock, f = self._connection()
+        try:
+            sock.sendall(b''.join(_encode(_) for _ in commands))
+            replies = [_read_reply(f) for _ in commands]
+        except Exception:
+            # the connection is in an unknown state, so reconnect on the next request
+            self._local.conn = None
+            sock.close()
+            raise
+        for reply in replies:
+            for r in reply if isinstance(reply, list) else [reply]:
+                if isinstance(r, ResponseError):
+                    raise r
+        return replies
+
+    def execute(self, *args):
+        """ Sends a single command and returns its reply """
+        return self.pipeline([args])[0]
+
+    def close(self):
+        with self._lock:
+            for sock, f in self._connections:
+                f.close()
+                sock.close()
+            self._connections = []
+        self._local = threading.local()
+
+
+class RedisAchievementBackend(AchievementBackend):
+    """
+    Stores achievement data in Redis.
+
+    Arguments:
+
+        host, port, path, db, password
+            How to connect to the server, see :py:class:`RespClient`
+
+        prefix
+            Prefix for every key used by the backend
+
+        client
+            A :py:class:`RespClient` to use instead of creating one
+
+    Reads of several achievements for a ``tracked_id`` are made with a single command, and every
+    write without an event id is made in a single round trip. Increments are made with
+    ``HINCRBY``, so the tracker can increment a level without reading it first, and concurrent
+    increments from many hosts are not lost. Writes with an event id ``WATCH`` the event's key, so
+    the check for the event and the write are a single transaction. Tracked ids are returned as
+    strings.
+    """
+    def __init__(self, host='localhost', port=6379, path=None, db=0, password=None,
+                 prefix='pychievements:', client=None):
+        if client is None:
+            client = RespClient(host, port, path, db, password)
+        self.client = client
+        self.prefix = prefix
+
+    def _id_key(self, tracked_id):
+        return '%sid:%s' % (self.prefix, tracked_id)
+
+    def _state_key(self, tracked_id):
+        return '%sstate:%s' % (self.prefix, tracked_id)
+
+    def _leaderboard_key(self, name):
+        return '%sleaderboard:%s' % (self.prefix, name)
+
+    def _event_key(self, tracked_id, name, event_id):
+        tracked_id = str(tracked_id)
+        return '%sevent:%d:%s:%s:%s' % (self.prefix, len(tracked_id), tracked_id, name, event_id)
+
+    def _transaction(self, commands, event_key=None):
+        """
+        Runs ``commands`` in a ``MULTI``/``EXEC`` transaction, returning their replies. If
+        ``event_key`` is given, it is set along with the commands, which only run if it was not
+        already set. The key is watched while it is checked, so no other client can record the
+        event in between, and False is returned if it was already set.
+        """
+        if event_key is None:
+            return self.client.pipeline([['MULTI']] + commands + [['EXEC']])[-1]
+        commands = [['SET', event_key, 1, 'NX', 'EX', self.event_window]] + commands
+        while True:
+            if self.client.pipeline([['WATCH', event_key], ['EXISTS', event_key]])[1]:
+                self.client.execute('UNWATCH')
+                return False
+            replies = self.client.pipeline([['MULTI']] + commands + [['EXEC']])[-1]
+            if replies is not None:
+                return replies[1:]
+
+    def _fetch(self, tracked_id, achievements):
+        """ Returns the stored level (``None`` if there isn't one) and state of each achievement """
+        names = [_.__name__ for _ in achievements]
+        commands = [['HMGET', self._id_key(tracked_id)] + names]
+        stateful = [_.__name__ for _ in achievements if _.has_state]
+        if stateful:
+            commands.append(['HMGET', self._state_key(tracked_id)] + stateful)
+        replies = self.client.pipeline(commands)
+        states = dict((k, json.loads(v)) for k, v in zip(stateful, replies[-1]) if v is not None)
+        return [(level, states.get(name)) for name, level in zip(names, replies[0])]
+
+    def achievement_for_id(self, tracked_id, achievement):
+        level, state = self._fetch(tracked_id, [achievement])[0]
+        if level is None:
+            name = achievement.__name__
+            self.client.pipeline([['HSETNX', self._id_key(tracked_id), name, 0],
+                                  ['ZADD', self._leaderboard_key(name), 'NX', 0, tracked_id]])
+        return _restore(achievement, int(level or 0), state)
+
+    def achievements_for_id(self, tracked_id, achievements):
+        achievements = list(achievements)
+        return [_restore(a, int(level or 0), state)
+                for a, (level, state) in zip(achievements, self._fetch(tracked_id, achievements))]
+
+    def has_event(self, tracked_id, achievement, event_id):
+        return bool(self.client.execute('EXISTS', self._event_key(tracked_id, achievement.__name__,
+                                                                  event_id)))
+
+    def set_level_for_id(self, tracked_id, achievement, level, state=None, event_id=None):
+        """
+        Sets the level of an achievement. If an ``event_id`` is given, it is recorded in the same
+        transaction, and nothing is stored if it had already been recorded.
+        """
+        name = achievement.__name__
+        commands = [['HSET', self._id_key(tracked_id), name, level],
+                    ['ZADD', self._leaderboard_key(name), level, tracked_id]]
+        if state is not None:
+            commands.append(['HSET', self._state_key(tracked_id), name,
+                             json.dumps(state, separators=(',', ':'))])
+        if self._transaction(commands, self._event_key(tracked_id, name, event_id)
+                             if event_id is not None else None) is False:
+            return False
+
+    def increment_level_for_id(self, tracked_id, achievement, amount=1, event_id=None):
+        """
+        Atomically increments the level of an achievement, returning the new level. If an
+        ``event_id`` is given, it is recorded in the same transaction, and False is returned
+        without incrementing if it had already been recorded.
+        """
+        name = achievement.__name__
+        replies = self._transaction([['HINCRBY', self._id_key(tracked_id), name, amount],
+                                     ['ZINCRBY', self._leaderboard_key(name), amount, tracked_id]],
+                                    self._event_key(tracked_id, name, event_id)
+                                    if event_id is not None else None)
+        if replies is False:
+            return False
+        return int(replies[0])
+
+    def _scan(self, count, match=None):
+        """ Yields lists of up to about ``count`` keys matching ``match``, or for tracked ids """
+        cursor = '0'
+        if match is None:
+            match = self._id_key('*')
+        while True:
+            cursor, keys = self.client.execute('SCAN', cursor, 'MATCH', match, 'COUNT', count)
+            if keys:
+                yield keys
+            if cursor == '0':
+                return
+
+    def get_tracked_ids(self):
+        start = len(self._id_key(''))
+        return [key[start:] for keys in self._scan(1000) for key in keys]
+
+    def remove_id(self, tracked_id):
+        """
+        Removes the levels, states and leaderboard entries of ``tracked_id``, and its recorded
+        event ids, which are found with ``SCAN``
+        """
+        names = self.client.execute('HKEYS', self._id_key(tracked_id))
+        self._transaction([['DEL', self._id_key(tracked_id), self._state_key(tracked_id)]] +
+                          [['ZREM', self._leaderboard_key(_), tracked_id] for _ in names])
+        tracked_id = str(tracked_id)
+        match = '%sevent:%d:%s:*' % (self.prefix, len(tracked_id),
+                                     re.sub(r'([\\*?\[\]])', r'\\\1', tracked_id))
+        for keys in self._scan(1000, match):
+            self.client.execute('DEL', *keys)
+
+    def iter_levels(self, achievement=None, batch_size=1000):
+        start = len(self._id_key(''))
+        for keys in self._scan(batch_size):
+            if achievement is None:
+                replies = self.client.pipeline([['HGETALL', _] for _ in keys])
+                for key, fields in zip(keys, replies):
+                    for i in range(0, len(fields), 2):
+                        yield (key[start:], fields[i], int(fields[i + 1]))
+            else:
+                name = achievement.__name__
+                replies = self.client.pipeline([['HGET', _, name] for _ in keys])
+                for key, level in zip(keys, replies):
+                    if level is not None:
+                        yield (key[start:], name, int(level))
+
+    def set_levels(self, rows, batch_size=1000):
+        count = 0
+        for batch in _batches(rows, batch_size):
+            commands = []
+            for tracked_id, achievement, level in batch:
+                name = achievement.__name__
+                commands += [['HSET', self._id_key(tracked_id), name, level],
+                             ['ZADD', self._leaderboard_key(name), level, tracked_id]]
+            self.client.pipeline(commands)
+            count += len(batch)
+        return count
+
+    def leaderboard(self, achievement, limit=10):
+        if limit <= 0:
+            return []
+        reply = self.client.execute('ZREVRANGE', self._leaderboard_key(achievement.__name__), 0,
+                                    limit - 1, 'WITHSCORES')
+        return [(reply[i], int(float(reply[i + 1]))) for i in range(0, len(reply), 2)]
+
+    def close(self):
+        """ Closes all connections to the server """
+        self.client.close()
@@ -0,0 +1,463 @@
+"""
+pychievements.server lets several processes, such as the workers of a web server, share
+achievement data without contending for a database. A small daemon owns the data and serves it
+over a unix socket, and each process uses a :py:class:`RemoteAchievementBackend`:
+
+.. code-block:: bash
+
+    $ python -m pychievements.server --socket /tmp/pychievements.sock
+
+.. code-block:: python
+
+    from pychievements.server import RemoteAchievementBackend
+
+    tracker.set_backend(RemoteAchievementBackend('/tmp/pychievements.sock'))
+
+Requests are frames of one or more operations, each frame being a 4 byte big-endian length
+followed by a JSON list of ``[operation, arguments...]``. The server applies every operation in a
+frame atomically and replies with a frame holding a ``[True, result]`` or ``[False, error]`` for
+each of them. :py:func:`RemoteAchievementBackend.pipeline` buffers calls to ``set_level_for_id``
+without an event id, so that many of them are sent in a single frame, and a single round trip.
+Increments made through a tracker need the new level, so each is still its own round trip. To load
+many levels at once, use ``set_levels``, which sends a frame per batch.
+
+For tests, :py:class:`LocalTransport` serves requests from an in-process
+:py:class:`AchievementStore` without a daemon or socket:
+
+.. code-block:: python
+
+    backend = RemoteAchievementBackend(transport=LocalTransport())
+"""
+import heapq
+import json
+import os
+import socket
+import struct
+import threading
+from contextlib import contextmanager
+
+try:
+    import socketserver
+except ImportError:
+    import SocketServer as socketserver
+
+from .backends import AchievementBackend, EventWindow, _batches, _restore
+
+_HEADER = struct.Struct('>I')
+MAX_FRAME_SIZE = 64 * 1024 * 1024
+
+
+class RemoteError(Exception):
+    """ Raised when the server could not perform an operation """
+    pass
+
+
+def _encode(obj):
+    body = json.dumps(obj, separators=(',', ':')).encode('utf-8')
+    return _HEADER.pack(len(body)) + body
+
+
+def _recv_exactly(sock, size):
+    data = b''
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise EOFError('Connection closed')
+        data += chunk
+    return data
+
+
+def _read_frame(sock):
+    size = _HEADER.unpack(_recv_exactly(sock, _HEADER.size))[0]
+    if size > MAX_FRAME_SIZE:
+        raise ValueError('Frame of %d bytes is larger than the maximum of %d' % (size,
+                                                                              MAX_FRAME_SIZE))
+    return json.loads(_recv_exactly(sock, size).decode('utf-8'))
+
+
+class AchievementStore(object):
+    """
+    The data owned by an :py:class:`AchievementServer`: the level and state of each achievement
+    (by name) for each ``tracked_id``.
+
+    Levels are kept in a list of rows, so that levels can be paged through without holding a
+    cursor open between requests. The rows of removed tracked ids are reused by new rows, so the
+    list never holds more rows than were alive at once. A row created while paging may be missed
+    if it reuses a row that has already been paged through.
+    """
+    def __init__(self):
+        self._ids = {}
+        self._rows = []
+        self._free = []
+        self._events = EventWindow(AchievementBackend.event_window)
+        self._lock = threading.Lock()
+
+    def handle(self, ops):
+        """
+        Performs a list of ``[operation, arguments...]`` atomically, returning ``[True, result]``
+        or ``[False, error]`` for each of them
+        """
+        results = []
+        with self._lock:
+            for op in ops:
+                func = getattr(self, 'op_' + str(op[0]), None)
+                if func is None:
+                    results.append([False, 'Unknown operation %r' % op[0]])
+                    continue
+                try:
+                    results.append([True, func(*op[1:])])
+                except Exception as err:
+                    results.append([False, '%s: %s' % (err.__class__.__name__, err)])
+        return results
+
+    def _row(self, tracked_id, name):
+        achievements = self._ids.setdefault(tracked_id, {})
+        if name not in achievements:
+            row = [tracked_id, name, 0, None]
+            if self._free:
+                achievements[name] = self._free.pop()
+                self._rows[achievements[name]] = row
+            else:
+                achievements[name] = len(self._rows)
+                self._rows.append(row)
+        return self._rows[achievements[name]]
+
+    def op_get(self, tracked_id, names):
+        r = []
+        for name in names:
+            row = self._row(tracked_id, name)
+            r.append(row[2:])
+        return r
+
+    def op_set(self, tracked_id, name, level, state=None, event_id=None):
+        if event_id is not None and not self._events.add((tracked_id, name, event_id)):
+            return False
+        row = self._row(tracked_id, name)
+        row[2] = level
+        if state is not None:
+            row[3] = state
+
+    def op_has_event(self, tracked_id, name, event_id):
+        return (tracked_id, name, event_id) in self._events
+
+    def op_incr(self, tracked_id, name, amount, event_id=None):
+        if event_id is not None and not self._events.add((tracked_id, name, event_id)):
+            return False
+        row = self._row(tracked_id, name)
+        row[2] += amount
+        return row[2]
+
+    def op_set_levels(self, rows):
+        for tracked_id, name, level in rows:
+            self._row(tracked_id, name)[2] = level
+        return len(rows)
+
+    def op_ids(self):
+        return list(self._ids)
+
+    def op_remove(self, tracked_id):
+        for i in self._ids.pop(tracked_id, {}).values():
+            self._rows[i] = None
+            self._free.append(i)
+
+    def op_levels(self, name, start, limit):
+        """
+        Returns up to ``limit`` ``[tracked_id, name, level]`` rows for achievement ``name`` (or
+        every achievement if ``None``) from row ``start``, and the row to start the next page
+        from, which is ``None`` once every row has been returned.
+        """
+        r = []
+        for i in range(start, len(self._rows)):
+            row = self._rows[i]
+            if row is not None and (name is None or row[1] == name):
+                r.append(row[:3])
+                if len(r) >= limit:
+                    return [r, i + 1]
+        return [r, None]
+
+    def op_leaderboard(self, name, limit):
+        return heapq.nlargest(limit, ([_[0], _[2]] for _ in self._rows
+                                      if _ is not None and _[1] == name), key=lambda _: _[1])
+
+    def op_summary(self):
+        achievements = {}
+        count = 0
+        for row in self._rows:
+            if row is None:
+                continue
+            count += 1
+            a = achievements.setdefault(row[1], {'count': 0, 'total': 0, 'max': row[2]})
+            a['count'] += 1
+            a['total'] += row[2]
+            a['max'] = max(a['max'], row[2])
+        return {'tracked_ids': len(self._ids), 'levels': count, 'achievements': achievements}
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        while True:
+            try:
+                ops = _read_frame(self.request)
+            except EOFError:
+                return
+            self.request.sendall(_encode(self.server.store.handle(ops)))
+
+
+class AchievementServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Serves an :py:class:`AchievementStore` on the unix socket ``path``, handling each connection
+    in its own thread. Any existing file at ``path`` is replaced.
+
+    .. code-block:: python
+
+        server = AchievementServer('/tmp/pychievements.sock')
+        server.serve_forever()
+    """
+    daemon_threads = True
+
+    def __init__(self, path, store=None):
+        if os.path.exists(path):
+            os.remove(path)
+        self.path = path
+        self.store = AchievementStore() if store is None else store
+        socketserver.UnixStreamServer.__init__(self, path, _Handler)
+
+    def start(self):
+        """ Serves requests from a background thread, returning the thread """
+        thread = threading.Thread(target=self.serve_forever, name='pychievements-server')
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def close(self):
+        """ Stops serving requests and removes the socket """
+        self.shutdown()
+        self.server_close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class UnixSocketTransport(object):
+    """
+    Sends frames of operations to an :py:class:`AchievementServer` listening on ``path``, using a
+    connection per thread
+    """
+    def __init__(self, path, timeout=None):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._sockets = []
+
+    def _socket(self):
+        sock = getattr(self._local, 'sock', None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.path)
+            self._local.sock = sock
+            with self._lock:
+                self._sockets.append(sock)
+        return sock
+
+    def request(self, ops):
+        """ Sends ``ops`` in a single frame and returns the server's results """
+        sock = self._socket()
+        try:
+            sock.sendall(_encode(ops))
+            return _read_frame(sock)
+        except Exception:
+            # the connection is in an unknown state, so reconnect on the next request
+            self._local.sock = None
+            sock.close()
+            raise
+
+    def close(self):
+        with self._lock:
+            for sock in self._sockets:
+                sock.close()
+            self._sockets = []
+        self._local = threading.local()
+
+
+class LocalTransport(object):
+    """
+    An in-process stand-in for :py:class:`UnixSocketTransport`, which serves requests from an
+    :py:class:`AchievementStore` directly. Requests and results are still converted to and from
+    JSON, so they behave as they would over a socket.
+    """
+    def __init__(self, store=None):
+        self.store = AchievementStore() if store is None else store
+        self.requests = 0
+
+    def request(self, ops):
+        self.requests += 1
+        results = self.store.handle(json.loads(json.dumps(ops)))
+        return json.loads(json.dumps(results))
+
+    def close(self):
+        pass
+
+
+class RemoteAchievementBackend(AchievementBackend):
+    """
+    Stores achievement data in an :py:class:`AchievementServer`, so it can be shared between
+    processes.
+
+    Arguments:
+
+        path
+            The unix socket the server is listening on
+
+        transport
+            Used instead of connecting to ``path`` if given, e.g. a :py:class:`LocalTransport`
+
+    Each call makes a single round trip to the server. Writes made within :py:func:`pipeline`
+    are instead buffered and sent along with the next read, or when the pipeline exits, except for
+    levels set for an ``event_id``, which are sent immediately so duplicate events can be
+    reported, and increments, which are sent immediately to return the new level. Tracked ids and
+    achievement states must be JSON serializable. Event ids are remembered by the server for
+    ``event_window`` seconds.
+    """
+    def __init__(self, path=None, transport=None):
+        if transport is None:
+            if path is None:
+                raise ValueError('RemoteAchievementBackend requires a path or a transport')
+            transport = UnixSocketTransport(path)
+        self.transport = transport
+        self._local = threading.local()
+
+    def _call(self, *ops):
+        """ Sends ``ops``, after any buffered writes, and returns their results """
+        pending = getattr(self._local, 'pending', None)
+        frame = list(ops)
+        if pending:
+            frame = pending + frame
+            self._local.pending = []
+        results = self.transport.request(frame)
+        for ok, result in results:
+            if not ok:
+                raise RemoteError(result)
+        return [_[1] for _ in results[len(results) - len(ops):]]
+
+    def _write(self, *op):
+        pending = getattr(self._local, 'pending', None)
+        if pending is None:
+            self._call(list(op))
+        else:
+            pending.append(list(op))
+
+    @contextmanager
+    def pipeline(self):
+        """
+        Context manager that buffers writes made by the current thread, sending them in a single
+        frame along with the next read or when the context exits. Reads still see buffered writes,
+        as the writes are applied first.
+
+        Only writes whose result is not needed are buffered: ``set_level_for_id`` without an
+        ``event_id`` and ``remove_id``. Increments, including ``tracker.increment``, return the
+        new level, so each one still takes its own round trip.
+
+        .. code-block:: python
+
+            with backend.pipeline():
+                for user_id, level in levels.items():
+                    backend.set_level_for_id(user_id, MyAchievement, level)
+        """
+        if getattr(self._local, 'pending', None) is not None:
+            yield
+            return
+        self._local.pending = []
+        try:
+            yield
+        finally:
+            try:
+                self.flush()
+            finally:
+                self._local.pending = None
+
+    def flush(self):
+        """ Sends any writes buffered by :py:func:`pipeline` """
+        if getattr(self._local, 'pending', None):
+            self._call()
+
+    def achievement_for_id(self, tracked_id, achievement):
+        return self.achievements_for_id(tracked_id, [achievement])[0]
+
+    def achievements_for_id(self, tracked_id, achievements):
+        achievements = list(achievements)
+        rows = self._call(['get', tracked_id, [_.__name__ for _ in achievements]])[0]
+        return [_restore(a, level, state) for a, (level, state) in zip(achievements, rows)]
+
+    def has_event(self, tracked_id, achievement, event_id):
+        return self._call(['has_event', tracked_id, achievement.__name__, event_id])[0]
+
+    def set_level_for_id(self, tracked_id, achievement, level, state=None, event_id=None):
+        if event_id is not None:
+            # the result is needed, so this is not buffered by pipeline()
+            return self._call(['set', tracked_id, achievement.__name__, level, state, event_id])[0]
+        self._write('set', tracked_id, achievement.__name__, level, state)
+
+    def increment_level_for_id(self, tracked_id, achievement, amount=1, event_id=None):
+        """
+        Atomically increments the level of an achievement, returning the new level, or False if
+        a level has already been set for ``event_id``
+        """
+        op = ['incr', tracked_id, achievement.__name__, amount]
+        return self._call(op + [event_id] if event_id is not None else op)[0]
+
+    def get_tracked_ids(self):
+        return self._call(['ids'])[0]
+
+    def remove_id(self, tracked_id):
+        self._write('remove', tracked_id)
+
+    def iter_levels(self, achievement=None, batch_size=1000):
+        name = achievement.__name__ if achievement is not None else None
+        start = 0
+        while start is not None:
+            rows, start = self._call(['levels', name, start, batch_size])[0]
+            for row in rows:
+                yield tuple(row)
+
+    def set_levels(self, rows, batch_size=1000):
+        count = 0
+        for batch in _batches(rows, batch_size):
+            count += self._call(['set_levels', [[tracked_id, achievement.__name__, level]
+                                                for tracked_id, achievement, level in batch]])[0]
+        return count
+
+    def leaderboard(self, achievement, limit=10):
+        return [tuple(_) for _ in self._call(['leaderboard', achievement.__name__, limit])[0]]
+
+    def summary(self):
+        return self._call(['summary'])[0]
+
+    def close(self):
+        """ Sends any buffered writes and closes the connection to the server """
+        self.flush()
+        self.transport.close()
+
+
+def main(argv=None):
+    """ Runs an :py:class:`AchievementServer` until interrupted """
+    import argparse
+    parser = argparse.ArgumentParser(prog='python -m pychievements.server',
+                                     description='Serve pychievements data over a unix socket')
+    parser.add_argument('--socket', required=True, help='path of the unix socket to listen on')
+    args = parser.parse_args(argv)
+    server = AchievementServer(args.socket)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if os.path.exists(args.socket):
+            os.remove(args.socket)
+    return 0
+
+
+if __name__ == '__main__':
+    import sys
+    sys.exit(main())
@@ -1,6 +1,11 @@
 import sys
 import threading
 
+try:
+    from time import perf_counter as _clock
+except ImportError:
+    from time import time as _clock
+
 
 def _make_id(target):
     if hasattr(target, '__func__'):
@@ -10,18 +15,96 @@ def _make_id(target):
 NONE_ID = _make_id(None)
 
 
+class ReceiverStats(object):
+    """
+    Timing information for a single receiver of a signal.
+
+        calls
+            Number of times the receiver has been called
+
+        total
+            Cumulative time (seconds) spent in the receiver
+
+        max
+            Longest single call (seconds)
+
+        errors
+            Number of calls that raised an exception
+
+        slow
+            Number of calls that exceeded the signal's time budget
+    """
+    __slots__ = ('receiver', 'calls', 'total', 'max', 'errors', 'slow')
+
+    def __init__(self, receiver):
+        self.receiver = receiver
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.errors = 0
+        self.slow = 0
+
+    def as_dict(self):
+        return dict((_, getattr(self, _)) for _ in self.__slots__)
+
+
 class Signal(object):
     """
     Base class for all signals
 
+    Arguments:
+
+        name
+            An optional name for the signal, used when reporting stats
+
     Internal attributes:
 
         receivers
             { receiverkey(id): receiver }
     """
-    def __init__(self):
+    def __init__(self, name=None):
+        self.name = name
         self.receivers = []
         self.lock = threading.Lock()
+        self.stats = None
+        self.budget = None
+        self.on_slow = None
+
+    def enable_stats(self, budget=None, on_slow=None):
+        """
+        Starts recording per-receiver timing in :py:func:`send_robust`.
+
+        Arguments:
+
+            budget
+                Time (in seconds) a receiver is expected to finish within. Calls that take longer
+                are counted as slow and logged as a warning.
+
+            on_slow
+                A function called as ``on_slow(signal, receiver, duration)`` for every call that
+                exceeds ``budget``. Errors raised by ``on_slow`` are logged, not raised.
+        """
+        with self.lock:
+            if self.stats is None:
+                self.stats = {}
+            self.budget = budget
+            self.on_slow = on_slow
+
+    def disable_stats(self):
+        """ Stops recording per-receiver timing and discards recorded stats """
+        with self.lock:
+            self.stats = None
+            self.budget = None
+            self.on_slow = None
+
+    def receiver_stats(self):
+        """
+        Returns the recorded :py:class:`ReceiverStats` for each receiver as a list of
+        dictionaries, sorted by cumulative time with the slowest receivers first.
+        """
+        with self.lock:
+            stats = [_.as_dict() for _ in (self.stats or {}).values()]
+        return sorted(stats, key=lambda _: _['total'], reverse=True)
 
     def connect(self, receiver, sender=None, dispatch_uid=None):
         """
@@ -131,6 +214,9 @@ class Signal(object):
         receiver. The traceback is always attached to the error at
         ``__traceback__``.
         """
+        if self.stats is not None:
+            return self._send_robust_timed(sender, **named)
+
         responses = []
 
         # Call each receiver with whatever arguments it can accept.
@@ -146,6 +232,54 @@ class Signal(object):
                 responses.append((receiver, response))
         return responses
 
+    def _send_robust_timed(self, sender, **named):
+        """
+        :py:func:`send_robust`, recording the time spent in each receiver
+        """
+        responses = []
+        for receiver in self._receivers(sender):
+            error = False
+            start = _clock()
+            try:
+                response = receiver(signal=self, sender=sender, **named)
+            except Exception as err:
+                if not hasattr(err, '__traceback__'):
+                    err.__traceback__ = sys.exc_info()[2]
+                response = err
+                error = True
+            self._record(receiver, _clock() - start, error)
+            responses.append((receiver, response))
+        return responses
+
+    def _record(self, receiver, duration, error):
+        with self.lock:
+            if self.stats is None:
+                return
+            stats = self.stats.get(receiver)
+            if stats is None:
+                stats = self.stats[receiver] = ReceiverStats(receiver)
+            stats.calls += 1
+            stats.total += duration
+            if duration > stats.max:
+                stats.max = duration
+            if error:
+                stats.errors += 1
+            budget, on_slow = self.budget, self.on_slow
+            slow = budget is not None and duration > budget
+            if slow:
+                stats.slow += 1
+        if slow:
+            import logging
+            logger = logging.getLogger(__name__)
+            logger.warning('Receiver %r of signal %s took %.6fs (budget %.6fs)', receiver,
+                           self.name, duration, budget)
+            if on_slow is not None:
+                # like errors from receivers, errors from the callback must not escape send_robust
+                try:
+                    on_slow(self, receiver, duration)
+                except Exception:
+                    logger.exception('on_slow callback of signal %s raised an error', self.name)
+
     def _receivers(self, sender):
         """
         Filter sequence of receivers to get receivers for sender.
@@ -183,6 +317,7 @@ def receiver(signal, **kwargs):
     return _decorator
 
 
-goal_achieved = Signal()
-level_increased = Signal()
-highest_level_achieved = Signal()
+goal_achieved = Signal('goal_achieved')
+goal_lost = Signal('goal_lost')
+level_increased = Signal('level_increased')
+highest_level_achieved = Signal('highest_level_achieved')
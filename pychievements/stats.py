@@ -0,0 +1,176 @@
+"""
+pychievements.stats provides :py:class:`TrackerStats`, which records call counts and latency
+histograms for the operations performed by an ``AchievementTracker``.
+
+Stats are disabled by default. To enable them, give the tracker a ``TrackerStats`` instance:
+
+.. code-block:: python
+
+    from pychievements.stats import TrackerStats
+
+    stats = TrackerStats()
+    tracker.set_stats(stats)
+    ...
+    stats.as_dict()         # {'increment': {'count': 10, 'sum': 0.0012, ...}, ...}
+    stats.to_prometheus()   # Prometheus text exposition format
+
+The following operations are recorded:
+
+    increment, evaluate, set_level
+        The complete tracker operation, including backend calls and signals
+
+    backend.<method>
+        Each call the tracker makes to its backend, e.g. ``backend.set_level_for_id``
+
+    registry
+        Resolving a registered achievement from an achievement, class or name
+
+    check_signals
+        Finding the goals crossed by an update to determine which signals to send
+
+    signal.<name>
+        Sending a signal to all of its receivers, e.g. ``signal.goal_achieved``
+"""
+import threading
+from bisect import bisect_left
+
+try:
+    from time import perf_counter as _clock
+except ImportError:
+    from time import time as _clock
+
+
+# upper bounds (seconds) of the latency histogram buckets
+DEFAULT_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+                   0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram(object):
+    """
+    A latency histogram with fixed bucket boundaries. Also tracks the number of observations, their
+    sum and maximum, and how many of them ended with an error.
+    """
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.errors = 0
+
+    def observe(self, seconds, error=False):
+        """ Records a single observation of ``seconds`` """
+        self.counts[bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        if seconds > self.max:
+            self.max = seconds
+        if error:
+            self.errors += 1
+
+    def cumulative(self):
+        """ Returns a list of (upper bound, cumulative count) pairs, ending with ``+Inf`` """
+        r = []
+        total = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            r.append((bound, total))
+        return r
+
+    def as_dict(self):
+        return {'count': self.count, 'sum': self.sum, 'max': self.max, 'errors': self.errors,
+                'buckets': self.cumulative()}
+
+
+class _Timer(object):
+    __slots__ = ('stats', 'name', 'start')
+
+    def __init__(self, stats, name):
+        self.stats = stats
+        self.name = name
+
+    def __enter__(self):
+        self.start = _clock()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.stats.observe(self.name, _clock() - self.start, exc_type is not None)
+        return False
+
+
+class _NullTimer(object):
+    """ Timer used when stats are disabled, does nothing """
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        return False
+
+NULL_TIMER = _NullTimer()
+
+
+class TrackerStats(object):
+    """
+    Records a :py:class:`Histogram` for each named operation.
+
+    Arguments:
+
+        buckets
+            Upper bounds (in seconds) for the latency histogram buckets
+    """
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.histograms = {}
+        self.lock = threading.Lock()
+
+    def timer(self, name):
+        """
+        Returns a context manager that records the time spent within it as an observation of
+        ``name``. Observations that exit with an exception are counted as errors.
+        """
+        return _Timer(self, name)
+
+    def observe(self, name, seconds, error=False):
+        """ Records an observation of ``seconds`` for the operation ``name`` """
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram(self.buckets)
+            histogram.observe(seconds, error)
+
+    def reset(self):
+        """ Discards all recorded observations """
+        with self.lock:
+            self.histograms = {}
+
+    def as_dict(self):
+        """
+        Returns recorded stats as a dictionary of ``{operation: {'count', 'sum', 'max',
+        'errors', 'buckets'}}``, where ``buckets`` is a list of (upper bound, cumulative count)
+        pairs.
+        """
+        with self.lock:
+            return dict((name, h.as_dict()) for name, h in self.histograms.items())
+
+    def to_prometheus(self, prefix='pychievements'):
+        """ Returns recorded stats in the Prometheus text exposition format """
+        stats = self.as_dict()
+        lines = ['# HELP {0}_operation_seconds Time spent in tracker operations'.format(prefix),
+                 '# TYPE {0}_operation_seconds histogram'.format(prefix)]
+        for name in sorted(stats):
+            for bound, count in stats[name]['buckets']:
+                lines.append('{0}_operation_seconds_bucket{{operation="{1}",le="{2}"}} {3}'.format(
+                             prefix, name, '+Inf' if bound == float('inf') else repr(bound), count))
+            lines.append('{0}_operation_seconds_sum{{operation="{1}"}} {2!r}'.format(
+                         prefix, name, stats[name]['sum']))
+            lines.append('{0}_operation_seconds_count{{operation="{1}"}} {2}'.format(
+                         prefix, name, stats[name]['count']))
+        lines += ['# HELP {0}_operation_errors_total Tracker operations that raised an '
+                  'error'.format(prefix),
+                  '# TYPE {0}_operation_errors_total counter'.format(prefix)]
+        for name in sorted(stats):
+            lines.append('{0}_operation_errors_total{{operation="{1}"}} {2}'.format(
+                         prefix, name, stats[name]['errors']))
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,204 @@
+"""
+pychievements.tracing records nested spans for the operations performed by an
+``AchievementTracker``, so the time spent in a slow operation can be attributed to registry
+lookups, backend calls, goal checks or signal receivers.
+
+Tracing is disabled by default. To enable it, give the tracker a :py:class:`Tracer`:
+
+.. code-block:: python
+
+    from pychievements.tracing import Tracer
+
+    tracer = Tracer(sample_rate=0.01)
+    tracker.set_tracer(tracer)
+    ...
+    with open('trace.json', 'w') as f:
+        json.dump(tracer.chrome_trace(), f)     # load in chrome://tracing or Perfetto
+    with open('trace.folded', 'w') as f:
+        f.write(tracer.collapsed())             # input for flamegraph.pl or speedscope
+
+Spans use the same names as :py:mod:`pychievements.stats`, along with ``registry`` for resolving
+an achievement from its name or class. A tracker operation that is not called from within another
+span starts a trace, which is recorded with a probability of ``sample_rate``. Spans within a trace
+that is not recorded cost about as much as when tracing is disabled, so a low ``sample_rate`` can
+be left on in production.
+
+Receivers (or any code called by the tracker) can add their own spans, which are nested within
+the span of the tracker operation that called them:
+
+.. code-block:: python
+
+    @receiver(goal_achieved)
+    def notify(tracked_id, goals, **kwargs):
+        with tracer.span('notify'):
+            ...
+"""
+import os
+import random
+import threading
+from collections import deque, namedtuple
+
+from .stats import NULL_TIMER
+
+try:
+    from time import perf_counter as _clock
+except ImportError:
+    from time import time as _clock
+
+
+class Span(namedtuple('Span', ['path', 'start', 'duration', 'self_time', 'thread', 'error'])):
+    """
+    A completed span.
+
+        path
+            Tuple of the names of the span and the spans it is nested within, outermost first
+
+        start
+            Seconds from the creation of the ``Tracer`` to the start of the span
+
+        duration
+            Seconds spent within the span
+
+        self_time
+            Seconds spent within the span, but not in any span nested within it
+
+        thread
+            Identifier of the thread the span was recorded in
+
+        error
+            True if the span exited with an exception
+    """
+    __slots__ = ()
+
+    @property
+    def name(self):
+        return self.path[-1]
+
+
+class _ActiveSpan(object):
+    __slots__ = ('tracer', 'name', 'stats', 'start', 'children')
+
+    def __init__(self, tracer, name, stats):
+        self.tracer = tracer
+        self.name = name
+        self.stats = stats
+
+    def __enter__(self):
+        local = self.tracer._local
+        if local.stack is None:
+            local.stack = []
+            local.spans = []
+        local.stack.append(self)
+        self.children = 0.0
+        self.start = _clock()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        duration = _clock() - self.start
+        local = self.tracer._local
+        stack = local.stack
+        path = tuple(_.name for _ in stack)
+        stack.pop()
+        local.spans.append(Span(path, self.start - self.tracer.epoch, duration,
+                                duration - self.children, threading.current_thread().ident,
+                                exc_type is not None))
+        if stack:
+            stack[-1].children += duration
+        else:
+            self.tracer._finish(local.spans)
+            local.stack = local.spans = None
+        if self.stats is not None:
+            self.stats.observe(self.name, duration, exc_type is not None)
+        return False
+
+
+class _UnsampledTrace(object):
+    """ The outermost span of a trace that is not recorded, stops nested spans being recorded """
+    __slots__ = ('local', 'timer')
+
+    def __init__(self, local, timer):
+        self.local = local
+        self.timer = timer
+
+    def __enter__(self):
+        self.local.stack = False
+        self.timer.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.local.stack = None
+        return self.timer.__exit__(exc_type, exc_value, tb)
+
+
+class _Local(threading.local):
+    # the spans entered and completed in the current trace, or False within a trace that is not
+    # being recorded
+    stack = None
+    spans = None
+
+
+class Tracer(object):
+    """
+    Records traces of nested spans.
+
+    Arguments:
+
+        sample_rate
+            Fraction (0.0 - 1.0) of traces to record
+
+        max_traces
+            Number of the most recent traces to keep
+    """
+    def __init__(self, sample_rate=1.0, max_traces=1000):
+        self.sample_rate = sample_rate
+        self.traces = deque(maxlen=max_traces)
+        self.epoch = _clock()
+        self.pid = os.getpid()
+        self._local = _Local()
+
+    def span(self, name, stats=None):
+        """
+        Returns a context manager that records the time spent within it as a span called ``name``.
+        If a :py:class:`pychievements.stats.TrackerStats` is given, the time is also recorded as
+        an observation of ``name``, whether or not the span is recorded.
+        """
+        stack = self._local.stack
+        if stack is False or (stack is None and random.random() >= self.sample_rate):
+            timer = NULL_TIMER if stats is None else stats.timer(name)
+            return timer if stack is False else _UnsampledTrace(self._local, timer)
+        return _ActiveSpan(self, name, stats)
+
+    def _finish(self, spans):
+        # spans complete innermost first, so sort them into the order they started
+        spans.sort(key=lambda _: (_.start, len(_.path)))
+        self.traces.append(spans)
+
+    def clear(self):
+        """ Discards all recorded traces """
+        self.traces.clear()
+
+    def spans(self):
+        """ Returns a list of every recorded :py:class:`Span` """
+        return [span for trace in list(self.traces) for span in trace]
+
+    def chrome_trace(self):
+        """
+        Returns recorded spans in the Chrome trace event format, as a dictionary that can be
+        written with ``json.dump``. Timestamps and durations are in microseconds.
+        """
+        events = [{'name': span.name, 'cat': 'pychievements', 'ph': 'X', 'pid': self.pid,
+                   'tid': span.thread, 'ts': span.start * 1e6, 'dur': span.duration * 1e6,
+                   'args': {'error': span.error}}
+                  for span in self.spans()]
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def collapsed(self):
+        """
+        Returns recorded spans in the collapsed stack format used by ``flamegraph.pl``: one line
+        per distinct stack of span names, with the total self time spent in it in microseconds.
+        """
+        totals = {}
+        for span in self.spans():
+            totals[span.path] = totals.get(span.path, 0.0) + span.self_time
+        return ''.join('{0} {1}\n'.format(';'.join(path), int(round(seconds * 1e6)))
+                       for path, seconds in sorted(totals.items()))
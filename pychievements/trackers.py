@@ -1,7 +1,41 @@
 from .achievements import Achievement
-from .backends import AchievementBackend
-from .signals import goal_achieved, level_increased, highest_level_achieved
-from inspect import isclass as _isclass
+from .backends import AchievementBackend, _batches
+from .signals import goal_achieved, goal_lost, level_increased, highest_level_achieved
+from .stats import NULL_TIMER
+from contextlib import contextmanager
+from collections import OrderedDict, deque
+import threading
+
+
+def _isclass(obj):
+    # avoids importing inspect, which noticeably slows down importing pychievements
+    return isinstance(obj, type)
+
+
+def _evaluate_chunk(achievement, rows):
+    """
+    Evaluates ``achievement`` for each ``(tracked_id, level, args)`` in ``rows`` and returns the
+    resulting ``(tracked_id, level)`` pairs. Used by :py:func:`AchievementTracker.evaluate_all`,
+    possibly in a worker process.
+    """
+    r = []
+    for tracked_id, level, args in rows:
+        a = achievement(current=level)
+        a.evaluate(*args)
+        r.append((tracked_id, a.current[0]))
+    return r
+
+
+def _default_increment(achievement):
+    """ True if ``achievement`` does not redefine ``Achievement.increment`` """
+    increment = achievement.increment
+    return getattr(increment, '__func__', increment) is _ACHIEVEMENT_INCREMENT
+
+_ACHIEVEMENT_INCREMENT = getattr(Achievement.increment, '__func__', Achievement.increment)
+
+
+def _dependency_names(achievement):
+    return [_.__name__ if _isclass(_) else _ for _ in achievement.depends_on]
 
 
 class AlreadyRegistered(Exception):
@@ -26,13 +60,25 @@ class AchievementTracker(object):
             The backend to use for storing/retrieving achievement data. If ``None``, the default
             :py:class:`AchievementBackend` will be used, which stores all data in memory.
 
+        stats:
+            A :py:class:`pychievements.stats.TrackerStats` used to record counts and latencies of
+            tracker operations. If ``None``, no stats are recorded.
+
+        tracer:
+            A :py:class:`pychievements.tracing.Tracer` used to record nested spans of tracker
+            operations. If ``None``, no spans are recorded.
+
     .. note::
         The backend the tracker is using can be updated at any time using the :py:func:`set_backend`
         function.
     """
-    def __init__(self, backend=None):
+    def __init__(self, backend=None, stats=None, tracer=None):
         self._registry = []
+        self._dependents = {}
         self._backend = AchievementBackend() if backend is None else backend
+        self._stats = stats
+        self._tracer = tracer
+        self._batches = threading.local()
 
     def set_backend(self, backend):
         """
@@ -42,6 +88,43 @@ class AchievementTracker(object):
             raise ValueError('Backend must be an instance of an AchievementBackend')
         self._backend = backend
 
+    @property
+    def stats(self):
+        """ The :py:class:`pychievements.stats.TrackerStats` in use, or ``None`` """
+        return self._stats
+
+    def set_stats(self, stats):
+        """
+        Configures a :py:class:`pychievements.stats.TrackerStats` to record tracker operations.
+        Use ``None`` to stop recording.
+        """
+        self._stats = stats
+
+    @property
+    def tracer(self):
+        """ The :py:class:`pychievements.tracing.Tracer` in use, or ``None`` """
+        return self._tracer
+
+    def set_tracer(self, tracer):
+        """
+        Configures a :py:class:`pychievements.tracing.Tracer` to record spans of tracker
+        operations. Use ``None`` to stop tracing.
+        """
+        self._tracer = tracer
+
+    def _timer(self, name):
+        if self._tracer is not None:
+            return self._tracer.span(name, self._stats)
+        if self._stats is None:
+            return NULL_TIMER
+        return self._stats.timer(name)
+
+    def _send(self, signal, **named):
+        if self._stats is None and self._tracer is None:
+            return signal.send_robust(self, **named)
+        with self._timer('signal.{0}'.format(signal.name)):
+            return signal.send_robust(self, **named)
+
     def register(self, achievement_or_iterable, **options):
         """
         Registers the given achievement(s) to be tracked.
@@ -56,7 +139,10 @@ class AchievementTracker(object):
                 raise AlreadyRegistered('The achievement %s is already '
                                         'registered' % achievement.__name__)
             if achievement is not Achievement:
+                self._check_dependencies(achievement)
                 self._registry.append(achievement)
+                for name in _dependency_names(achievement):
+                    self._dependents.setdefault(name, []).append(achievement)
 
     def unregister(self, achievement_or_iterable):
         """
@@ -70,6 +156,39 @@ class AchievementTracker(object):
             if achievement not in self._registry:
                 raise NotRegistered('The achievement %s is not registered' % achievement.__name__)
             self._registry.remove(achievement)
+            for name in _dependency_names(achievement):
+                self._dependents[name].remove(achievement)
+                if not self._dependents[name]:
+                    del self._dependents[name]
+
+    def _check_dependencies(self, achievement):
+        """
+        Raises ValueError if registering ``achievement`` would create a circular dependency
+        between registered achievements.
+        """
+        registered = dict((_.__name__, _) for _ in self._registry)
+        registered[achievement.__name__] = achievement
+        seen = set()
+        stack = list(_dependency_names(achievement))
+        while stack:
+            name = stack.pop()
+            if name == achievement.__name__:
+                raise ValueError('Could not register %s, it depends on itself through its '
+                                 'dependencies' % achievement.__name__)
+            if name not in seen and name in registered:
+                seen.add(name)
+                stack.extend(_dependency_names(registered[name]))
+
+    def dependents(self, achievement):
+        """
+        Returns the registered achievements that list ``achievement`` (an ``Achievement`` class,
+        instance or name) in their ``depends_on``.
+        """
+        if isinstance(achievement, Achievement):
+            achievement = achievement.__class__
+        if _isclass(achievement):
+            achievement = achievement.__name__
+        return list(self._dependents.get(achievement, ()))
 
     def is_registered(self, achievement):
         """
@@ -107,35 +226,154 @@ class AchievementTracker(object):
 
         If ``tracked_id`` has not been tracked yet by this tracker, it will be created.
         """
-        if isinstance(achievement, Achievement):
-            achievement = achievement.__class__.__name__
-        elif _isclass(achievement) and issubclass(achievement, Achievement):
-            achievement = achievement.__name__
+        achievement = self._registered(achievement)
+        with self._timer('backend.achievement_for_id'):
+            return self._backend.achievement_for_id(tracked_id, achievement)
+
+    def _registered(self, achievement):
+        """
+        Returns the registered ``Achievement`` class for an ``Achievement`` instance, class or
+        class name. Raises NotRegistered if there is no such registered achievement.
+        """
+        with self._timer('registry'):
+            if isinstance(achievement, Achievement):
+                achievement = achievement.__class__.__name__
+            elif _isclass(achievement) and issubclass(achievement, Achievement):
+                achievement = achievement.__name__
 
-        a = [_ for _ in self._registry if _.__name__ == achievement]
+            a = [_ for _ in self._registry if _.__name__ == achievement]
         if a:
-            return self._backend.achievement_for_id(tracked_id, a[0])
+            return a[0]
         raise NotRegistered('The achievement %s is not registered with this tracker' % achievement)
 
     def achievements_for_id(self, tracked_id, category=None, keywords=[]):
         """ Returns all of the achievements for tracked_id that match the given category and
         keywords """
-        return self._backend.achievements_for_id(tracked_id, self.achievements(category, keywords))
-
-    def _check_signals(self, tracked_id, achievement, old_level, old_achieved):
-        cur_level = achievement.current[0]
-        if old_level < cur_level:
-            level_increased.send_robust(self, tracked_id=tracked_id, achievement=achievement)
-        if old_achieved != achievement.achieved:
-            new_goals = [_ for _ in achievement.achieved if _ not in old_achieved]
-            goal_achieved.send_robust(self, tracked_id=tracked_id, achievement=achievement,
-                                      goals=new_goals)
-            if not achievement.unachieved:
-                highest_level_achieved.send_robust(self, tracked_id=tracked_id,
-                                                   achievement=achievement)
-            return new_goals
+        achievements = self.achievements(category, keywords)
+        with self._timer('backend.achievements_for_id'):
+            return self._backend.achievements_for_id(tracked_id, achievements)
+
+    def _set_level_for_id(self, tracked_id, achievement, event_id=None):
+        """ Stores the level of ``achievement``, returning False if ``event_id`` is a duplicate """
+        args = [tracked_id, achievement.__class__, achievement.current[0]]
+        if achievement.has_state or event_id is not None:
+            args.append(achievement.get_state() if achievement.has_state else None)
+        if event_id is not None:
+            args.append(event_id)
+        with self._timer('backend.set_level_for_id'):
+            return self._backend.set_level_for_id(*args)
+
+    def _has_event(self, tracked_id, achievement, event_id):
+        achievement = self._registered(achievement)
+        with self._timer('backend.has_event'):
+            return self._backend.has_event(tracked_id, achievement, event_id)
+
+    @contextmanager
+    def batch(self):
+        """
+        Context manager that coalesces signals. Within a batch, signals are not sent when an
+        achievement is updated. Instead, when the batch exits, each updated (``tracked_id``,
+        ``Achievement``) pair sends at most one ``level_increased`` with its final level, one
+        ``goal_achieved`` with every goal achieved during the batch, and one
+        ``highest_level_achieved``, or one ``goal_lost`` if its level ended lower than it started
+        and it no longer meets some goals.
+
+        .. code-block:: python
+
+            with tracker.batch():
+                for event in events:
+                    tracker.increment(event.user_id, MyAchievement)
+
+        Return values of ``increment`` and ``evaluate`` are not affected. Batches are tracked
+        per thread, and nested batches are merged into the outermost one.
+        """
+        if getattr(self._batches, 'pending', None) is not None:
+            yield
+            return
+        pending = self._batches.pending = OrderedDict()
+        try:
+            yield
+        finally:
+            self._batches.pending = None
+            for (tracked_id, _), (old_level, achievement) in pending.items():
+                self._send_signals(tracked_id, achievement, old_level,
+                                   *self._crossed(achievement, old_level))
+
+    def _crossed(self, achievement, old_level):
+        """
+        Returns the number of goals achieved at ``old_level`` and at the current level. As goals
+        are sorted, the goals crossed by an update are the goals between these indexes.
+        """
+        with self._timer('check_signals'):
+            return achievement.goal_index(old_level), achievement.goal_index()
+
+    def _check_signals(self, tracked_id, achievement, old_level):
+        old, new = self._crossed(achievement, old_level)
+        pending = getattr(self._batches, 'pending', None)
+        if pending is not None:
+            key = (tracked_id, achievement.__class__.__name__)
+            if key in pending:
+                pending[key][1] = achievement
+            else:
+                pending[key] = [old_level, achievement]
+            result = list(achievement.goals[old:new]) if new > old else False
+        else:
+            result = self._send_signals(tracked_id, achievement, old_level, old, new)
+        if old != new and self._dependents:
+            self._update_dependents(tracked_id, achievement, old, new)
+        return result
+
+    def _send_signals(self, tracked_id, achievement, old_level, old, new):
+        if old_level < achievement.current[0]:
+            self._send(level_increased, tracked_id=tracked_id, achievement=achievement)
+        if new > old:
+            goals = list(achievement.goals[old:new])
+            self._send(goal_achieved, tracked_id=tracked_id, achievement=achievement, goals=goals)
+            if new == len(achievement.goals):
+                self._send(highest_level_achieved, tracked_id=tracked_id, achievement=achievement)
+            return goals
+        if new < old:
+            self._send(goal_lost, tracked_id=tracked_id, achievement=achievement,
+                       goals=list(achievement.goals[new:old]))
         return False
 
+    def _update_dependents(self, tracked_id, achievement, old, new):
+        """
+        Lets the dependents of ``achievement`` know if it has been completed, or is no longer
+        complete, for ``tracked_id``. Only the dependents of an achievement whose completion has
+        changed are loaded and updated.
+        """
+        dependents = self._dependents.get(achievement.__class__.__name__)
+        total = len(achievement.goals)
+        if not dependents or not total or (old == total) == (new == total):
+            return
+        for dependent in dependents:
+            dependent, level = self._refresh_dependent(tracked_id, dependent, achievement)
+            if dependent.current[0] != level:
+                self._set_level_for_id(tracked_id, dependent)
+                self._check_signals(tracked_id, dependent, level)
+
+    def _refresh_dependent(self, tracked_id, dependent, changed=None):
+        """
+        Loads ``dependent`` and its registered dependencies for ``tracked_id`` with a single
+        ``achievements_for_id`` call and passes the completed dependencies to
+        ``dependencies_changed``, so the level follows the stored completion of every dependency.
+        ``changed`` is an up to date instance of a dependency, used instead of the stored one.
+        Returns the dependent and its level before the update.
+        """
+        registered = dict((_.__name__, _) for _ in self._registry)
+        dependencies = [registered[_] for _ in _dependency_names(dependent) if _ in registered]
+        with self._timer('backend.achievements_for_id'):
+            loaded = self._backend.achievements_for_id(tracked_id, [dependent] + dependencies)
+        dependent, dependencies = loaded[0], loaded[1:]
+        if changed is not None:
+            dependencies = [changed if _.__class__ is changed.__class__ else _
+                            for _ in dependencies]
+        level = dependent.current[0]
+        dependent.dependencies_changed([_ for _ in dependencies
+                                        if _.goals and _.goal_index() == len(_.goals)])
+        return dependent, level
+
     def increment(self, tracked_id, achievement, amount=1, *args, **kwargs):
         """
         Increments an achievement for a given ``tracked_id``. Achievement can be an ``Achievement``
@@ -147,14 +385,39 @@ class AchievementTracker(object):
         If ``tracked_id`` has not been tracked yet by this tracker, it will be created before
         incrementing.
 
+        If the backend has an ``increment_level_for_id`` method, and the achievement does not
+        redefine ``increment`` or keep state, the level is incremented atomically by the backend
+        without being read first. The backend also checks the ``event_id``, if there is one, in
+        the same step.
+
+        If an ``event_id`` keyword argument is given, the increment is ignored if the level has
+        already been updated for that ``event_id`` (see :py:func:`AchievementBackend.has_event`),
+        so events that are delivered more than once are only counted once.
+
         Returns an list of achieved goals if a new goal was reached, or False
         """
-        achievement = self.achievement_for_id(tracked_id, achievement)
-        cur_level = achievement.current[0]
-        achieved = achievement.achieved[:]
-        achievement.increment(amount, *args, **kwargs)
-        self._backend.set_level_for_id(tracked_id, achievement.__class__, achievement.current[0])
-        return self._check_signals(tracked_id, achievement, cur_level, achieved)
+        event_id = kwargs.pop('event_id', None)
+        with self._timer('increment'):
+            atomic = getattr(self._backend, 'increment_level_for_id', None)
+            if atomic is not None and not args and not kwargs:
+                cls = self._registered(achievement)
+                if not cls.has_state and _default_increment(cls):
+                    with self._timer('backend.increment_level_for_id'):
+                        if event_id is None:
+                            level = atomic(tracked_id, cls, amount)
+                        else:
+                            level = atomic(tracked_id, cls, amount, event_id)
+                    if level is False:
+                        return False
+                    return self._check_signals(tracked_id, cls(current=level), level - amount)
+            if event_id is not None and self._has_event(tracked_id, achievement, event_id):
+                return False
+            achievement = self.achievement_for_id(tracked_id, achievement)
+            cur_level = achievement.current[0]
+            achievement.increment(amount, *args, **kwargs)
+            if self._set_level_for_id(tracked_id, achievement, event_id) is False:
+                return False
+            return self._check_signals(tracked_id, achievement, cur_level)
 
     def evaluate(self, tracked_id, achievement, *args, **kwargs):
         """
@@ -167,15 +430,22 @@ class AchievementTracker(object):
         If ``tracked_id`` has not been tracked yet by this tracker, it will be created before
         evaluating.
 
+        If an ``event_id`` keyword argument is given, the evaluation is ignored if the level has
+        already been updated for that ``event_id``, and the stored achieved goals are returned.
+
         Returns list of achieved goals for the given achievement after evaluation
         """
-        achievement = self.achievement_for_id(tracked_id, achievement)
-        cur_level = achievement.current[0]
-        achieved = achievement.achieved[:]
-        result = achievement.evaluate(*args, **kwargs)
-        self._backend.set_level_for_id(tracked_id, achievement.__class__, achievement.current[0])
-        self._check_signals(tracked_id, achievement, cur_level, achieved)
-        return result
+        event_id = kwargs.pop('event_id', None)
+        with self._timer('evaluate'):
+            if event_id is not None and self._has_event(tracked_id, achievement, event_id):
+                return self.achieved(tracked_id, achievement)
+            achievement = self.achievement_for_id(tracked_id, achievement)
+            cur_level = achievement.current[0]
+            result = achievement.evaluate(*args, **kwargs)
+            if self._set_level_for_id(tracked_id, achievement, event_id) is False:
+                return list(achievement.goals[:achievement.goal_index(cur_level)])
+            self._check_signals(tracked_id, achievement, cur_level)
+            return result
 
     def current(self, tracked_id, achievement):
         """
@@ -198,21 +468,162 @@ class AchievementTracker(object):
         achievement = self.achievement_for_id(tracked_id, achievement)
         return achievement.unachieved
 
+    def status(self, tracked_id, achievement):
+        """
+        Returns the :py:class:`AchievementStatus` for a given tracked_id, which combines
+        ``current``, ``achieved`` and ``unachieved`` using a single backend lookup. See
+        :ref:``Achievement``
+        """
+        achievement = self.achievement_for_id(tracked_id, achievement)
+        return achievement.status
+
+    def status_for_id(self, tracked_id, category=None, keywords=[], achievements=None):
+        """
+        Returns a list of :py:class:`AchievementStatus` for every achievement that matches the
+        given category and keywords, fetched from the backend in a single call.
+
+        If ``achievements`` (a list of achievements or achievement names) is given, the statuses for
+        those achievements are returned instead, in the same order. Raises NotRegistered if any of
+        them are not registered with the tracker.
+        """
+        return list(self.iter_status_for_id(tracked_id, category, keywords, achievements,
+                                            batch_size=None))
+
+    def iter_status_for_id(self, tracked_id, category=None, keywords=[], achievements=None,
+                           offset=0, limit=None, batch_size=50):
+        """
+        Generator version of :py:func:`status_for_id` for large numbers of achievements.
+
+        Achievements are filtered by ``category`` and ``keywords`` (or taken from
+        ``achievements``), then ``offset`` achievements are skipped and at most ``limit`` are
+        returned. Only the achievements being returned are requested from the backend, which is
+        queried with ``batch_size`` achievements at a time, so the first statuses are available
+        before the rest have been fetched. If ``batch_size`` is ``None``, all achievements are
+        requested at once.
+        """
+        if achievements is None:
+            achievements = self.achievements(category, keywords)
+        else:
+            achievements = [self._registered(_) for _ in achievements]
+        achievements = achievements[offset:None if limit is None else offset + limit]
+        batch_size = batch_size or len(achievements) or 1
+        for i in range(0, len(achievements), batch_size):
+            with self._timer('backend.achievements_for_id'):
+                batch = self._backend.achievements_for_id(tracked_id,
+                                                          achievements[i:i + batch_size])
+            for achievement in batch:
+                yield achievement.status
+
     def set_level(self, tracked_id, achievement, level):
         """
         Returns ``set_level`` for a given tracked_id. See :ref:``Achievement``
+
+        Returns the result of the backend's ``set_level_for_id``, such as the ``Future`` of the
+        update with :py:class:`QueuedSQLiteAchievementBackend`.
         """
-        achievement = self.achievement_for_id(tracked_id, achievement)
-        cur_level = achievement.current[0]
-        achieved = achievement.achieved[:]
-        achievement.set_level(level)
-        self._backend.set_level_for_id(tracked_id, achievement.__class__, achievement.current[0])
-        self._check_signals(tracked_id, achievement, cur_level, achieved)
+        with self._timer('set_level'):
+            achievement = self.achievement_for_id(tracked_id, achievement)
+            cur_level = achievement.current[0]
+            achievement.set_level(level)
+            result = self._set_level_for_id(tracked_id, achievement)
+            self._check_signals(tracked_id, achievement, cur_level)
+            return result
+
+    def evaluate_all(self, achievement, arg_provider=None, workers=None, chunk_size=500):
+        """
+        Re-evaluates an achievement for every tracked id, for example after the rules used by its
+        ``evaluate`` have changed.
+
+        Tracked ids are split into chunks of ``chunk_size`` which are evaluated in parallel by a
+        pool of ``workers`` processes (defaults to the number of CPUs). If ``workers`` is 1, all
+        evaluation happens in the current process. Changed levels are written back to the backend
+        in batches of ``chunk_size``, and signals are sent from the current process.
+
+        Arguments:
+
+            achievement
+                The ``Achievement`` (or name of a registered achievement) to evaluate. It must be
+                defined at the top level of a module so it can be used by the worker processes.
+
+            arg_provider
+                A function called (in the current process) as ``arg_provider(tracked_id)`` which
+                returns a tuple of arguments to pass to ``evaluate``. The arguments must be
+                picklable. If ``None``, ``evaluate`` is called without arguments.
+
+        Achievements with state (see ``has_state``) or dependencies (see ``depends_on``) are
+        instead loaded, evaluated and stored one tracked id at a time in the current process, so
+        their state is restored before ``evaluate`` and written back with the new level, and the
+        level of a dependent is first recomputed from its completed dependencies. This backfills
+        dependencies that were completed before the dependent was registered.
+
+        Returns the number of levels that changed.
+        """
+        achievement = self._registered(achievement)
+        if achievement.has_state or achievement.depends_on:
+            return self._evaluate_all_each(achievement, arg_provider)
+        levels = dict((_[0], _[2]) for _ in self._backend.iter_levels(achievement, chunk_size))
+        chunks = ([(tid, levels.get(tid, 0), tuple(arg_provider(tid)) if arg_provider else ())
+                   for tid in chunk]
+                  for chunk in _batches(self.get_tracked_ids(), chunk_size))
+        if workers == 1:
+            results = (_evaluate_chunk(achievement, _) for _ in chunks)
+        else:
+            results = self._evaluate_in_pool(achievement, chunks, workers)
+
+        changed = 0
+        for result in results:
+            rows = [(tid, achievement, level) for tid, level in result
+                    if level != levels.get(tid, 0)]
+            with self._timer('backend.set_levels'):
+                self._backend.set_levels(rows, chunk_size)
+            for tid, _, level in rows:
+                self._check_signals(tid, achievement(current=level), levels.get(tid, 0))
+            changed += len(rows)
+        return changed
+
+    def _evaluate_all_each(self, achievement, arg_provider):
+        """ Evaluates an achievement for every tracked id, one at a time """
+        changed = 0
+        for tid in self.get_tracked_ids():
+            if achievement.depends_on:
+                a, cur_level = self._refresh_dependent(tid, achievement)
+                state = None
+            else:
+                a = self.achievement_for_id(tid, achievement)
+                cur_level, state = a.current[0], a.get_state()
+            a.evaluate(*(tuple(arg_provider(tid)) if arg_provider else ()))
+            if a.current[0] == cur_level and a.get_state() == state:
+                continue
+            self._set_level_for_id(tid, a)
+            self._check_signals(tid, a, cur_level)
+            changed += a.current[0] != cur_level
+        return changed
+
+    @staticmethod
+    def _evaluate_in_pool(achievement, chunks, workers):
+        """
+        Evaluates chunks in a process pool, yielding results in order while keeping at most two
+        chunks per worker in flight
+        """
+        from concurrent.futures import ProcessPoolExecutor
+        from multiprocessing import cpu_count
+        workers = workers or cpu_count()
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            pending = deque()
+            max_pending = 2 * workers
+            for chunk in chunks:
+                pending.append(executor.submit(_evaluate_chunk, achievement, chunk))
+                if len(pending) >= max_pending:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
 
     def get_tracked_ids(self):
         """ Returns all tracked ids """
-        return self._backend.get_tracked_ids()
+        with self._timer('backend.get_tracked_ids'):
+            return self._backend.get_tracked_ids()
 
     def remove_id(self, tracked_id):
         """ Remove all tracked information for tracked_id """
-        self._backend.remove_id(tracked_id)
+        with self._timer('backend.remove_id'):
+            self._backend.remove_id(tracked_id)
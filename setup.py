@@ -32,7 +32,12 @@ setup(
         'pychievements',
     ],
     extras_require={
-        'cli': ["clint"]
+        'cli': ["clint"],
+        # concurrent.futures is used by the queued and sharded backends and evaluate_all
+        ':python_version < "3.2"': ["futures"],
+    },
+    entry_points={
+        'console_scripts': ['pychievements = pychievements.console:main'],
     },
     license='MIT',
     classifiers=(
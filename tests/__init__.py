@@ -1,13 +1,35 @@
 import os
+import fnmatch
+import json
+import sys
+import subprocess
 import random
+import socket
+import sqlite3
+import threading
+import time
 import unittest
 import tempfile
 
-from pychievements import Achievement, icons
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+from pychievements import Achievement, WindowedAchievement, icons
 from pychievements import cli
+from pychievements import console
 from pychievements.trackers import AchievementTracker, NotRegistered, AlreadyRegistered
-from pychievements.backends import SQLiteAchievementBackend
+from pychievements.backends import SQLiteAchievementBackend, QueuedSQLiteAchievementBackend
+from pychievements.backends import AchievementBackend, CachedAchievementBackend, EventWindow
+from pychievements.backends import ShardedAchievementBackend, SnapshotAchievementBackend
+from pychievements.server import AchievementServer, LocalTransport, RemoteAchievementBackend
+from pychievements.server import RemoteError
+from pychievements.redis import RedisAchievementBackend, RespClient, ResponseError
+from pychievements.stats import TrackerStats
+from pychievements.tracing import Tracer
 from pychievements.signals import receiver, goal_achieved, level_increased, highest_level_achieved
+from pychievements.signals import Signal, goal_lost
 
 
 def AchievementFactory(name):
@@ -25,6 +47,108 @@ TRACKED_IDS = [3324, 608, 'deserunt', 'omnis', 'excepturi', 'dolores', 'vero']
 ACHIEVEMENTS = [AchievementFactory("Achieve%d" % _) for _ in range(0, random.randrange(5, 10))]
 
 
+def check_dependencies(test):
+    """ Checks dependents are updated as their dependencies are completed """
+    deps = ACHIEVEMENTS[:2]
+    meta = type('Meta', (Achievement,), {'category': 'meta',
+                                         'depends_on': (deps[0], deps[1].__name__),
+                                         'goals': ({'level': 2, 'name': 'meta', 'icon': None,
+                                                    'description': 'meta'},)})
+    test.tracker.register(meta)
+    test.assertEqual(test.tracker.dependents(deps[0]), [meta])
+    test.assertEqual(test.tracker.dependents(deps[1].__name__), [meta])
+
+    received = []
+    rec = lambda achievement, **kwargs: received.append(achievement.__class__)
+    highest_level_achieved.connect(rec)
+    tid = random.choice(TRACKED_IDS)
+    test.tracker.increment(tid, deps[0], deps[0].goals[-1]['level'])
+    test.assertEqual(test.tracker.current(tid, meta)[0], 1)
+    test.tracker.increment(tid, deps[0])
+    test.assertEqual(test.tracker.current(tid, meta)[0], 1)
+    with test.tracker.batch():
+        test.tracker.set_level(tid, deps[1], deps[1].goals[-1]['level'])
+        test.assertEqual(test.tracker.current(tid, meta)[0], 2)
+    highest_level_achieved.disconnect(rec)
+    test.assertEqual(received, [deps[0], deps[1], meta])
+    test.tracker.set_level(tid, deps[0], 0)
+    test.assertEqual(test.tracker.current(tid, meta)[0], 1)
+
+    test.tracker.unregister(meta)
+    test.assertEqual(test.tracker.dependents(deps[0]), [])
+
+
+def check_dependency_completed_first(test):
+    """ Checks dependencies completed before their dependent was registered are counted """
+    dep = ACHIEVEMENTS[2]
+    tid, other = random.sample(TRACKED_IDS, 2)
+    for _ in (tid, other):
+        test.tracker.set_level(_, dep, dep.goals[-1]['level'])
+    late = type('Late', (Achievement,), {'category': 'meta', 'depends_on': (dep,),
+                                         'goals': ({'level': 1, 'name': 'late', 'icon': None,
+                                                    'description': 'late'},)})
+    test.tracker.register(late)
+    test.tracker.set_level(tid, dep, 0)
+    test.assertEqual(test.tracker.current(tid, late)[0], 0)
+    test.tracker.set_level(tid, dep, dep.goals[-1]['level'])
+    test.assertEqual(test.tracker.current(tid, late)[0], 1)
+    test.assertEqual(test.tracker.current(other, late)[0], 0)
+    test.assertEqual(test.tracker.evaluate_all(late, workers=1), 1)
+    test.assertEqual(test.tracker.current(other, late)[0], 1)
+    test.tracker.unregister(late)
+
+
+def check_circular_dependencies(test):
+    """ Checks circular dependencies can not be registered """
+    a = type('CycleA', (Achievement,), {'category': 'meta', 'depends_on': ('CycleB',)})
+    b = type('CycleB', (Achievement,), {'category': 'meta', 'depends_on': (a,)})
+    test.tracker.register(a)
+    test.assertRaises(ValueError, test.tracker.register, b)
+    test.assertFalse(test.tracker.is_registered(b))
+
+
+def check_event_ids(test):
+    """
+    Checks increments and evaluations with an event_id are only counted once, returning the
+    tracked_id used
+    """
+    tid = random.choice(TRACKED_IDS)
+    achiev, other = ACHIEVEMENTS[:2]
+    levels = [test.tracker.current(tid, _)[0] for _ in (achiev, other)]
+    for event_id in ['a', 'b', 'a', 'c', 'b']:
+        test.tracker.increment(tid, achiev, event_id=event_id)
+    test.assertEqual(test.tracker.increment(tid, achiev, 5, event_id='c'), False)
+    test.tracker.increment(tid, other, event_id='a')
+    test.tracker.increment(tid, achiev)
+    test.assertEqual([test.tracker.current(tid, _)[0] for _ in (achiev, other)],
+                     [levels[0] + 4, levels[1] + 1])
+    test.assertEqual(test.tracker.evaluate(tid, achiev, event_id='a'),
+                     test.tracker.achieved(tid, achiev))
+    test.assertFalse(test.tracker._backend.has_event(tid, achiev, 'd'))
+    test.tracker.evaluate(tid, achiev, event_id='d')
+    test.assertTrue(test.tracker._backend.has_event(tid, achiev, 'd'))
+    return tid
+
+
+def check_concurrent_event_ids(test, num_threads=4, num_events=50):
+    """ Checks each event id is counted once when several threads increment with it at once """
+    tid = random.choice(TRACKED_IDS)
+    level = test.tracker.current(tid, ACHIEVEMENTS[1])[0]
+
+    def work():
+        event_ids = list(range(num_events))
+        random.shuffle(event_ids)
+        for event_id in event_ids:
+            test.tracker.increment(tid, ACHIEVEMENTS[1], event_id=event_id)
+
+    threads = [threading.Thread(target=work) for _ in range(num_threads)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    test.assertEqual(test.tracker.current(tid, ACHIEVEMENTS[1])[0], level + num_events)
+
+
 class TrackerTests(unittest.TestCase):
     def setUp(self):
         self.tracker = AchievementTracker()
@@ -93,12 +217,93 @@ class TrackerTests(unittest.TestCase):
         tid = random.choice(TRACKED_IDS)
         self.assertEqual(self.tracker.evaluate(tid, random.choice(ACHIEVEMENTS)), [])
 
+    def test_iter_status_for_id(self):
+        tid = random.choice(TRACKED_IDS)
+        calls = []
+        achievements_for_id = self.tracker._backend.achievements_for_id
+        self.tracker._backend.achievements_for_id = lambda *args: (calls.append(args[1]) or
+                                                                   achievements_for_id(*args))
+        statuses = list(self.tracker.iter_status_for_id(tid, offset=1, limit=3, batch_size=2))
+        self.assertEqual([_.achievement.__class__ for _ in statuses], ACHIEVEMENTS[1:4])
+        self.assertEqual(calls, [ACHIEVEMENTS[1:3], ACHIEVEMENTS[3:4]])
+
+    def test_evaluate_all(self):
+        self.tracker.register(Doubler)
+        received = []
+        rec = lambda goals, **kwargs: received.append(goals)
+        goal_achieved.connect(rec)
+        for i, tid in enumerate(TRACKED_IDS):
+            self.tracker.set_level(tid, Doubler, i)
+        changed = self.tracker.evaluate_all(Doubler, doubler_provider, workers=1, chunk_size=3)
+        self.assertEqual(changed, len(TRACKED_IDS) - 1)
+        for i, tid in enumerate(TRACKED_IDS):
+            self.assertEqual(self.tracker.current(tid, Doubler)[0], i * 2)
+        self.assertEqual(self.tracker.evaluate_all('Doubler', workers=2), len(TRACKED_IDS) - 1)
+        for i, tid in enumerate(TRACKED_IDS):
+            self.assertEqual(self.tracker.current(tid, Doubler)[0], i * 4)
+        goal_achieved.disconnect(rec)
+        self.assertEqual(len(received), len([_ for _ in range(len(TRACKED_IDS)) if _ * 4 >= 10]))
+
     def test_set_level(self):
         tid = 'randomeID'
         achiev = random.choice(ACHIEVEMENTS)
         self.tracker.set_level(tid, achiev, 100)
         self.assertEqual(self.tracker.current(tid, achiev)[0], 100)
 
+    def test_status(self):
+        tid = random.choice(TRACKED_IDS)
+        achiev = random.choice(ACHIEVEMENTS)
+        self.tracker.set_level(tid, achiev, achiev.goals[0]['level'])
+        status = self.tracker.status(tid, achiev)
+        self.assertEqual(status.level, self.tracker.current(tid, achiev)[0])
+        self.assertEqual(status.goal, self.tracker.current(tid, achiev)[1])
+        self.assertEqual(status.achieved, len(self.tracker.achieved(tid, achiev)))
+        self.assertEqual(status.progress, float(status.level) / status.goal['level'])
+        self.tracker.set_level(tid, achiev, achiev.goals[-1]['level'])
+        status = self.tracker.status(tid, achiev)
+        self.assertEqual(status.goal, None)
+        self.assertEqual(status.progress, 1.0)
+
+    def test_goals(self):
+        achiev = type('Unsorted', (Achievement,), {'goals': (
+            {'level': 20, 'name': 'Two', 'icon': icons.star, 'description': '2', 'points': 5},
+            {'level': 10, 'name': 'One', 'icon': icons.star, 'description': '1'})})
+        self.assertEqual([(_.index, _['name'], _.level) for _ in achiev.goals],
+                         [(0, 'One', 10), (1, 'Two', 20)])
+        goal = achiev.goals[1]
+        self.assertEqual(goal['points'], 5)
+        self.assertEqual(goal.get('points'), 5)
+        self.assertEqual(goal.get('missing'), None)
+        self.assertRaises(KeyError, goal.__getitem__, 'missing')
+        self.assertEqual(achiev(current=15).current[1], goal)
+        self.assertEqual(achiev(current=15).achieved, [achiev.goals[0]])
+        self.assertNotEqual(goal, dict(goal.items()))
+        achiev.goals = achiev.goals[:1]
+        self.assertEqual(achiev(current=15).current, (15, None))
+
+    def test_status_for_id(self):
+        tid = random.choice(TRACKED_IDS)
+        cat = random.choice(CATEGORIES)
+        statuses = self.tracker.status_for_id(tid, category=cat)
+        self.assertEqual([_.achievement.__class__ for _ in statuses],
+                         self.tracker.achievements(category=cat))
+        statuses = self.tracker.status_for_id(tid, achievements=ACHIEVEMENTS[:2])
+        self.assertEqual([_.achievement.__class__ for _ in statuses], ACHIEVEMENTS[:2])
+        self.assertRaises(NotRegistered, self.tracker.status_for_id, tid,
+                          achievements=['NotRegistered'])
+
+    def test_dependencies(self):
+        check_dependencies(self)
+
+    def test_dependency_completed_first(self):
+        check_dependency_completed_first(self)
+
+    def test_circular_dependencies(self):
+        check_circular_dependencies(self)
+
+    def test_event_ids(self):
+        check_event_ids(self)
+
     def test_remove_id(self):
         tid = random.choice(TRACKED_IDS)
         for _ in TRACKED_IDS:
@@ -108,6 +313,59 @@ class TrackerTests(unittest.TestCase):
         self.assertEqual(len(self.tracker.get_tracked_ids()), len(TRACKED_IDS)-1)
 
 
+class SnapshotTrackerTests(TrackerTests):
+    def setUp(self):
+        self.backend = SnapshotAchievementBackend()
+        self.tracker = AchievementTracker(self.backend)
+        self.tracker.register(ACHIEVEMENTS)
+
+    def test_snapshots(self):
+        tid = random.choice(TRACKED_IDS)
+        achiev = random.choice(ACHIEVEMENTS)
+        held = self.tracker.achievement_for_id(tid, achiev)
+        self.tracker.increment(tid, achiev, 5)
+        self.tracker.set_level(tid, achiev, 3)
+        self.assertEqual(held.current[0], 0)
+        self.assertIsNot(self.tracker.achievement_for_id(tid, achiev),
+                         self.tracker.achievement_for_id(tid, achiev))
+        self.tracker.register(Logins)
+        self.tracker.increment(tid, Logins, 2)
+        self.tracker._backend.set_level_for_id(tid, Logins, 2)
+        self.assertEqual(self.tracker.achievement_for_id(tid, Logins).get_state()[1], [2])
+
+    def test_concurrent_event_ids(self):
+        check_concurrent_event_ids(self)
+
+    def test_threaded(self):
+        achievements = ACHIEVEMENTS[:2]
+        num_increment = 200
+        done = []
+        seen = []
+
+        def write():
+            for _ in range(num_increment):
+                for a in achievements:
+                    self.tracker.increment('user', a)
+            done.append(True)
+
+        def read():
+            while not done:
+                levels = [_.current[0] for _ in self.backend.achievements_for_id('user',
+                                                                                 achievements)]
+                # both levels are read from the same snapshot, so they can be at most one apart
+                seen.append(levels[0] - levels[1] in (0, 1))
+
+        threads = [threading.Thread(target=read) for _ in range(3)]
+        threads.append(threading.Thread(target=write))
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertTrue(all(seen))
+        self.assertEqual([self.tracker.current('user', _)[0] for _ in achievements],
+                         [num_increment] * 2)
+
+
 class AchievementBackenedTests(unittest.TestCase):
     # only tests things that haven't been hit in TrackerTests
     def setUp(self):
@@ -117,6 +375,27 @@ class AchievementBackenedTests(unittest.TestCase):
     def test_set_level_for_id(self):
         self.tracker._backend.set_level_for_id('newid', random.choice(ACHIEVEMENTS), 100)
 
+    def test_event_window(self):
+        now = [1000.0]
+        events = EventWindow(window=10, buckets=5)
+        events.now = lambda: now[0]
+        self.assertTrue(events.add('a'))
+        self.assertFalse(events.add('a'))
+        now[0] += 5
+        self.assertTrue(events.add('b'))
+        self.assertTrue('a' in events)
+        now[0] += 5
+        self.assertFalse('a' in events)
+        self.assertTrue('b' in events)
+        self.assertEqual(len(events), 1)
+        self.assertTrue(events.add('a'))
+        events = EventWindow(window=10, buckets=5, max_size=2)
+        events.now = lambda: now[0]
+        for key in 'abc':
+            now[0] += 2
+            events.add(key)
+        self.assertEqual([_ in events for _ in 'abc'], [False, True, True])
+
 
 class SQLiteBackendTests(unittest.TestCase):
     def setUp(self):
@@ -130,6 +409,18 @@ class SQLiteBackendTests(unittest.TestCase):
     def tearDown(self):
         os.remove(self.dbfile.name)
 
+    def test_new_schema(self):
+        for backend in getattr(self.backend, 'backends', [self.backend]):
+            conn = sqlite3.connect(backend.dbfile)
+            indexes = [_[0] for _ in conn.execute("select name from sqlite_master where "
+                                                  "type='index' and tbl_name='pychievements'")]
+            version = conn.execute('pragma user_version').fetchone()[0]
+            conn.close()
+            self.assertEqual(sorted(indexes), ['pychievements_achievement_level',
+                                               'pychievements_tracked_achievement'])
+            self.assertEqual(version, len(SQLiteAchievementBackend.migrations))
+        self.assertEqual(self.backend.migrate(), [])
+
     def test_increment(self):
         tid = random.choice(TRACKED_IDS)
         num_increment = random.randint(20, 60)
@@ -142,6 +433,18 @@ class SQLiteBackendTests(unittest.TestCase):
         tid = random.choice(TRACKED_IDS)
         achiev = self.tracker.achievement_for_id(tid, random.choice(ACHIEVEMENTS))
         self.assertEqual(self.tracker.current(tid, achiev), achiev.current)
+
+    def test_many_achievements(self):
+        tid = random.choice(TRACKED_IDS)
+        achievements = [type('Many%d' % _, (Achievement,), {'has_state': bool(_ % 2)})
+                         for _ in range(600)]
+        self.backend.set_levels((tid, a, i) for i, a in enumerate(achievements))
+        for a in achievements[1::2]:
+            self.backend.set_level_for_id(tid, a, 1, ['state'])
+        for count in (0, 1, 3, 600):
+            restored = self.backend.achievements_for_id(tid, achievements[:count])
+            self.assertEqual([_.current[0] for _ in restored],
+                             [1 if i % 2 else i for i in range(count)])
         self.assertRaises(NotRegistered, self.tracker.achievement_for_id, tid, 'NotRegistered')
 
     def test_set_level(self):
@@ -150,6 +453,25 @@ class SQLiteBackendTests(unittest.TestCase):
         self.tracker.set_level(tid, achiev, 100)
         self.assertEqual(self.tracker.current(tid, achiev)[0], 100)
 
+    def test_dependencies(self):
+        check_dependencies(self)
+
+    def test_dependency_completed_first(self):
+        check_dependency_completed_first(self)
+
+    def test_circular_dependencies(self):
+        check_circular_dependencies(self)
+
+    def test_event_ids(self):
+        tid = check_event_ids(self)
+        if isinstance(self.backend, SQLiteAchievementBackend):
+            # event ids are stored with the levels
+            getattr(self.backend, 'flush', lambda: None)()
+            backend = SQLiteAchievementBackend(self.dbfile.name)
+            self.assertTrue(backend.has_event(tid, ACHIEVEMENTS[0], 'a'))
+            self.assertFalse(backend.has_event(tid, ACHIEVEMENTS[1], 'b'))
+            backend.close()
+
     def test_remove_id(self):
         tid = random.choice(TRACKED_IDS)
         for _ in TRACKED_IDS:
@@ -158,6 +480,565 @@ class SQLiteBackendTests(unittest.TestCase):
         self.assertEqual(len(self.tracker.get_tracked_ids()), len(TRACKED_IDS)-1)
 
 
+class PooledSQLiteBackendTests(SQLiteBackendTests):
+    def setUp(self):
+        self.dbfile = tempfile.NamedTemporaryFile(delete=False)
+        self.dbfile.close()
+        self.backend = SQLiteAchievementBackend(self.dbfile.name, pooled=True)
+        self.tracker = AchievementTracker()
+        self.tracker.set_backend(self.backend)
+        self.tracker.register(ACHIEVEMENTS)
+
+    def tearDown(self):
+        self.backend.close()
+        os.remove(self.dbfile.name)
+
+    def test_threaded_increment(self):
+        num_increment = 25
+
+        def work(tid):
+            for _ in range(num_increment):
+                self.tracker.increment(tid, ACHIEVEMENTS[0])
+
+        threads = [threading.Thread(target=work, args=(_,)) for _ in TRACKED_IDS]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        for tid in TRACKED_IDS:
+            self.assertEqual(self.tracker.current(tid, ACHIEVEMENTS[0])[0], num_increment)
+        self.assertEqual(len(self.tracker.get_tracked_ids()), len(TRACKED_IDS))
+
+    def test_contended_increment(self):
+        num_threads, num_increment = 4, 100
+        tid = random.choice(TRACKED_IDS)
+        level = self.tracker.current(tid, ACHIEVEMENTS[1])[0]
+
+        def work():
+            for _ in range(num_increment):
+                self.tracker.increment(tid, ACHIEVEMENTS[1])
+
+        threads = [threading.Thread(target=work) for _ in range(num_threads)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(self.tracker.current(tid, ACHIEVEMENTS[1])[0],
+                         level + num_threads * num_increment)
+
+    def test_concurrent_event_ids(self):
+        check_concurrent_event_ids(self)
+
+    def test_reader_pool(self):
+        tid = random.choice(TRACKED_IDS)
+        for _ in range(5):
+            threads = [threading.Thread(target=self.tracker.current, args=(tid, ACHIEVEMENTS[0]))
+                       for _ in range(20)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        for backend in getattr(self.backend, 'backends', [self.backend]):
+            self.assertTrue(len(backend._readers) <= backend.max_readers)
+            self.assertEqual(backend._idle.qsize(), len(backend._readers))
+
+
+class QueuedSQLiteBackendTests(PooledSQLiteBackendTests):
+    def setUp(self):
+        self.dbfile = tempfile.NamedTemporaryFile(delete=False)
+        self.dbfile.close()
+        self.backend = QueuedSQLiteAchievementBackend(self.dbfile.name, commit_interval=0.001)
+        self.tracker = AchievementTracker()
+        self.tracker.set_backend(self.backend)
+        self.tracker.register(ACHIEVEMENTS)
+
+    def test_future(self):
+        future = self.backend.set_level_for_id('futureid', ACHIEVEMENTS[0], 42)
+        self.assertEqual(future.result(timeout=5), 42)
+        other = SQLiteAchievementBackend(self.dbfile.name)
+        self.assertEqual(other.achievement_for_id('futureid', ACHIEVEMENTS[0]).current[0], 42)
+        future = self.tracker.set_level('futureid', ACHIEVEMENTS[1], 7)
+        self.assertEqual(future.result(timeout=5), 7)
+        self.assertEqual(other.achievement_for_id('futureid', ACHIEVEMENTS[1]).current[0], 7)
+        other.close()
+
+    def test_failed_commit(self):
+        other = SQLiteAchievementBackend(self.dbfile.name)
+        other.conn.execute('drop table pychievements')
+        other.close()
+        future = self.backend.set_level_for_id('failid', ACHIEVEMENTS[0], 42)
+        self.assertRaises(sqlite3.OperationalError, self.backend.flush)
+        self.assertRaises(sqlite3.OperationalError, future.result, 5)
+        self.backend.flush()
+
+    def test_flush(self):
+        for _ in range(10):
+            self.tracker.increment('flushid', ACHIEVEMENTS[0])
+        self.backend.flush()
+        self.assertEqual(self.backend._pending, {})
+        other = SQLiteAchievementBackend(self.dbfile.name)
+        self.assertEqual(other.achievement_for_id('flushid', ACHIEVEMENTS[0]).current[0], 10)
+        other.close()
+
+
+class ShardedBackendTests(PooledSQLiteBackendTests):
+    def setUp(self):
+        self.dbfiles = [tempfile.NamedTemporaryFile(delete=False) for _ in range(3)]
+        for f in self.dbfiles:
+            f.close()
+        self.backend = ShardedAchievementBackend.from_sqlite([_.name for _ in self.dbfiles])
+        self.tracker = AchievementTracker()
+        self.tracker.set_backend(self.backend)
+        self.tracker.register(ACHIEVEMENTS)
+
+    def tearDown(self):
+        self.backend.close()
+        for f in self.dbfiles:
+            os.remove(f.name)
+
+    def populate(self):
+        for i, tid in enumerate(TRACKED_IDS):
+            self.tracker.set_level(tid, ACHIEVEMENTS[0], i + 1)
+
+    def test_routing(self):
+        self.populate()
+        for tid in TRACKED_IDS:
+            shard = self.backend.shard_for(tid)
+            self.assertEqual(list(shard.get_tracked_ids()).count(str(tid)), 1)
+        self.assertEqual(sum(len(_.get_tracked_ids()) for _ in self.backend.backends),
+                         len(TRACKED_IDS))
+
+    def test_aggregates(self):
+        self.populate()
+        n = len(TRACKED_IDS)
+        self.assertEqual(self.backend.leaderboard(ACHIEVEMENTS[0], 2),
+                         [(str(TRACKED_IDS[-1]), n), (str(TRACKED_IDS[-2]), n - 1)])
+        summary = self.backend.summary()
+        self.assertEqual(summary['tracked_ids'], n)
+        self.assertEqual(summary['achievements'][ACHIEVEMENTS[0].__name__],
+                         {'count': n, 'total': n * (n + 1) // 2, 'max': n})
+        self.assertEqual(self.backend.set_levels([(_, ACHIEVEMENTS[1], 5) for _ in range(20)], 4),
+                         20)
+        self.assertEqual(len(list(self.backend.iter_levels(ACHIEVEMENTS[1]))), 20)
+        self.assertEqual(self.backend.migrate(), [])
+
+    def test_reshard(self):
+        self.populate()
+        self.tracker.register(Logins)
+        self.tracker.increment('windowed', Logins, 2, event_id='replayed')
+        self.backend.get_tracked_ids()
+        old = self.backend.backends
+        new = [tempfile.NamedTemporaryFile(delete=False) for _ in range(2)]
+        for f in new:
+            f.close()
+        self.dbfiles += new
+        count = self.backend.reshard([SQLiteAchievementBackend(_.name, pooled=True) for _ in new],
+                                     self.tracker.achievements())
+        self.assertEqual(count, len(TRACKED_IDS) + 1)
+        for i, tid in enumerate(TRACKED_IDS):
+            self.assertEqual(self.tracker.current(tid, ACHIEVEMENTS[0])[0], i + 1)
+        self.assertEqual(self.backend.achievement_for_id('windowed', Logins).get_state()[1], [2])
+        self.assertEqual(self.tracker.increment('windowed', Logins, 2, event_id='replayed'), False)
+        self.assertEqual(self.tracker.current('windowed', Logins)[0], 2)
+        self.assertEqual(self.backend._executor, None)
+        self.assertRaises(ValueError, self.backend.reshard, old, [])
+        for backend in old:
+            backend.close()
+
+
+class RemoteBackendTests(unittest.TestCase):
+    def setUp(self):
+        self.transport = LocalTransport()
+        self.backend = RemoteAchievementBackend(transport=self.transport)
+        self.tracker = AchievementTracker(self.backend)
+        self.tracker.register(ACHIEVEMENTS)
+
+    def test_increment(self):
+        tid = random.choice(TRACKED_IDS)
+        num_increment = random.randint(20, 60)
+        for _ in range(num_increment):
+            self.tracker.increment(tid, random.choice(self.tracker.achievements()))
+        total = sum([_.current[0] for _ in self.tracker.achievements_for_id(tid)])
+        self.assertEqual(total, num_increment)
+        self.assertEqual(self.tracker.get_tracked_ids(), [tid])
+        self.tracker.remove_id(tid)
+        self.assertEqual(self.tracker.get_tracked_ids(), [])
+
+    def test_event_ids(self):
+        check_event_ids(self)
+
+    def test_concurrent_event_ids(self):
+        check_concurrent_event_ids(self)
+
+    def test_pipeline(self):
+        with self.backend.pipeline():
+            for tid in TRACKED_IDS:
+                self.backend.set_level_for_id(tid, ACHIEVEMENTS[0], 5)
+            self.assertEqual(self.transport.requests, 0)
+            self.assertEqual(self.tracker.current(TRACKED_IDS[0], ACHIEVEMENTS[0])[0], 5)
+            self.assertEqual(self.transport.requests, 1)
+            for tid in TRACKED_IDS:
+                self.tracker.increment(tid, ACHIEVEMENTS[0])
+        # each increment is a single atomic round trip
+        self.assertEqual(self.transport.requests, len(TRACKED_IDS) + 1)
+        self.assertEqual(sorted(_[2] for _ in self.backend.iter_levels(batch_size=2)),
+                         [6] * len(TRACKED_IDS))
+
+    def test_bulk(self):
+        self.assertEqual(self.backend.set_levels([(_, ACHIEVEMENTS[0], _) for _ in range(10)], 3),
+                         10)
+        self.assertEqual(self.backend.leaderboard(ACHIEVEMENTS[0], 2), [(9, 9), (8, 8)])
+        summary = self.backend.summary()
+        self.assertEqual(summary['achievements'][ACHIEVEMENTS[0].__name__],
+                         {'count': 10, 'total': 45, 'max': 9})
+        self.assertEqual(len(list(self.backend.iter_levels(ACHIEVEMENTS[1], 3))), 0)
+
+    def test_remove_reuses_rows(self):
+        store = self.transport.store
+        for _ in range(5):
+            for tid in TRACKED_IDS:
+                self.tracker.increment(tid, ACHIEVEMENTS[0])
+                self.tracker.remove_id(tid)
+        self.assertEqual(len(store._rows), 1)
+        self.backend.set_levels([(_, ACHIEVEMENTS[0], _) for _ in range(4)], 3)
+        self.backend.remove_id(1)
+        self.backend.set_levels([(4, ACHIEVEMENTS[0], 4)], 3)
+        self.assertEqual(len(store._rows), 4)
+        self.assertEqual(sorted(_[0] for _ in self.backend.iter_levels(ACHIEVEMENTS[0], 3)),
+                         [0, 2, 3, 4])
+
+    def test_errors(self):
+        self.assertRaises(RemoteError, self.backend._call, ['nonsense'])
+        self.assertRaises(RemoteError, self.backend._call, ['set', 'tid'])
+
+    def test_windowed(self):
+        self.tracker.register(Logins)
+        self.tracker.increment('user', Logins, 2)
+        self.assertEqual(self.backend.achievement_for_id('user', Logins).get_state()[1], [2])
+
+    def test_server(self):
+        path = os.path.join(tempfile.mkdtemp(), 'pychievements.sock')
+        server = AchievementServer(path)
+        server.start()
+        try:
+            trackers = [AchievementTracker(RemoteAchievementBackend(path)) for _ in range(2)]
+            for tracker in trackers:
+                tracker.register(ACHIEVEMENTS)
+
+            def work(tid):
+                for _ in range(10):
+                    for tracker in trackers:
+                        tracker.increment(tid, ACHIEVEMENTS[0])
+
+            threads = [threading.Thread(target=work, args=(_,)) for _ in TRACKED_IDS]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            for tid in TRACKED_IDS:
+                self.assertEqual(trackers[0].current(tid, ACHIEVEMENTS[0])[0], 20)
+            for tracker in trackers:
+                tracker._backend.close()
+        finally:
+            server.close()
+            os.rmdir(os.path.dirname(path))
+
+
+try:
+    import socketserver
+except ImportError:
+    import SocketServer as socketserver
+
+
+class FakeRedisHandler(socketserver.StreamRequestHandler):
+    """ Speaks enough of the Redis protocol for RedisAchievementBackend """
+    def setup(self):
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        socketserver.StreamRequestHandler.setup(self)
+
+    def read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        args = []
+        for _ in range(int(line[1:])):
+            size = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(size + 2)[:-2].decode('utf-8'))
+        return args
+
+    def reply(self, value):
+        if value is True:
+            return b'+OK\r\n'
+        if isinstance(value, Exception):
+            return ('-ERR %s\r\n' % value).encode('utf-8')
+        if isinstance(value, int):
+            return (':%d\r\n' % value).encode('ascii')
+        if value is None:
+            return b'$-1\r\n'
+        if isinstance(value, list):
+            return ('*%d\r\n' % len(value)).encode('ascii') + b''.join(self.reply(_)
+                                                                        for _ in value)
+        value = str(value).encode('utf-8')
+        return ('$%d\r\n' % len(value)).encode('ascii') + value + b'\r\n'
+
+    def handle(self):
+        queued = None
+        watched = {}
+        while True:
+            args = self.read_command()
+            if args is None:
+                return
+            if args[0] == 'MULTI':
+                queued = []
+                self.wfile.write(b'+OK\r\n')
+            elif args[0] == 'EXEC':
+                with self.server.lock:
+                    if any(self.server.versions.get(k) != v for k, v in watched.items()):
+                        self.wfile.write(self.reply(None))
+                    else:
+                        self.wfile.write(self.reply([self.execute(_) for _ in queued]))
+                queued = None
+                watched = {}
+            elif args[0] in ('WATCH', 'UNWATCH'):
+                with self.server.lock:
+                    if args[0] == 'UNWATCH':
+                        watched = {}
+                    watched.update((_, self.server.versions.get(_)) for _ in args[1:])
+                self.wfile.write(b'+OK\r\n')
+            elif queued is not None:
+                queued.append(args)
+                self.wfile.write(b'+QUEUED\r\n')
+            else:
+                with self.server.lock:
+                    self.wfile.write(self.reply(self.execute(args)))
+
+    def execute(self, args):
+        self.server.commands += 1
+        hashes, zsets = self.server.hashes, self.server.zsets
+        cmd, key, rest = args[0], args[1] if len(args) > 1 else None, args[2:]
+        if cmd in ('HSET', 'HSETNX', 'HINCRBY', 'SET', 'DEL', 'ZADD', 'ZINCRBY', 'ZREM'):
+            for _ in args[1:] if cmd == 'DEL' else [key]:
+                self.server.versions[_] = self.server.versions.get(_, 0) + 1
+        score = lambda _: str(int(_)) if _ == int(_) else repr(_)
+        if cmd == 'HGET':
+            return hashes.get(key, {}).get(rest[0])
+        if cmd == 'HMGET':
+            return [hashes.get(key, {}).get(_) for _ in rest]
+        if cmd == 'HSET':
+            new = rest[0] not in hashes.get(key, {})
+            hashes.setdefault(key, {})[rest[0]] = rest[1]
+            return int(new)
+        if cmd == 'HSETNX':
+            if rest[0] in hashes.get(key, {}):
+                return 0
+            hashes.setdefault(key, {})[rest[0]] = rest[1]
+            return 1
+        if cmd == 'HINCRBY':
+            h = hashes.setdefault(key, {})
+            h[rest[0]] = str(int(h.get(rest[0], 0)) + int(rest[1]))
+            return int(h[rest[0]])
+        if cmd == 'SET':
+            if 'NX' in rest[1:] and key in self.server.strings:
+                return None
+            self.server.strings[key] = rest[0]
+            return True
+        if cmd == 'EXISTS':
+            return int(key in self.server.strings)
+        if cmd == 'HGETALL':
+            return [_ for item in hashes.get(key, {}).items() for _ in item]
+        if cmd == 'HKEYS':
+            return list(hashes.get(key, {}))
+        if cmd == 'DEL':
+            return sum(int(hashes.pop(_, None) is not None or
+                           self.server.strings.pop(_, None) is not None) for _ in args[1:])
+        if cmd == 'ZADD':
+            nx = rest[0] == 'NX'
+            rest = rest[1:] if nx else rest
+            z = zsets.setdefault(key, {})
+            if nx and rest[1] in z:
+                return 0
+            z[rest[1]] = float(rest[0])
+            return 1
+        if cmd == 'ZINCRBY':
+            z = zsets.setdefault(key, {})
+            z[rest[1]] = z.get(rest[1], 0.0) + float(rest[0])
+            return score(z[rest[1]])
+        if cmd == 'ZREM':
+            return int(zsets.get(key, {}).pop(rest[0], None) is not None)
+        if cmd == 'ZREVRANGE':
+            ordered = sorted(zsets.get(key, {}).items(), key=lambda _: (-_[1], _[0]))
+            return [str(_) for item in ordered[int(rest[0]):int(rest[1]) + 1]
+                    for _ in (item[0], score(item[1]))]
+        if cmd == 'SCAN':
+            keys = sorted(list(hashes) + list(self.server.strings))
+            cursor, match, count = int(key), rest[1], int(rest[3])
+            page = [_ for _ in keys[cursor:cursor + count] if fnmatch.fnmatchcase(_, match)]
+            return [str(cursor + count if cursor + count < len(keys) else 0), page]
+        return Exception('unknown command %s' % cmd)
+
+
+class FakeRedisServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        socketserver.TCPServer.__init__(self, ('127.0.0.1', 0), FakeRedisHandler)
+        self.lock = threading.Lock()
+        self.hashes = {}
+        self.zsets = {}
+        self.strings = {}
+        self.versions = {}
+        self.commands = 0
+
+
+class RedisBackendTests(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeRedisServer()
+        self.thread = threading.Thread(target=self.server.serve_forever,
+                                       kwargs={'poll_interval': 0.01})
+        self.thread.start()
+        self.backend = RedisAchievementBackend(port=self.server.server_address[1])
+        self.tracker = AchievementTracker(self.backend)
+        self.tracker.register(ACHIEVEMENTS)
+
+    def tearDown(self):
+        self.backend.close()
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    def test_increment(self):
+        tid = random.choice(TRACKED_IDS)
+        num_increment = random.randint(20, 60)
+        for _ in range(num_increment):
+            self.tracker.increment(tid, random.choice(self.tracker.achievements()))
+        total = sum([_.current[0] for _ in self.tracker.achievements_for_id(tid)])
+        self.assertEqual(total, num_increment)
+        self.assertEqual(self.tracker.get_tracked_ids(), [str(tid)])
+
+    def test_event_ids(self):
+        check_event_ids(self)
+
+    def test_concurrent_event_ids(self):
+        check_concurrent_event_ids(self)
+
+    def test_remove_id_events(self):
+        for tid in ('user', 'other', 'user:x', 'usex'):
+            self.tracker.increment(tid, ACHIEVEMENTS[0], event_id='a')
+        self.backend.remove_id('user')
+        self.assertFalse(self.backend.has_event('user', ACHIEVEMENTS[0], 'a'))
+        for tid in ('other', 'user:x', 'usex'):
+            self.assertTrue(self.backend.has_event(tid, ACHIEVEMENTS[0], 'a'))
+        self.tracker.increment('user', ACHIEVEMENTS[0], event_id='a')
+        self.assertEqual(self.tracker.current('user', ACHIEVEMENTS[0])[0], 1)
+
+    def test_atomic_increment(self):
+        received = []
+        rec = lambda goals, **kwargs: received.append(goals)
+        goal_achieved.connect(rec)
+        achiev = ACHIEVEMENTS[0]
+        num_threads = 4
+        per_thread = achiev.goals[-1]['level'] // num_threads + 1
+
+        def work():
+            for _ in range(per_thread):
+                self.tracker.increment('user', achiev)
+
+        threads = [threading.Thread(target=work) for _ in range(num_threads)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        goal_achieved.disconnect(rec)
+        self.assertEqual(self.tracker.current('user', achiev)[0], per_thread * num_threads)
+        self.assertEqual(sorted(g['level'] for goals in received for g in goals),
+                         [g['level'] for g in achiev.goals])
+
+    def test_achievements_for_id(self):
+        self.tracker.set_level('user', ACHIEVEMENTS[1], 7)
+        commands = self.server.commands
+        levels = [_.current[0] for _ in self.backend.achievements_for_id('user', ACHIEVEMENTS)]
+        self.assertEqual(self.server.commands, commands + 1)
+        self.assertEqual(levels, [7 if _ is ACHIEVEMENTS[1] else 0 for _ in ACHIEVEMENTS])
+
+    def test_bulk(self):
+        self.assertEqual(self.backend.set_levels([(_, ACHIEVEMENTS[0], _) for _ in range(10)], 3),
+                         10)
+        self.tracker.set_level(3, ACHIEVEMENTS[1], 1)
+        self.assertEqual(self.backend.leaderboard(ACHIEVEMENTS[0], 2), [('9', 9), ('8', 8)])
+        self.assertEqual(sorted(int(_) for _ in self.backend.get_tracked_ids()), list(range(10)))
+        self.assertEqual(len(list(self.backend.iter_levels(batch_size=3))), 11)
+        self.assertEqual(list(self.backend.iter_levels(ACHIEVEMENTS[1])),
+                         [('3', ACHIEVEMENTS[1].__name__, 1)])
+        summary = self.backend.summary()
+        self.assertEqual(summary['achievements'][ACHIEVEMENTS[0].__name__],
+                         {'count': 10, 'total': 45, 'max': 9})
+        self.backend.remove_id(9)
+        self.assertEqual(self.backend.leaderboard(ACHIEVEMENTS[0], 1), [('8', 8)])
+        self.assertEqual(len(self.backend.get_tracked_ids()), 9)
+
+    def test_windowed(self):
+        self.tracker.register(Logins)
+        self.tracker.increment('user', Logins, 2)
+        self.assertEqual(self.backend.achievement_for_id('user', Logins).get_state()[1], [2])
+
+    def test_errors(self):
+        client = RespClient(port=self.server.server_address[1])
+        self.assertRaises(ResponseError, client.execute, 'NONSENSE')
+        self.assertEqual(client.execute('HSET', 'k', 'f', 'v'), 1)
+        client.close()
+
+
+class CachedBackendTests(unittest.TestCase):
+    def setUp(self):
+        self.dbfile = tempfile.NamedTemporaryFile(delete=False)
+        self.dbfile.close()
+        self.backend = CachedAchievementBackend(SQLiteAchievementBackend(self.dbfile.name),
+                                                max_size=4)
+        self.tracker = AchievementTracker()
+        self.tracker.set_backend(self.backend)
+        self.tracker.register(ACHIEVEMENTS)
+
+    def tearDown(self):
+        self.backend.backend.close()
+        os.remove(self.dbfile.name)
+
+    def test_hits(self):
+        self.tracker.current('cached', ACHIEVEMENTS[0])
+        self.tracker.achieved('cached', ACHIEVEMENTS[0])
+        self.tracker.unachieved('cached', ACHIEVEMENTS[0])
+        self.assertEqual(self.backend.misses, 1)
+        self.assertEqual(self.backend.hits, 2)
+
+    def test_invalidate_on_write(self):
+        for _ in range(5):
+            self.tracker.increment('cached', ACHIEVEMENTS[0])
+        self.assertEqual(self.tracker.current('cached', ACHIEVEMENTS[0])[0], 5)
+        self.tracker.set_level('cached', ACHIEVEMENTS[0], 100)
+        self.assertEqual(self.tracker.current('cached', ACHIEVEMENTS[0])[0], 100)
+        self.tracker.remove_id('cached')
+        self.assertEqual(self.tracker.current('cached', ACHIEVEMENTS[0])[0], 0)
+
+    def test_max_size(self):
+        for tid in TRACKED_IDS:
+            self.tracker.current(tid, ACHIEVEMENTS[0])
+        self.assertEqual(len(self.backend._cache), 4)
+        self.backend.clear()
+        self.assertEqual(len(self.backend._cache), 0)
+        self.assertEqual(self.backend.hits, 0)
+
+    def test_ttl(self):
+        self.backend.ttl = 0
+        self.tracker.current('cached', ACHIEVEMENTS[0])
+        self.tracker.current('cached', ACHIEVEMENTS[0])
+        self.assertEqual(self.backend.hits, 0)
+
+    def test_achievements_for_id(self):
+        self.tracker.current('cached', ACHIEVEMENTS[0])
+        self.assertEqual(len(self.tracker.achievements_for_id('cached')), len(ACHIEVEMENTS))
+        self.assertEqual(self.backend.hits, 1)
+
+
 @receiver([goal_achieved, level_increased, highest_level_achieved])
 def recv(*args, **kwargs):
     pass
@@ -176,6 +1057,127 @@ class recvClass:
         pass
 
 
+NOW = [1000000.0]
+
+
+class Logins(WindowedAchievement):
+    name = 'Logins'
+    category = 'windowed'
+    window = 10
+    bucket = 2
+    goals = ({'level': 3, 'name': 'Regular', 'icon': icons.star, 'description': '3 logins'},)
+
+    def now(self):
+        return NOW[0]
+
+
+class BonusLogins(Logins):
+    name = 'Bonus Logins'
+
+    def evaluate(self, bonus=0, *args, **kwargs):
+        self.increment(bonus)
+        return self.achieved
+
+class WindowedAchievementTests(unittest.TestCase):
+    def setUp(self):
+        self.dbfile = tempfile.NamedTemporaryFile(delete=False)
+        self.dbfile.close()
+        NOW[0] = 1000000.0
+
+    def tearDown(self):
+        os.remove(self.dbfile.name)
+
+    def test_window(self):
+        a = Logins()
+        a.increment(2)
+        NOW[0] += 5
+        a.increment()
+        self.assertEqual(a.current[0], 3)
+        self.assertEqual(len(a.achieved), 1)
+        NOW[0] += 6
+        self.assertEqual(a.current[0], 1)
+        self.assertEqual(len(a.achieved), 0)
+        a.set_level(0)
+        self.assertEqual(a.current[0], 0)
+        NOW[0] += 1000
+        a.increment()
+        self.assertEqual(a.current[0], 1)
+
+    def test_lower_level(self):
+        a = Logins(current=2)
+        NOW[0] += 4
+        a.increment(3)
+        a.set_level(1)
+        self.assertEqual(a.current[0], 1)
+        self.assertEqual(a.get_state()[1], [1, 0, 0])
+        NOW[0] += 8
+        self.assertEqual(a.current[0], 0)
+        a.set_level(-1)
+        self.assertEqual(a.current[0], 0)
+
+    def test_state(self):
+        a = Logins(current=2)
+        NOW[0] += 4
+        a.increment()
+        b = Logins()
+        b.set_state(a.get_state())
+        self.assertEqual(b.current[0], 3)
+        NOW[0] += 8
+        self.assertEqual(b.current[0], 1)
+        self.assertEqual(b.get_state(), a.get_state())
+
+    def check_backend(self, make_backend, reopen=True):
+        tracker = AchievementTracker(make_backend())
+        tracker.register(Logins)
+        tracker.increment('user', Logins)
+        NOW[0] += 4
+        self.assertEqual(tracker.increment('user', Logins, 2)[0]['level'], 3)
+
+        if reopen:
+            tracker._backend.close()
+            tracker.set_backend(make_backend())
+            self.assertEqual(tracker.current('user', Logins)[0], 3)
+        NOW[0] += 8
+        self.assertEqual(tracker.current('user', Logins)[0], 2)
+        self.assertEqual(tracker.status_for_id('user')[0].level, 2)
+        tracker.increment('user', Logins)
+        self.assertEqual(tracker.current('user', Logins)[0], 3)
+        return tracker._backend
+
+    def test_memory(self):
+        self.check_backend(AchievementBackend, reopen=False)
+
+    def test_sqlite(self):
+        backend = self.check_backend(lambda: SQLiteAchievementBackend(self.dbfile.name))
+        self.assertEqual(backend.leaderboard(Logins), [('user', 3)])
+        backend.remove_id('user')
+        c = backend.conn.execute('select count(*) from pychievements_state')
+        self.assertEqual(c.fetchone(), (0,))
+        backend.close()
+
+    def test_evaluate_all(self):
+        tracker = AchievementTracker(SQLiteAchievementBackend(self.dbfile.name))
+        tracker.register(BonusLogins)
+        tracker.increment('user', BonusLogins, 2)
+        tracker.increment('other', BonusLogins)
+        NOW[0] += 4
+        self.assertEqual(tracker.evaluate_all(BonusLogins, lambda tid: (tid == 'user',)), 1)
+        self.assertEqual(tracker.current('user', BonusLogins)[0], 3)
+        self.assertEqual(tracker.current('other', BonusLogins)[0], 1)
+        NOW[0] += 8
+        self.assertEqual(tracker.current('user', BonusLogins)[0], 1)
+        self.assertEqual(tracker.current('other', BonusLogins)[0], 0)
+        tracker._backend.close()
+
+    def test_queued_sqlite(self):
+        self.check_backend(lambda: QueuedSQLiteAchievementBackend(self.dbfile.name)).close()
+
+    def test_cached(self):
+        self.check_backend(
+            lambda: CachedAchievementBackend(SQLiteAchievementBackend(self.dbfile.name)),
+            reopen=False)
+
+
 class SignalsTest(unittest.TestCase):
     def setUp(self):
         self.tracker = AchievementTracker()
@@ -213,6 +1215,52 @@ class SignalsTest(unittest.TestCase):
         self.assertTrue(self.signal_received)
         highest_level_achieved.disconnect(rec)
 
+    def test_batch(self):
+        received = []
+        rec = lambda signal, goals=None, **kwargs: received.append((signal, goals))
+        level_increased.connect(rec)
+        goal_achieved.connect(rec)
+
+        tid = random.choice(TRACKED_IDS)
+        achiev = random.choice(ACHIEVEMENTS)
+        level = self.tracker.current(tid, achiev)[0]
+        with self.tracker.batch():
+            with self.tracker.batch():
+                for _ in range(achiev.goals[1]['level'] - level):
+                    self.tracker.increment(tid, achiev)
+            self.assertEqual(received, [])
+        level_increased.disconnect(rec)
+        goal_achieved.disconnect(rec)
+
+        self.assertEqual(len(received), 2)
+        self.assertEqual(received[0], (level_increased, None))
+        self.assertEqual(received[1], (goal_achieved, list(achiev.goals[:2])))
+        self.assertEqual(self.tracker.current(tid, achiev)[0], achiev.goals[1]['level'])
+
+    def test_goal_lost(self):
+        received = []
+        rec = lambda signal, goals=None, **kwargs: received.append((signal, goals))
+        goal_achieved.connect(rec)
+        goal_lost.connect(rec)
+
+        tid = random.choice(TRACKED_IDS)
+        achiev = random.choice(ACHIEVEMENTS)
+        self.tracker.set_level(tid, achiev, achiev.goals[-1]['level'])
+        del received[:]
+        self.tracker.set_level(tid, achiev, achiev.goals[0]['level'])
+        self.assertEqual(received, [(goal_lost, list(achiev.goals[1:]))])
+        del received[:]
+        self.assertEqual(self.tracker.increment(tid, achiev, 5),
+                         list(achiev.goals[1:2]))
+        self.assertEqual(received, [(goal_achieved, list(achiev.goals[1:2]))])
+        del received[:]
+        with self.tracker.batch():
+            self.tracker.set_level(tid, achiev, 0)
+            self.tracker.set_level(tid, achiev, achiev.goals[0]['level'])
+        goal_achieved.disconnect(rec)
+        goal_lost.disconnect(rec)
+        self.assertEqual(received, [(goal_lost, list(achiev.goals[1:2]))])
+
     def test_duplicate_reciever(self):
         highest_level_achieved.connect(recvClass)
         highest_level_achieved.connect(recvClass)
@@ -234,9 +1282,280 @@ class SignalsTest(unittest.TestCase):
         highest_level_achieved.disconnect(raise_exc)
 
 
+class StatsTests(unittest.TestCase):
+    def setUp(self):
+        self.stats = TrackerStats()
+        self.tracker = AchievementTracker(stats=self.stats)
+        self.tracker.register(ACHIEVEMENTS)
+
+    def test_disabled(self):
+        self.tracker.set_stats(None)
+        self.tracker.increment(random.choice(TRACKED_IDS), random.choice(ACHIEVEMENTS))
+        self.assertEqual(self.stats.as_dict(), {})
+
+    def test_operations(self):
+        achiev = random.choice(ACHIEVEMENTS)
+        for _ in range(5):
+            self.tracker.increment('statsid', achiev)
+        self.tracker.set_level('statsid', achiev, achiev.goals[0]['level'])
+        stats = self.stats.as_dict()
+        self.assertEqual(stats['increment']['count'], 5)
+        self.assertEqual(stats['set_level']['count'], 1)
+        self.assertEqual(stats['backend.set_level_for_id']['count'], 6)
+        self.assertEqual(stats['check_signals']['count'], 6)
+        self.assertEqual(stats['signal.level_increased']['count'], 6)
+        self.assertEqual(stats['signal.goal_achieved']['count'], 1)
+        self.assertEqual(stats['increment']['buckets'][-1][1], 5)
+
+    def test_errors(self):
+        self.assertRaises(TypeError, self.tracker.increment, 'statsid', ACHIEVEMENTS[0], 'a')
+        self.assertEqual(self.stats.as_dict()['increment']['errors'], 1)
+
+    def test_prometheus(self):
+        self.tracker.increment('statsid', random.choice(ACHIEVEMENTS))
+        text = self.stats.to_prometheus()
+        self.assertTrue('pychievements_operation_seconds_count{operation="increment"} 1' in text)
+        self.assertTrue('pychievements_operation_seconds_bucket{operation="increment",'
+                        'le="+Inf"} 1' in text)
+        self.stats.reset()
+        self.assertEqual(self.stats.as_dict(), {})
+
+
+class TracingTests(unittest.TestCase):
+    def setUp(self):
+        self.tracer = Tracer()
+        self.tracker = AchievementTracker(tracer=self.tracer)
+        self.tracker.register(ACHIEVEMENTS)
+
+    def test_spans(self):
+        achiev = random.choice(ACHIEVEMENTS)
+        def rec(**kwargs):
+            with self.tracer.span('receiver'):
+                pass
+        goal_achieved.connect(rec)
+        self.tracker.set_level('traceid', achiev.__name__, achiev.goals[0]['level'])
+        goal_achieved.disconnect(rec)
+        self.assertEqual(len(self.tracer.traces), 1)
+        paths = [_.path for _ in self.tracer.traces[0]]
+        self.assertEqual(paths[0], ('set_level',))
+        for path in [('set_level', 'registry'), ('set_level', 'backend.achievement_for_id'),
+                     ('set_level', 'backend.set_level_for_id'), ('set_level', 'check_signals'),
+                     ('set_level', 'signal.goal_achieved', 'receiver')]:
+            self.assertTrue(path in paths)
+        root = self.tracer.traces[0][0]
+        self.assertTrue(root.self_time <= root.duration)
+        self.assertAlmostEqual(sum(_.self_time for _ in self.tracer.traces[0]), root.duration)
+
+    def test_exports(self):
+        achiev = random.choice(ACHIEVEMENTS)
+        for _ in range(3):
+            self.tracker.increment('traceid', achiev)
+        events = json.loads(json.dumps(self.tracer.chrome_trace()))['traceEvents']
+        self.assertEqual(len(events), len(self.tracer.spans()))
+        self.assertEqual(len([_ for _ in events if _['name'] == 'increment']), 3)
+        lines = self.tracer.collapsed().splitlines()
+        stacks = [_.rsplit(' ', 1)[0] for _ in lines]
+        self.assertTrue('increment' in stacks)
+        self.assertTrue('increment;backend.set_level_for_id' in stacks)
+        self.assertEqual(len(stacks), len(set(stacks)))
+        self.tracer.clear()
+        self.assertEqual(self.tracer.collapsed(), '')
+
+    def test_sampling(self):
+        stats = TrackerStats()
+        self.tracker.set_stats(stats)
+        self.tracer.sample_rate = 0
+        achiev = random.choice(ACHIEVEMENTS)
+        self.tracker.increment('traceid', achiev)
+        self.assertEqual(len(self.tracer.traces), 0)
+        self.assertEqual(stats.as_dict()['increment']['count'], 1)
+        self.tracer.sample_rate = 1
+        self.tracker.increment('traceid', achiev)
+        self.assertEqual(len(self.tracer.traces), 1)
+        self.assertEqual(stats.as_dict()['increment']['count'], 2)
+
+    def test_errors(self):
+        self.assertRaises(TypeError, self.tracker.increment, 'traceid', ACHIEVEMENTS[0], 'a')
+        self.assertTrue(self.tracer.traces[0][0].error)
+        self.tracker.increment('traceid', ACHIEVEMENTS[0])
+        self.assertEqual(len(self.tracer.traces), 2)
+
+
+class ReceiverStatsTests(unittest.TestCase):
+    def setUp(self):
+        self.signal = Signal('test')
+        self.slow = []
+
+    def test_disabled(self):
+        self.signal.connect(recv)
+        self.signal.send_robust(self)
+        self.assertEqual(self.signal.receiver_stats(), [])
+
+    def test_receiver_stats(self):
+        def raise_exc(*args, **kwargs):
+            raise Exception('test')
+        self.signal.connect(recv)
+        self.signal.connect(raise_exc)
+        self.signal.enable_stats()
+        for _ in range(3):
+            r = self.signal.send_robust(self)
+        self.assertTrue(isinstance(r[1][1], Exception))
+        stats = dict((_['receiver'], _) for _ in self.signal.receiver_stats())
+        self.assertEqual(stats[recv]['calls'], 3)
+        self.assertEqual(stats[raise_exc]['errors'], 3)
+        self.assertEqual(stats[recv]['errors'], 0)
+        self.assertTrue(stats[recv]['max'] <= stats[recv]['total'])
+        self.signal.disable_stats()
+        self.assertEqual(self.signal.receiver_stats(), [])
+
+    def test_budget(self):
+        def sleepy(*args, **kwargs):
+            time.sleep(0.002)
+        self.signal.connect(recv)
+        self.signal.connect(sleepy)
+        self.signal.enable_stats(budget=0.001, on_slow=lambda *args: self.slow.append(args))
+        self.signal.send_robust(self)
+        self.assertEqual(self.slow[0][:2], (self.signal, sleepy))
+        self.assertEqual(len(self.slow), 1)
+        self.assertEqual(self.signal.receiver_stats()[0]['receiver'], sleepy)
+        self.assertEqual(self.signal.receiver_stats()[0]['slow'], 1)
+
+    def test_budget_callback_error(self):
+        def sleepy(*args, **kwargs):
+            time.sleep(0.002)
+            return 'slept'
+
+        def on_slow(*args):
+            raise Exception('test')
+        self.signal.connect(sleepy)
+        self.signal.enable_stats(budget=0.001, on_slow=on_slow)
+        self.assertEqual(self.signal.send_robust(self), [(sleepy, 'slept')])
+        self.assertEqual(self.signal.receiver_stats()[0]['slow'], 1)
+
+
+class Doubler(Achievement):
+    name = 'Doubler'
+    category = 'console'
+    goals = ({'level': 10, 'name': 'Ten', 'icon': icons.star, 'description': 'Ten'},)
+
+    def evaluate(self, factor=2, *args, **kwargs):
+        self._current *= factor
+        return self.achieved
+
+
+def doubler_provider(tracked_id):
+    return (3,) if tracked_id == 'triple' else (2,)
+
+
+class ConsoleTests(unittest.TestCase):
+    def setUp(self):
+        self.dbfile = tempfile.NamedTemporaryFile(delete=False)
+        self.dbfile.close()
+        self.tracker = AchievementTracker()
+        self.tracker.register(ACHIEVEMENTS + [Doubler])
+
+    def tearDown(self):
+        os.remove(self.dbfile.name)
+
+    def run_command(self, *argv, **kwargs):
+        out = StringIO()
+        rc = console.main(['--db', self.dbfile.name, '--batch-size', '2'] + list(argv),
+                          tracker=self.tracker, stdin=kwargs.get('stdin'), stdout=out)
+        self.assertEqual(rc, kwargs.get('rc', 0))
+        return out.getvalue()
+
+    def populate(self):
+        backend = SQLiteAchievementBackend(self.dbfile.name)
+        rows = [(tid, a, i + 1) for i, tid in enumerate(TRACKED_IDS) for a in ACHIEVEMENTS]
+        backend.set_levels(rows)
+        backend.close()
+        return rows
+
+    def test_export_import(self):
+        rows = self.populate()
+        exported = self.run_command('export')
+        self.assertEqual(len(exported.splitlines()), len(rows))
+        os.remove(self.dbfile.name)
+        out = self.run_command('import', stdin=StringIO(exported))
+        self.assertEqual(out, 'imported %d levels\n' % len(rows))
+        self.assertEqual(self.run_command('export'), exported)
+
+        tsv = self.run_command('export', '--format', 'tsv', '-a', ACHIEVEMENTS[0].__name__)
+        self.assertEqual(len(tsv.splitlines()), len(TRACKED_IDS) + 1)
+        self.run_command('import', '--format', 'tsv', stdin=StringIO(tsv))
+
+    def test_tsv_round_trip(self):
+        tids = ['CORP\\alice', 'tab\tbed', 'new\nline', 'lit\\\\n', 'plain']
+        backend = SQLiteAchievementBackend(self.dbfile.name)
+        backend.set_levels([(_, ACHIEVEMENTS[0], i) for i, _ in enumerate(tids)])
+        backend.close()
+        tsv = self.run_command('export', '--format', 'tsv')
+        os.remove(self.dbfile.name)
+        self.run_command('import', '--format', 'tsv', stdin=StringIO(tsv))
+        backend = SQLiteAchievementBackend(self.dbfile.name)
+        self.assertEqual(sorted(_[0] for _ in backend.iter_levels()), sorted(tids))
+        backend.close()
+
+    def test_stats_leaderboard(self):
+        self.populate()
+        out = self.run_command('stats')
+        self.assertTrue('tracked ids: %d' % len(TRACKED_IDS) in out)
+        out = self.run_command('leaderboard', ACHIEVEMENTS[0].__name__, '-n', '3')
+        self.assertEqual(len(out.splitlines()), 3)
+        self.assertEqual(out.splitlines()[0].split()[1:], [str(len(TRACKED_IDS)),
+                                                           str(TRACKED_IDS[-1])])
+        self.run_command('leaderboard', 'NotRegistered', rc=1)
+
+    def test_migrate_vacuum(self):
+        # a database from before migrations, without the unique index
+        conn = sqlite3.connect(self.dbfile.name)
+        conn.execute('create table pychievements (tracked_id text, achievement text, '
+                     'level integer)')
+        conn.close()
+        self.populate()
+        backend = SQLiteAchievementBackend(self.dbfile.name)
+        backend.conn.execute('insert into pychievements values (?, ?, ?)',
+                             (str(TRACKED_IDS[0]), ACHIEVEMENTS[0].__name__, 100))
+        backend.conn.commit()
+        backend.close()
+        self.assertTrue(self.run_command('migrate').startswith('applied:'))
+        self.assertEqual(self.run_command('migrate'), 'already up to date\n')
+        self.run_command('vacuum')
+        self.assertEqual(self.run_command('leaderboard', ACHIEVEMENTS[0].__name__, '-n', '1'),
+                         '   1         100  %s\n' % TRACKED_IDS[0])
+
+    def test_recompute(self):
+        backend = SQLiteAchievementBackend(self.dbfile.name)
+        backend.set_levels([('double', Doubler, 3), ('triple', Doubler, 3), ('zero', Doubler, 0)])
+        backend.close()
+        self.assertEqual(self.run_command('recompute', 'Doubler'), 'updated 2 levels\n')
+        self.run_command('recompute', 'Doubler', '--provider', 'tests:doubler_provider')
+        backend = SQLiteAchievementBackend(self.dbfile.name)
+        levels = dict((_[0], _[2]) for _ in backend.iter_levels(Doubler))
+        backend.close()
+        self.assertEqual(levels, {'double': 12, 'triple': 18, 'zero': 0})
+
+    def test_recompute_workers(self):
+        backend = SQLiteAchievementBackend(self.dbfile.name)
+        backend.set_levels([(str(_), Doubler, _) for _ in range(20)])
+        backend.close()
+        self.run_command('recompute', 'Doubler', '-j', '2')
+        backend = SQLiteAchievementBackend(self.dbfile.name)
+        self.assertEqual(sorted(_[2] for _ in backend.iter_levels(Doubler)),
+                         [_ * 2 for _ in range(20)])
+        backend.close()
+
+    def test_goals(self):
+        self.populate()
+        out = self.run_command('goals', str(TRACKED_IDS[-1]), '--all', '--format', 'json',
+                               '--limit', '1')
+        self.assertEqual(len(out.splitlines()), len(ACHIEVEMENTS[0].goals))
+
+
 class IconsTests(unittest.TestCase):
     def test_color_catcher(self):
         import sys
+        import clint.textui
         del sys.modules['pychievements.icons']
         textui = sys.modules['clint.textui']
         sys.modules['clint.textui'] = sys.modules['nose']
@@ -246,6 +1565,27 @@ class IconsTests(unittest.TestCase):
         sys.modules['clint.textui'] = textui
 
 
+class ImportTests(unittest.TestCase):
+    def test_lazy_imports(self):
+        # run in a fresh interpreter, as this one has already imported everything
+        code = ('import sys, pychievements; '
+                'print(",".join(_ for _ in ("sqlite3", "clint", "concurrent.futures", "inspect", '
+                '"pychievements.icons", "pychievements.cli") if _ in sys.modules))')
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        out = subprocess.check_output([sys.executable, '-c', code], cwd=root)
+        self.assertEqual(out.decode().strip(), '')
+
+    def test_lazy_submodules(self):
+        import pychievements
+        self.assertEqual(pychievements.stats.__name__, 'pychievements.stats')
+        self.assertRaises(AttributeError, getattr, pychievements, 'notamodule')
+
+    def test_deferred_color(self):
+        icon = icons.Icon(icons.deferred.white('no'), icons.deferred.yellow('yes'))
+        self.assertEqual(str(icon.unachieved()), str(icons.colored.white('no')))
+        self.assertTrue(icon.achieved() is icon.achieved())
+
+
 class CLITests(unittest.TestCase):
     def setUp(self):
         self.tracker = AchievementTracker()
@@ -254,9 +1594,46 @@ class CLITests(unittest.TestCase):
     def test_print_goal(self):
         cli.print_goal(ACHIEVEMENTS[0].goals[0], achieved=True, level=100)
 
+    def test_print_goal_cache(self):
+        cli._render_cache.clear()
+        goal = ACHIEVEMENTS[0].goals[0]
+        cli.print_goal(goal, achieved=True, width=80)
+        cli.print_goal(goal, achieved=True, level=5, width=80)
+        self.assertEqual(len(cli._render_cache), 1)
+        cli.print_goal(goal, achieved=False, width=80)
+        cli.print_goal(goal, achieved=True, width=100)
+        self.assertEqual(len(cli._render_cache), 3)
+
     def test_print_goals(self):
         cli.print_goals(ACHIEVEMENTS[0])
 
+    def test_structured_output(self):
+        tid = random.choice(TRACKED_IDS)
+        achiev = ACHIEVEMENTS[0]
+        self.tracker.set_level(tid, achiev, achiev.goals[0]['level'])
+
+        out = StringIO()
+        cli.print_goals_for_tracked(tid, achiev, unachieved=True, tracker=self.tracker,
+                                    format='json', stream=out)
+        rows = [json.loads(_) for _ in out.getvalue().splitlines()]
+        self.assertEqual(len(rows), len(achiev.goals))
+        self.assertEqual(rows[0]['achieved'], True)
+        self.assertEqual(rows[-1]['achieved'], False)
+        self.assertEqual(set(rows[0]), set(cli.TRACKED_GOAL_FIELDS))
+
+        out = StringIO()
+        cli.print_goals_for_tracked(tid, achiev, only_current=True, tracker=self.tracker,
+                                    format='tsv', stream=out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(lines[0].split('\t'), list(cli.TRACKED_GOAL_FIELDS))
+        self.assertEqual(lines[1].split('\t')[2], achiev.goals[1]['name'])
+
+        out = StringIO()
+        cli.print_goals(ACHIEVEMENTS, format='tsv', stream=out)
+        self.assertEqual(len(out.getvalue().splitlines()),
+                         sum(len(_.goals) for _ in ACHIEVEMENTS) + 1)
+        self.assertRaises(ValueError, cli.print_goals, achiev, format='xml')
+
     def test_print_goals_for_tracked(self):
         cli.print_goals_for_tracked(random.choice(TRACKED_IDS), unachieved=True)
         cli.print_goals_for_tracked(random.choice(TRACKED_IDS), ACHIEVEMENTS[0], unachieved=True,
@@ -265,6 +1642,9 @@ class CLITests(unittest.TestCase):
                                     tracker=self.tracker)
         cli.print_goals_for_tracked(random.choice(TRACKED_IDS), only_current=True,
                                     tracker=self.tracker)
+        cli.print_goals_for_tracked(random.choice(TRACKED_IDS), category=CATEGORIES[0],
+                                    keywords=KEYWORDS[:1], offset=1, limit=2, batch_size=1,
+                                    tracker=self.tracker)
 
 
 if __name__ == '__main__':